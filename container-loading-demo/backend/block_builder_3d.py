@@ -0,0 +1,139 @@
+"""
+Block Builder - preprocessor that turns identical units into stacked blocks
+
+Before an algorithm runs, units with identical dimensions, packing_method,
+material and sort_order are stacked into homogeneous vertical blocks, e.g.
+ten 30×17×5 cartons become one 30×17×50 block. Packers then place a few dozen
+blocks instead of ~470 units; after packing, expand() turns every placed block
+back into its per-unit placements before the output is formatted.
+
+Blocks are marked with a 'block' key. A block keeps its units upright, so it
+may only rotate in the XY plane - the shared orientation table checks the
+marker (is_block).
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from placement import Placement
+
+
+def is_block(box: Dict[str, Any]) -> bool:
+    """True if box line is a stacked block from BlockBuilder"""
+    return bool(box.get('block'))
+
+
+class BlockBuilder:
+    """
+    Group identical units into vertical stack blocks and expand them back
+
+    Args:
+        max_height: Tallest block allowed (usually container height)
+    """
+
+    CODE_PREFIX = 'BLOCK-'
+
+    def __init__(self, max_height: float):
+        self.max_height = max_height
+        self.blocks: Dict[str, Dict[str, Any]] = {}  # block code -> {'unit_height', 'units'}
+
+    def build(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace units of identical type by stacked blocks
+
+        Args:
+            boxes: Box lines (dimensions, quantity, packing_method, material, ...)
+
+        Returns:
+            List[Dict]: Box lines for the packers - block lines (with 'block'
+                        marker) plus lines that could not be stacked, in
+                        first-seen order of their group
+        """
+        self.blocks = {}
+
+        # Group lines by stackable type, keep first-seen order
+        groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for box in boxes:
+            if int(box.get('quantity', 1)) <= 0:
+                continue
+            dims = box['dimensions']
+            key = (dims['width'], dims['length'], dims['height'],
+                   box.get('packing_method', 'CARTON'), box.get('material', ''), box.get('sort_order'))
+            groups.setdefault(key, []).append(box)
+
+        result = []
+        for key, lines in groups.items():
+            unit_height = key[2]
+            per_block = int(self.max_height // unit_height) if unit_height > 0 else 1
+            total = sum(int(line.get('quantity', 1)) for line in lines)
+
+            if per_block < 2 or total < 2:
+                result.extend(lines)  # Nothing to stack
+                continue
+
+            # Units in line order, cut into stacks of per_block units
+            units = [line for line in lines for _ in range(int(line.get('quantity', 1)))]
+            stacks = [units[i:i + per_block] for i in range(0, len(units), per_block)]
+
+            # Consecutive stacks with the same composition share one block line
+            runs: List[List] = []
+            for stack in stacks:
+                if runs and [id(u) for u in runs[-1][0]] == [id(u) for u in stack]:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([stack, 1])
+
+            for stack, count in runs:
+                if len(stack) == 1:
+                    single = stack[0].copy()
+                    single['quantity'] = count
+                    result.append(single)
+                    continue
+                result.append(self._new_block(stack, count))
+
+        return result
+
+    def expand(self, containers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace every placed block by its units (bottom to top), in place
+
+        Args:
+            containers: Packed containers
+
+        Returns:
+            List[Dict]: Same containers with per-unit placements
+        """
+        for container in containers:
+            expanded = []
+            for placed in container['boxes']:
+                block = self.blocks.get(placed.code)
+                if block is None:
+                    expanded.append(placed)
+                    continue
+
+                unit_height = block['unit_height']
+                for k, unit in enumerate(block['units']):
+                    expanded.append(Placement(
+                        unit.get('code', 'UNKNOWN'), unit.get('material', ''), unit.get('packing_method', 'CARTON'),
+                        placed.x, placed.y, placed.z + k * unit_height,
+                        placed.width, placed.length, unit_height, unit
+                    ))
+            container['boxes'] = expanded
+        return containers
+
+    def _new_block(self, stack: List[Dict[str, Any]], count: int) -> Dict[str, Any]:
+        first = stack[0]
+        dims = first['dimensions']
+        code = f"{self.CODE_PREFIX}{len(self.blocks) + 1}"
+        self.blocks[code] = {'unit_height': dims['height'], 'units': stack}
+
+        block = first.copy()
+        block['code'] = code
+        block.pop('type_id', None)  # Own inventory type (new code), keyed by its fields
+        block['quantity'] = count
+        block['dimensions'] = {
+            'width': dims['width'],
+            'length': dims['length'],
+            'height': dims['height'] * len(stack)
+        }
+        block['block'] = {'units': len(stack), 'unit_height': dims['height']}
+        return block
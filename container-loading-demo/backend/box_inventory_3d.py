@@ -0,0 +1,196 @@
+"""
+Box Inventory - remaining units per box type for row-by-row packers
+
+Keeps the remaining quantity of every type (code, material, purchasing_doc,
+packing_method) of an order - keyed by the line's integer 'type_id' when the
+order went through order_normalizer, by the tuple itself otherwise - with:
+- O(1) lookup and decrement by type
+- A running total of remaining units
+- Running remaining counts per sort_order group
+- A (code, material) -> type map, so placed boxes are booked back without
+  scanning the order lines
+- One reusable "remaining" line per order line (quantity = units left), handed
+  to row packers instead of copying the order line on every row
+
+RemainingView is a lazy, count-based view of what is left: gap filling asks
+it for candidate lines instead of receiving one dict per remaining unit, so
+memory stays flat however large the order is.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from order_normalizer import inventory_key
+from placement import Placement
+
+
+class BoxInventory:
+    """
+    Remaining units of an order, grouped by sort_order
+
+    Args:
+        boxes_by_sort: {sort_order: [order lines]}
+    """
+
+    def __init__(self, boxes_by_sort: Dict[Any, List[Dict[str, Any]]]):
+        self.boxes_by_sort = boxes_by_sort
+        self.sort_orders = sorted(boxes_by_sort.keys())
+
+        self.counts: Dict[Hashable, int] = {}             # type -> remaining units
+        self._type_groups: Dict[Hashable, List[Any]] = {}  # type -> sort_orders that contain it
+        self._group_counts: Dict[Any, int] = {so: 0 for so in self.sort_orders}
+        self._placed_types: Dict[Tuple[str, str], Hashable] = {}  # (code, material) -> first type
+        self._lines: Dict[int, Dict[str, Any]] = {}   # id(order line) -> remaining line
+
+        for sort_order in self.sort_orders:
+            for box in boxes_by_sort[sort_order]:
+                key = self.type_of(box)
+                self._placed_types.setdefault((box.get('code'), box.get('material')), key)
+                qty = box.get('quantity', 1)
+                if qty != 0:
+                    self.counts[key] = self.counts.get(key, 0) + qty
+
+        # A group holds every type one of its lines has (also lines with quantity 0)
+        for sort_order in self.sort_orders:
+            for box in boxes_by_sort[sort_order]:
+                key = self.type_of(box)
+                groups = self._type_groups.get(key)
+                if key not in self.counts or (groups and groups[-1] == sort_order):
+                    continue
+                self._type_groups.setdefault(key, []).append(sort_order)
+                self._group_counts[sort_order] += self.counts[key]
+        self.total = sum(self.counts.values())
+
+    @staticmethod
+    def type_of(box: Dict[str, Any]) -> Hashable:
+        """Inventory type of an order line (type_id of normalized lines)"""
+        type_id = box.get('type_id')
+        return type_id if type_id is not None else inventory_key(box)
+
+    def remaining(self, box: Dict[str, Any]) -> int:
+        """Units left of the order line's type"""
+        return self.counts.get(self.type_of(box), 0)
+
+    def group_remaining(self, sort_order: Any) -> int:
+        """Units left in a sort_order group (0 = group done)"""
+        return self._group_counts.get(sort_order, 0)
+
+    def remaining_line(self, box: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Order line with quantity = units left of its type
+
+        The same dict is reused (quantity refreshed) on every call for this
+        order line, so it is only valid until the next call/remove.
+        """
+        line = self._lines.get(id(box))
+        if line is None:
+            line = self._lines[id(box)] = box.copy()
+        line['quantity'] = self.remaining(box)
+        return line
+
+    def view(self) -> 'RemainingView':
+        """Lazy view of the remaining units (follows later removes)"""
+        return RemainingView(self)
+
+    def remove(self, key: Hashable, count: int) -> int:
+        """
+        Book out units of one type (never below zero)
+
+        Returns:
+            int: Units actually removed
+        """
+        left = self.counts.get(key)
+        if left is None:
+            return 0
+        removed = min(left, count)
+        self.counts[key] = left - removed
+        self.total -= removed
+        for sort_order in self._type_groups[key]:
+            self._group_counts[sort_order] -= removed
+        return removed
+
+    def type_of_placed(self, placed: Placement) -> Optional[Hashable]:
+        """Inventory type a placed box is booked against (None if not in the order)"""
+        return self._placed_types.get((placed.code, placed.material))
+
+    def remove_placed(self, placed_boxes: Iterable[Placement]) -> int:
+        """
+        Book out placed boxes, matched to their type by (code, material)
+
+        Returns:
+            int: Units removed
+        """
+        placed_by_type: Dict[Hashable, int] = {}
+        for placed in placed_boxes:
+            key = self.type_of_placed(placed)
+            if key is not None:
+                placed_by_type[key] = placed_by_type.get(key, 0) + 1
+        return sum(self.remove(key, count) for key, count in placed_by_type.items())
+
+
+class RemainingView:
+    """
+    Remaining units of a BoxInventory without expanding them
+
+    Behaves like the list of remaining units (order lines repeated by units
+    left, in sort_order/line order) for len(), bool() and iteration, but only
+    ever walks the order lines.
+
+    Args:
+        inventory: Inventory to read counts from
+    """
+
+    def __init__(self, inventory: BoxInventory):
+        self.inventory = inventory
+
+    def __len__(self) -> int:
+        return self.inventory.total
+
+    def __bool__(self) -> bool:
+        return self.inventory.total > 0
+
+    def lines(self) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """(order line, units left of its type) for lines with units left"""
+        inventory = self.inventory
+        for sort_order in inventory.sort_orders:
+            for box in inventory.boxes_by_sort[sort_order]:
+                count = inventory.remaining(box)
+                if count > 0:
+                    yield box, count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for box, count in self.lines():
+            for _ in range(count):
+                yield box
+
+    def one_per_type(self, exclude: Optional[Set[Tuple[str, str]]] = None,
+                     max_width: Optional[float] = None, max_height: Optional[float] = None,
+                     orientations=None) -> List[Dict[str, Any]]:
+        """
+        First remaining line of every (code, material) not in exclude
+
+        Same result as walking the expanded unit list and keeping the first
+        unit of each (code, material), in O(lines).
+
+        Args:
+            exclude: (code, material) pairs to skip (e.g. already in the row)
+            max_width, max_height: Only lines with an orientation that fits
+                                   (needs orientations)
+            orientations: box -> list of {width, length, height}
+
+        Returns:
+            List[Dict]: Order lines (shared, not copied)
+        """
+        seen = set(exclude) if exclude else set()
+        result = []
+        for box, _ in self.lines():
+            key = (box.get('code', ''), box.get('material', ''))
+            if key in seen:
+                continue
+            seen.add(key)
+            if orientations is not None and not any(
+                    (max_width is None or o['width'] <= max_width) and
+                    (max_height is None or o['height'] <= max_height)
+                    for o in orientations(box)):
+                continue
+            result.append(box)
+        return result
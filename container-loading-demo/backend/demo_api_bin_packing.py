@@ -5,13 +5,12 @@ FastAPI app với Bin Packing Algorithm
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from laff_bin_packing_3d import LAFFBinPacking3D
-from guided_packing_3d import GuidedPackingAlgorithm
-from z_first_packing_3d import ZFirstPackingAlgorithm
-from simple_index_packing_3d import SimpleIndexPackingAlgorithm
+from portfolio_packing_3d import PortfolioPacking, create_packer
 from output_formatter_3d import OutputFormatter3D
-import os
+from block_builder_3d import BlockBuilder
+from order_normalizer import normalize_order
 
 app = FastAPI(
     title="Container Layout Optimization - Bin Packing API",
@@ -53,7 +52,16 @@ class Box(BaseModel):
 
 class CalculateRequest(BaseModel):
     boxes: List[Box]
-    algorithm: Optional[str] = Field(default="laff", description="Packing algorithm: 'laff', 'guided', 'z_first', or 'simple_index'")
+    algorithm: Optional[str] = Field(default="laff", description="Packing algorithm: 'laff', 'guided', 'z_first', 'z_first_beam', 'simple_index', or 'auto' (run laff, guided, z_first and simple_index concurrently, keep the best)")
+    space_backend: Optional[Literal["guillotine", "maximal"]] = Field(default="guillotine", description="LAFF empty space backend: 'guillotine' or 'maximal'")
+    bulk_placement: Optional[bool] = Field(default=False, description="LAFF: place identical units as blocks (one space search per block)")
+    block_building: Optional[bool] = Field(default=False, description="Stack identical units into blocks before packing (all algorithms)")
+    parallel_rows: Optional[int] = Field(default=0, description="Z-First: worker processes that pack alternative dominant_length candidates of short rows in parallel (0 = sequential)")
+    gap_fill: Optional[Literal["greedy", "knapsack"]] = Field(default="greedy", description="Z-First: fill row X-gaps 'greedy' (widest box first) or 'knapsack' (exact width fill)")
+    cell_fill: Optional[Literal["greedy", "knapsack"]] = Field(default="greedy", description="Z-First: top up incomplete cells 'greedy' (smallest box first) or 'knapsack' (exact height fill)")
+    beam_width: Optional[int] = Field(default=8, description="Z-First Beam: partial row compositions kept per step (K)")
+    beam_budget: Optional[float] = Field(default=0.25, description="Z-First Beam: seconds of beam search per row before it finishes greedily")
+    metric: Optional[Literal["length_used", "row_count", "utilization"]] = Field(default="length_used", description="Auto: metric that picks the best layout, 'length_used', 'row_count' or 'utilization'")
 
 
 class LayoutResult(BaseModel):
@@ -63,7 +71,7 @@ class LayoutResult(BaseModel):
 
 @app.get("/health", summary="Health Check")
 async def health_check():
-    return {"status": "ok", "version": "3.0.0", "algorithms": ["laff", "guided", "z_first", "simple_index"]}
+    return {"status": "ok", "version": "3.0.0", "algorithms": ["laff", "guided", "z_first", "z_first_beam", "simple_index", "auto"]}
 
 
 @app.get("/api/test-data", summary="Get Test Data")
@@ -116,7 +124,10 @@ async def calculate_layout(request: CalculateRequest):
     - 'laff': LAFF (Largest Area Fit First) - sorts by area, finds largest space
     - 'guided': Guided Packing - uses manual layout template, fills width (X) before height (Z)
     - 'z_first': Z-First Packing - fills height (Z) before width (X) to maximize vertical utilization
+    - 'z_first_beam': Z-First with a top-K beam search composing each row (beam_width, beam_budget)
     - 'simple_index': Simple Index-Based - packs boxes theo thứ tự index trong array, fill cell-by-cell
+    - 'auto': Portfolio - runs laff, guided, z_first and simple_index concurrently and returns the
+      best layout by 'metric' (per-algorithm timings and scores in layout['portfolio'])
     
     Recommended: Use 'guided', 'z_first', or 'simple_index' for better packing efficiency
     """
@@ -127,29 +138,40 @@ async def calculate_layout(request: CalculateRequest):
         except AttributeError:
             boxes = [box.dict() for box in request.boxes]  # Fallback for Pydantic v1
         
+        # Canonical lines: identical lines merged, interned strings, integer type ids
+        boxes = normalize_order(boxes)
+        
+        # Optional preprocessing: identical units -> stacked blocks
+        block_builder = None
+        if request.block_building:
+            block_builder = BlockBuilder(CONTAINER_DIMS['height'])
+            boxes = block_builder.build(boxes)
+        
         # Choose algorithm
         algorithm = request.algorithm or "laff"
         
-        if algorithm == "guided":
-            # Use Guided Packing with manual template (X-first)
-            manual_template_path = os.path.join(
-                os.path.dirname(__file__),
-                "manual_layout.json"
-            )
-            packer = GuidedPackingAlgorithm(CONTAINER_DIMS, manual_template_path)
-            containers = packer.pack_boxes(boxes)
-        elif algorithm == "z_first":
-            # Use Z-First Packing (Z-first, stack vertically before spreading horizontally)
-            packer = ZFirstPackingAlgorithm(CONTAINER_DIMS)
-            containers = packer.pack_boxes(boxes)
-        elif algorithm == "simple_index":
-            # Use Simple Index-Based Cell Packing (pack theo thứ tự index, fill cell-by-cell)
-            packer = SimpleIndexPackingAlgorithm(CONTAINER_DIMS)
-            containers = packer.pack_boxes(boxes)
+        options = {
+            'space_backend': request.space_backend,
+            'bulk_placement': request.bulk_placement,
+            'parallel_rows': request.parallel_rows,
+            'gap_fill': request.gap_fill,
+            'cell_fill': request.cell_fill,
+            # Z-First post-processing moves whole blocks: check them against occupancy
+            'validate_moves': bool(request.block_building),
+            'beam_width': request.beam_width,
+            'beam_budget': request.beam_budget,
+        }
+        
+        if algorithm == "auto":
+            # Portfolio: all algorithms in parallel processes, best layout by metric
+            packer = PortfolioPacking(CONTAINER_DIMS, metric=request.metric or "length_used", options=options)
         else:
-            # Use LAFF as default/fallback
-            packer = LAFFBinPacking3D(CONTAINER_DIMS)
-            containers = packer.pack_boxes(boxes)
+            packer = create_packer(algorithm, CONTAINER_DIMS, options)
+        containers = packer.pack_boxes(boxes)
+        
+        # Blocks back to per-box placements before formatting
+        if block_builder is not None:
+            containers = block_builder.expand(containers)
         
         # Format output
         formatter = OutputFormatter3D()
@@ -157,6 +179,11 @@ async def calculate_layout(request: CalculateRequest):
         
         # Add algorithm info to result
         result['algorithm'] = algorithm
+        if type(packer) is LAFFBinPacking3D:
+            result['space_stats'] = packer.get_space_stats()
+        elif isinstance(packer, PortfolioPacking):
+            result['selected_algorithm'] = packer.selected_algorithm
+            result['portfolio'] = packer.get_portfolio_stats()
         
         return LayoutResult(
             success=True,
@@ -0,0 +1,57 @@
+"""
+Fixed-point coordinates for the packers and the output formatter
+
+Positions and sizes are converted to integer ticks of 1/8" for hashing and
+comparisons. Equal positions then hash equally, so rows and cells can be
+looked up in dicts/sets instead of scanning every existing key with a float
+tolerance.
+
+Placed positions and sizes stay exact floats: packer cursors advance by the
+real box size, so boxes in a stack touch even when a dimension is off the
+1/8" grid (16.3" boxes sit at z=16.3, 32.6, ...). Ticks are only keys.
+"""
+
+import math
+from typing import Dict, Iterable, List
+
+from placement import Placement
+
+TICKS_PER_INCH = 8
+
+# Guards against float noise (e.g. 12.499999) when rounding sizes up
+_EPSILON = 1e-6
+
+
+def to_ticks(value: float) -> int:
+    """Position in inches -> nearest tick"""
+    return math.floor(value * TICKS_PER_INCH + 0.5)
+
+
+def size_ticks(size: float) -> int:
+    """Size in inches -> ticks, rounded up so a sum of sizes never under-counts (knapsack capacities)"""
+    return math.ceil(size * TICKS_PER_INCH - _EPSILON)
+
+
+def from_ticks(ticks: int) -> float:
+    """Ticks -> inches"""
+    return ticks / TICKS_PER_INCH
+
+
+def group_by_position(boxes: Iterable[Placement], axis: str) -> Dict[float, List[Placement]]:
+    """
+    Group placed boxes that share the same position on one axis
+
+    Args:
+        boxes: Placed boxes
+        axis: 'x', 'y' or 'z'
+
+    Returns:
+        Dict: {position of first box in group: [boxes]} in first-seen order
+    """
+    groups = {}
+    keys = {}  # ticks -> group key
+    for box in boxes:
+        value = getattr(box, axis)
+        key = keys.setdefault(to_ticks(value), value)
+        groups.setdefault(key, []).append(box)
+    return groups
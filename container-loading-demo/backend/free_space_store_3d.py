@@ -0,0 +1,370 @@
+"""
+Free Space Store - struct-of-arrays storage for LAFF empty spaces
+
+Every empty space is one row in a NumPy table with columns
+(x, y, z, width, length, height). Fit tests for a box are evaluated as one
+boolean mask over all spaces and all allowed orientations at once, instead of
+calling EmptySpace.can_fit on each space one by one.
+
+EmptySpace objects are still handed out to callers (position/dimensions dicts),
+but they are only created when a space is added, never inside the search loop.
+
+A persistent priority index (sorted keys of the alive spaces) is kept next to
+the columns and updated in place on every add, remove and merge, so picking
+the best space walks an already ordered list from its head instead of
+re-sorting every space for every box.
+"""
+
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from laff_bin_packing_3d import EmptySpace
+
+
+class FreeSpaceStore:
+    """
+    Column store of empty spaces for one container
+
+    Slots are append-only and keep insertion order, so ties in the LAFF
+    priority (z, -area, height) resolve exactly like a stable sort over the
+    old Python list did. Removed slots are marked dead and compacted lazily.
+
+    The priority index holds one (z, -area, height, slot) key per alive space.
+    Insert and remove are bisects; a merge rewrites only the keys of the
+    spaces it touches, and compaction renumbers slots without re-sorting.
+    """
+
+    X, Y, Z, WIDTH, LENGTH, HEIGHT = range(6)
+
+    def __init__(self, spaces: Optional[Iterable['EmptySpace']] = None, capacity: int = 64):
+        self._data = np.zeros((capacity, 6), dtype=np.float64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._spaces: List[Optional['EmptySpace']] = [None] * capacity
+        self._size = 0      # Slots used so far (alive + dead)
+        self._count = 0     # Alive spaces
+        self._order: List[Tuple[float, float, float, int]] = []  # Priority index (alive slots only)
+        if spaces:
+            self.extend(spaces)
+
+    # ------------------------------------------------------------------ #
+    # List-like API (kept compatible with the old `empty_spaces` list)
+    # ------------------------------------------------------------------ #
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __iter__(self) -> Iterator['EmptySpace']:
+        for slot in range(self._size):
+            if self._alive[slot]:
+                yield self._spaces[slot]
+
+    def __getitem__(self, index: int) -> 'EmptySpace':
+        return self.spaces()[index]
+
+    def spaces(self) -> List['EmptySpace']:
+        """Alive spaces in insertion order"""
+        return list(self)
+
+    def append(self, space: 'EmptySpace') -> int:
+        """Add space, return its slot"""
+        if self._size == len(self._alive):
+            self._grow()
+        slot = self._size
+        self._data[slot] = (space.position['x'], space.position['y'], space.position['z'],
+                            space.dimensions['width'], space.dimensions['length'],
+                            space.dimensions['height'])
+        self._alive[slot] = True
+        self._spaces[slot] = space
+        space.slot = slot
+        self._size += 1
+        self._count += 1
+        insort(self._order, self._priority_key(slot))
+        return slot
+
+    def extend(self, spaces: Iterable['EmptySpace']):
+        for space in spaces:
+            self.append(space)
+
+    def remove(self, space: 'EmptySpace'):
+        """Remove space (mark its slot dead)"""
+        slot = getattr(space, 'slot', None)
+        if slot is None or slot >= self._size or self._spaces[slot] is not space or not self._alive[slot]:
+            raise ValueError(f"{space} is not in store")
+        self._kill(slot)
+        self._maybe_compact()
+
+    def reset(self, spaces: Iterable['EmptySpace']):
+        """Replace all spaces (keeps given order)"""
+        self._alive[:self._size] = False
+        self._spaces[:self._size] = [None] * self._size
+        self._size = 0
+        self._count = 0
+        self._order = []
+        self.extend(spaces)
+
+    def merge_adjacent(self, tolerance: float,
+                       space_factory: Callable[[float, float, float, float, float, float], 'EmptySpace']) -> int:
+        """
+        Merge spaces that line up on one axis (guillotine backend)
+
+        Same greedy pass as the old pairwise _merge_spaces: spaces are visited
+        in insertion order; each one absorbs every later space (in order) that
+        matches the merged result so far on the other two axes - same position
+        and size within `tolerance` - and becomes their bounding box. The
+        pairwise test runs as one array operation; only spaces that take part
+        in a merge are touched afterwards. A merged space keeps the slot of the
+        first space, so insertion order (and priority ties) stay as before.
+
+        Args:
+            tolerance: Max position/size difference that still counts as equal
+            space_factory: Builds an EmptySpace from (x, y, z, width, length, height)
+
+        Returns:
+            int: Spaces absorbed
+        """
+        slots = np.flatnonzero(self._alive[:self._size])
+        m = slots.size
+        if m <= 1:
+            return 0
+        rows = self._data[slots]
+        close = np.abs(rows[:, None, :] - rows[None, :, :]) < tolerance   # (m, m, 6)
+        pairs = self._mergeable(close)
+        pairs &= np.triu(np.ones((m, m), dtype=bool), 1)
+        starts = np.flatnonzero(pairs.any(axis=1))
+        if not starts.size:
+            return 0
+
+        used = np.zeros(m, dtype=bool)
+        absorbed = 0
+        for i in starts.tolist():
+            if used[i]:
+                continue
+            used[i] = True
+            merged = rows[i]
+            j0 = i + 1
+            mask = pairs[i, j0:] & ~used[j0:]
+            taken = False
+            while True:
+                hits = np.flatnonzero(mask)
+                if not hits.size:
+                    break
+                j = j0 + int(hits[0])
+                used[j] = True
+                merged = self._bounding_row(merged, rows[j])
+                self._kill(int(slots[j]))
+                absorbed += 1
+                taken = True
+                # The merged space changed: test the rest against it
+                j0 = j + 1
+                rest = rows[j0:]
+                mask = self._mergeable(np.abs(rest - merged) < tolerance) & ~used[j0:]
+            if taken:
+                self._set_row(int(slots[i]), space_factory(*merged.tolist()))
+
+        self._maybe_compact()
+        return absorbed
+
+    # ------------------------------------------------------------------ #
+    # Vectorized queries
+    # ------------------------------------------------------------------ #
+
+    def fit_mask(self, orientations: np.ndarray) -> np.ndarray:
+        """
+        Boolean fit mask over all slots and orientations
+
+        Args:
+            orientations: Array (k, 3) of (width, length, height)
+
+        Returns:
+            Array (n_slots, k): True where orientation fits inside an alive space
+        """
+        n = self._size
+        dims = self._data[:n, self.WIDTH:]
+        fits = (orientations[None, :, :] <= dims[:, None, :]).all(axis=2)
+        fits &= self._alive[:n, None]
+        return fits
+
+    def fit_choices(self, orientations: np.ndarray,
+                    bounds: Optional[Tuple[float, float, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pick the first fitting orientation per slot (orientations are in preference order)
+
+        Args:
+            orientations: Array (k, 3) of (width, length, height), preferred first
+            bounds: Optional container (width, length, height); the chosen orientation
+                    must also stay inside it
+
+        Returns:
+            (ok, choice): per slot, whether the box can go there and the index of
+            the orientation chosen
+        """
+        fits = self.fit_mask(orientations)
+        ok = fits.any(axis=1)
+        choice = fits.argmax(axis=1)
+
+        if bounds is not None and orientations.shape[0] > 0:
+            n = self._size
+            ends = self._data[:n, :self.WIDTH] + orientations[choice]
+            ok &= (ends <= np.asarray(bounds, dtype=np.float64)).all(axis=1)
+
+        return ok, choice
+
+    def best_fit(self, orientations: np.ndarray,
+                 bounds: Optional[Tuple[float, float, float]] = None,
+                 accept: Optional[Callable[[int, int], bool]] = None) -> Optional[Tuple[int, int]]:
+        """
+        Best space for a box by LAFF priority: low z, large floor area, shallow height
+
+        Walks the persistent priority index and stops at the first space that
+        fits (and passes `accept`, if given).
+
+        Args:
+            orientations: Array (k, 3) of (width, length, height), preferred first
+            bounds: Optional container bounds, see fit_choices
+            accept: Optional extra check accept(slot, orientation_index)
+
+        Returns:
+            (slot, orientation_index) or None if no space can take the box
+        """
+        ok, choice = self.fit_choices(orientations, bounds)
+        if not ok.any():
+            return None
+
+        ok_list = ok.tolist()
+        for key in self._order:
+            slot = key[3]
+            if not ok_list[slot]:
+                continue     # Box does not fit
+            index = int(choice[slot])
+            if accept is None or accept(slot, index):
+                return slot, index
+        return None
+
+    def intersecting(self, x0: float, y0: float, z0: float,
+                     x1: float, y1: float, z1: float) -> np.ndarray:
+        """Slots of alive spaces that overlap the open cuboid (x0, x1) × (y0, y1) × (z0, z1)"""
+        n = self._size
+        lo = self._data[:n, :self.WIDTH]
+        hi = lo + self._data[:n, self.WIDTH:]
+        hit = ((lo[:, 0] < x1) & (hi[:, 0] > x0) &
+               (lo[:, 1] < y1) & (hi[:, 1] > y0) &
+               (lo[:, 2] < z1) & (hi[:, 2] > z0) &
+               self._alive[:n])
+        return np.flatnonzero(hit)
+
+    def contained_mask(self, cuboids: np.ndarray) -> np.ndarray:
+        """
+        For each cuboid (x, y, z, width, length, height), True if an alive space contains it
+
+        Args:
+            cuboids: Array (m, 6)
+        """
+        n = self._size
+        if n == 0 or cuboids.shape[0] == 0:
+            return np.zeros(cuboids.shape[0], dtype=bool)
+        alive = np.flatnonzero(self._alive[:n])
+        lo = self._data[alive, :self.WIDTH]
+        hi = lo + self._data[alive, self.WIDTH:]
+        c_lo = cuboids[:, :3]
+        c_hi = c_lo + cuboids[:, 3:]
+        # One axis at a time on (m, n) planes: cheaper than a (m, n, 3) temp
+        inside = (lo[None, :, 0] <= c_lo[:, None, 0]) & (hi[None, :, 0] >= c_hi[:, None, 0])
+        for axis in (1, 2):
+            inside &= lo[None, :, axis] <= c_lo[:, None, axis]
+            inside &= hi[None, :, axis] >= c_hi[:, None, axis]
+        return inside.any(axis=1)
+
+    def space(self, slot: int) -> 'EmptySpace':
+        return self._spaces[slot]
+
+    def row(self, slot: int) -> np.ndarray:
+        """Raw (x, y, z, width, length, height) of slot"""
+        return self._data[slot]
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+
+    def _priority_key(self, slot: int) -> Tuple[float, float, float, int]:
+        x, y, z, width, length, height = self._data[slot].tolist()
+        return (z, -(width * length), height, slot)
+
+    @staticmethod
+    def _mergeable(close: np.ndarray) -> np.ndarray:
+        """
+        Merge test from per-column closeness (..., 6) of (x, y, z, width, length, height):
+        equal y/z/length/height (X merge), x/z/width/height (Y merge) or x/y/width/length (Z merge)
+        """
+        x, y, z, w, l, h = (close[..., k] for k in range(6))
+        return (y & z & l & h) | (x & z & w & h) | (x & y & w & l)
+
+    @staticmethod
+    def _bounding_row(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Bounding box row of two (x, y, z, width, length, height) rows"""
+        lo = np.minimum(a[:3], b[:3])
+        hi = np.maximum(a[:3] + a[3:], b[:3] + b[3:])
+        return np.concatenate((lo, hi - lo))
+
+    def _kill(self, slot: int):
+        """Mark slot dead and drop its key from the priority index"""
+        order = self._order
+        del order[bisect_left(order, self._priority_key(slot))]
+        self._alive[slot] = False
+        self._spaces[slot] = None
+        self._count -= 1
+
+    def _set_row(self, slot: int, space: 'EmptySpace'):
+        """Put space into an alive slot (replacing its space), re-keyed in the index"""
+        order = self._order
+        del order[bisect_left(order, self._priority_key(slot))]
+        self._data[slot] = (space.position['x'], space.position['y'], space.position['z'],
+                            space.dimensions['width'], space.dimensions['length'],
+                            space.dimensions['height'])
+        self._spaces[slot] = space
+        space.slot = slot
+        insort(order, self._priority_key(slot))
+
+    def _maybe_compact(self):
+        # Compact when dead slots dominate, keeps masks short
+        dead = self._size - self._count
+        if dead > 64 and dead > self._count:
+            self._compact()
+
+    def _grow(self):
+        capacity = max(64, len(self._alive) * 2)
+        data = np.zeros((capacity, 6), dtype=np.float64)
+        data[:self._size] = self._data[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._data = data
+        self._alive = alive
+        self._spaces.extend([None] * (capacity - len(self._spaces)))
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[:self._size])
+        spaces = [self._spaces[slot] for slot in keep]
+        self._data[:keep.size] = self._data[keep]
+        self._alive[:self._size] = False
+        self._alive[:keep.size] = True
+        self._spaces[:self._size] = [None] * self._size
+        for slot, space in enumerate(spaces):
+            self._spaces[slot] = space
+            space.slot = slot
+        self._size = keep.size
+        # Slots were renumbered in order, so the index order holds: only slots change
+        new_slot = np.zeros(len(self._alive), dtype=np.int64)
+        new_slot[keep] = np.arange(keep.size)
+        self._order = [key[:3] + (int(new_slot[key[3]]),) for key in self._order]
+
+
+def orientation_array(orientations: Sequence[Tuple[float, float, float]]) -> np.ndarray:
+    """Build (k, 3) float array from orientation tuples"""
+    if not orientations:
+        return np.zeros((0, 3), dtype=np.float64)
+    return np.asarray(orientations, dtype=np.float64).reshape(-1, 3)
@@ -8,12 +8,17 @@ Strategy:
 4. Optimize orientation cho CARTON boxes để maximize boxes per row
 """
 
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Hashable, Optional, Tuple
 import json
 import os
 import random
 import copy
 from laff_bin_packing_3d import LAFFBinPacking3D, EmptySpace
+from box_inventory_3d import BoxInventory
+from orientation_table import get_orientations
+from placement import Placement
+from row_state_3d import RowState
+from row_pattern_cache import ROW_PATTERNS, RowPattern, lines_signature
 
 
 class GuidedPackingAlgorithm(LAFFBinPacking3D):
@@ -24,8 +29,13 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
     Override packing logic để theo pattern từ manual layout.
     """
     
-    def __init__(self, container_dims: Dict[str, float], manual_template_path: Optional[str] = None):
+    def __init__(self, container_dims: Dict[str, float], manual_template_path: Optional[str] = None,
+                 use_row_cache: bool = True, stamp_tail_rows: bool = True):
         super().__init__(container_dims)
+        # Reuse rows packed before from the same lines (shared LRU, see row_pattern_cache)
+        self.use_row_cache = use_row_cache
+        # Repeat the last row along Y once only its SKU is left (see _stamp_tail_rows)
+        self.stamp_tail_rows = stamp_tail_rows
         self.manual_template = None
         if manual_template_path:
             self.load_manual_template(manual_template_path)
@@ -92,14 +102,13 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         self._new_container()
         
         # Track remaining boxes counts (to prevent duplicates)
-        # Format: {(code, material, purchasing_doc, packing_method): remaining_qty}
+        # Format: {inventory type (type_id, see BoxInventory.type_of): remaining_qty}
         remaining_counts = {}
         for box in boxes:
             qty = box.get('quantity', 1)
             if qty == 0:
                 continue
-            key = (box.get('code', ''), box.get('material', ''), 
-                   box.get('purchasing_doc', ''), box.get('packing_method', ''))
+            key = BoxInventory.type_of(box)
             remaining_counts[key] = qty
         
         print(f"DEBUG: Total unique boxes: {len(remaining_counts)}")
@@ -120,8 +129,7 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
             # Get available boxes
             available_boxes = []
             for box in boxes:
-                key = (box.get('code', ''), box.get('material', ''), 
-                       box.get('purchasing_doc', ''), box.get('packing_method', ''))
+                key = BoxInventory.type_of(box)
                 if key in remaining_counts and remaining_counts[key] > 0:
                     # Create box copy with current remaining quantity
                     box_copy = box.copy()
@@ -147,16 +155,15 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
             # Remove placed boxes from remaining_counts
             placed_by_type = {}
             for placed_box in placed_boxes:
-                code = placed_box.get('code', 'UNKNOWN')
-                material = placed_box.get('material', '')
+                code = placed_box.code
+                material = placed_box.material
                 # Find original box to get purchasing_doc and packing_method
                 key = None
                 for orig_box in boxes:
                     if orig_box.get('code') == code and orig_box.get('material') == material:
-                        key = (orig_box.get('code', ''), orig_box.get('material', ''),
-                               orig_box.get('purchasing_doc', ''), orig_box.get('packing_method', ''))
+                        key = BoxInventory.type_of(orig_box)
                         break
-                if key:
+                if key is not None:
                     placed_by_type[key] = placed_by_type.get(key, 0) + 1
             
             for key, count in placed_by_type.items():
@@ -171,23 +178,30 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
             
             # Add placed boxes to container
             for box in placed_boxes:
-                self.current_container['boxes'].append(box)
-            
-            # Calculate max height in this row (for visualization only)
-            max_z = max(box['position']['z'] + box['dimensions']['height'] 
-                       for box in placed_boxes) if placed_boxes else 0
+                self._add_placed_box(box)
             
             # Calculate actual Y position used by this row
             # Y-axis (length): All boxes in same row have same Y position
             # Z-axis (height): Boxes are stacked vertically
             # Length of row in Y-axis = max length dimension of any box in this row
-            max_length = max(box['dimensions']['length'] for box in placed_boxes) if placed_boxes else 34.0
+            max_length = max(box.length for box in placed_boxes) if placed_boxes else 34.0
+            
+            # Max height in this row (for visualization only), read from the floor height map
+            max_z = self.height_map.top_surface(0, current_y, self.container['width'], max_length)
             current_y += max_length
             
             print(f"  -> Row height: {max_z:.1f}\" Z-axis, Y position now: {current_y:.1f}\"")
             
             row_number += 1
             
+            # Homogeneous tail: only this row's SKU is left, so the next full rows
+            # come out the same - stamp the pattern instead of packing them box by box
+            if self.stamp_tail_rows and len(placed_by_type) == 1:
+                current_y, stamped = self._stamp_tail_rows(
+                    placed_boxes, row_y, max_length, remaining_counts, next(iter(placed_by_type)), current_y
+                )
+                row_number += stamped
+            
             # Safety check: don't exceed container length
             if current_y >= self.container['length']:
                 print(f"WARNING: Stopping due to container length limit")
@@ -195,6 +209,43 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         
         return self.containers
     
+    def _stamp_tail_rows(self, placed_boxes: List[Placement], row_y: float, row_length: float,
+                         remaining_counts: Dict[Hashable, int], key: Hashable, current_y: float) -> Tuple[float, int]:
+        """
+        Repeat a single-SKU row along Y while only that SKU is left
+        
+        Full rows only: the last, partial row goes through pack_row_horizontally.
+        
+        Args:
+            placed_boxes: Row just packed (already booked out and added)
+            row_y, row_length: Y position and length of that row
+            remaining_counts: Remaining units per type
+            key: Type of the row's boxes
+            current_y: Y position of the next row
+            
+        Returns:
+            (Y position of the next row, number of rows stamped)
+        """
+        first = placed_boxes[0]
+        if any(b.code != first.code or b.material != first.material for b in placed_boxes):
+            return current_y, 0
+        if any(count > 0 for other, count in remaining_counts.items() if other != key):
+            return current_y, 0  # Other SKUs left
+        
+        pattern = RowPattern.of(placed_boxes, row_y)
+        stamped = 0
+        while remaining_counts.get(key, 0) >= len(pattern) and current_y < self.container['length']:
+            for box in pattern.place(current_y):
+                self._add_placed_box(box)
+            remaining_counts[key] -= len(pattern)
+            current_y += row_length
+            stamped += 1
+        
+        if stamped:
+            print(f"  -> Stamped {stamped} rows of {first.code} ({len(pattern)} boxes each), "
+                  f"Y position now: {current_y:.1f}\", remaining: {sum(remaining_counts.values())} boxes")
+        return current_y, stamped
+    
     def determine_dominant_length(self, boxes: List[Dict]) -> float:
         """
         Determine dominant length for row packing
@@ -238,7 +289,18 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             List[Dict]: Placed boxes
         """
-        placed_boxes = []
+        # Same lines packed before: place the cached pattern
+        cache_key = None
+        if self.use_row_cache:
+            cache_key = (type(self), lines_signature(boxes), container_height, container_width)
+            pattern = ROW_PATTERNS.get(cache_key)
+            if pattern is not None:
+                print(f"  -> Row pattern from cache ({len(pattern)} boxes)")
+                return pattern.place(row_y)
+        
+        # Placed boxes with running row aggregates (average length/width)
+        row = RowState()
+        placed_boxes = row.boxes
         
         # Sort boxes by (packing_method_priority, material, purchasing_doc, height, area, quantity)
         # Priority: PRE_PACK (0) before CARTON (1) - GLOBAL level
@@ -255,14 +317,12 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         # Determine dominant length for this row
         dominant_length = self.determine_dominant_length(boxes_sorted)
         
-        # Expand all boxes by quantity
+        # Expand all boxes by quantity (shared references, lines are not mutated)
         expanded_boxes = []
         for box in boxes_sorted:
             qty = int(box.get('quantity', 1))
-            if qty <= 0:
-                continue
-            for _ in range(qty):
-                expanded_boxes.append(box.copy())
+            if qty > 0:
+                expanded_boxes.extend([box] * qty)
         
         # Track position in row
         current_x = 0.0
@@ -270,10 +330,10 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         row_height = 0.0  # Max Z at current X-level
         
         for box in expanded_boxes:
-            # Calculate average dimensions from placed boxes
+            # Average dimensions of placed boxes (running sums)
             if placed_boxes:
-                avg_length = sum(b['dimensions']['length'] for b in placed_boxes) / len(placed_boxes)
-                avg_width = sum(b['dimensions']['width'] for b in placed_boxes) / len(placed_boxes)
+                avg_length = row.avg_length
+                avg_width = row.avg_width
             else:
                 # First box in row - use dominant_length as initial target
                 avg_length = dominant_length
@@ -351,18 +411,7 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
             
             # Place box if we found a fit
             if best_orientation and fits_current:
-                placed_box = {
-                    'code': box.get('code', 'UNKNOWN'),
-                    'dimensions': best_orientation,
-                    'position': {
-                        'x': current_x,
-                        'y': row_y,
-                        'z': current_z
-                    },
-                    'material': box.get('material', ''),
-                    'packing_method': box.get('packing_method', 'CARTON')
-                }
-                placed_boxes.append(placed_box)
+                row.add(Placement.of(box, current_x, row_y, current_z, best_orientation))
                 
                 # Update position for next box
                 box_w = best_orientation['width']
@@ -394,18 +443,7 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
                         # Try to place anyway if it fits
                         if best_orientation and fits_current:
                             # Place box despite length mismatch
-                            placed_box = {
-                                'code': box.get('code', 'UNKNOWN'),
-                                'dimensions': best_orientation,
-                                'position': {
-                                    'x': current_x,
-                                    'y': row_y,
-                                    'z': current_z
-                                },
-                                'material': box.get('material', ''),
-                                'packing_method': box.get('packing_method', 'CARTON')
-                            }
-                            placed_boxes.append(placed_box)
+                            row.add(Placement.of(box, current_x, row_y, current_z, best_orientation))
                             
                             box_w = best_orientation['width']
                             box_h = best_orientation['height']
@@ -425,6 +463,8 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
                     # No boxes placed yet, just break
                     break
         
+        if cache_key is not None:
+            ROW_PATTERNS.put(cache_key, RowPattern.of(placed_boxes, row_y))
         return placed_boxes
     
     
@@ -436,27 +476,12 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         
         CARTON: 2 orientations (luôn đứng, chỉ xoay trái/phải)
         PRE_PACK: 4 orientations (mặt width×height không chạm sàn)
+        Block (BlockBuilder): 2 orientations (upright, XY rotation only)
         
         Returns:
             List[Dict]: [{width, length, height}, ...]
         """
-        w, l, h = box['dimensions']['width'], box['dimensions']['length'], box['dimensions']['height']
-        packing_method = box.get('packing_method', 'CARTON')
-        
-        if packing_method == 'PRE_PACK':
-            # PRE_PACK: 4 orientations - loại trừ mặt (width × height) chạm sàn
-            return [
-                {'width': w, 'length': l, 'height': h},  # (w×l) chạm sàn
-                {'width': l, 'length': w, 'height': h},  # (l×w) chạm sàn - xoay 90°
-                {'width': l, 'length': h, 'height': w},  # (l×h) chạm sàn
-                {'width': h, 'length': l, 'height': w}   # (h×l) chạm sàn - xoay 90°
-            ]
-        else:
-            # CARTON: 2 orientations - luôn đứng theo height, chỉ xoay trái/phải
-            return [
-                {'width': w, 'length': l, 'height': h},  # Đứng, hướng gốc
-                {'width': l, 'length': w, 'height': h}   # Đứng, xoay 90°
-            ]
+        return get_orientations(box, 'guided')
     
     def optimize_box_orientation(self, box: Dict, available_width: float) -> Optional[Dict[str, float]]:
         """
@@ -544,7 +569,7 @@ class GuidedPackingAlgorithm(LAFFBinPacking3D):
         
         # Calculate results from first container only
         total_boxes = len(containers[0]['boxes'])
-        max_y = max(box['position']['y'] + box['dimensions']['length'] 
+        max_y = max(box.y + box.length 
                    for box in containers[0]['boxes']) if containers[0]['boxes'] else 0
         length_used = max_y - self.BUFFER_RULES['door_clearance']
         
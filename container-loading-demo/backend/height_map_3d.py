@@ -0,0 +1,89 @@
+"""
+Height Map (skyline) of the container floor
+
+2D NumPy grid over the container floor (width × length) at a configurable
+resolution. Each cell stores the top surface (highest box top) above it and is
+updated on every placement, so the questions packers keep asking:
+- "what is the top surface here?"
+- "is this footprint fully supported at height z?"
+are answered by one slice reduction over the footprint cells, independent of
+how many boxes are already in the container.
+
+Footprints are mapped to every cell they touch, so answers are exact when box
+positions fall on the grid (multiples of the resolution) and conservative
+otherwise.
+"""
+
+import math
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from placement import Placement
+
+
+class HeightMap:
+    """
+    Floor height map of one container
+
+    Args:
+        width: Container width (X axis)
+        length: Container length (Y axis)
+        resolution: Cell size in inches (default 0.5")
+    """
+
+    # Guards against float noise when a position lands exactly on a cell border
+    EPSILON = 1e-6
+
+    def __init__(self, width: float, length: float, resolution: float = 0.5):
+        self.width = width
+        self.length = length
+        self.resolution = resolution
+        self.grid = np.zeros((max(1, math.ceil(width / resolution)),
+                              max(1, math.ceil(length / resolution))), dtype=np.float64)
+
+    def clear(self):
+        self.grid.fill(0.0)
+
+    def place(self, x: float, y: float, z: float, width: float, length: float, height: float):
+        """Raise the skyline under a placed box to its top"""
+        region = self._region(x, y, width, length)
+        np.maximum(region, z + height, out=region)
+
+    def place_box(self, box: Placement):
+        """Raise the skyline for a placed box"""
+        self.place(box.x, box.y, box.z, box.width, box.length, box.height)
+
+    def rebuild(self, boxes: Iterable[Placement]):
+        """Recompute the whole map from placed boxes (after boxes were moved)"""
+        self.clear()
+        for box in boxes:
+            self.place_box(box)
+
+    def top_surface(self, x: float, y: float, width: float, length: float) -> float:
+        """Highest top surface under footprint (0.0 = floor)"""
+        region = self._region(x, y, width, length)
+        return float(region.max()) if region.size else 0.0
+
+    def surface_range(self, x: float, y: float, width: float, length: float) -> Tuple[float, float]:
+        """(lowest, highest) top surface under footprint"""
+        region = self._region(x, y, width, length)
+        if not region.size:
+            return 0.0, 0.0
+        return float(region.min()), float(region.max())
+
+    def is_supported(self, x: float, y: float, width: float, length: float, z: float,
+                     tolerance: float = 0.1) -> bool:
+        """True if every cell under footprint has its top surface at z (fully supported)"""
+        if z <= 0:
+            return True
+        low, high = self.surface_range(x, y, width, length)
+        return abs(low - z) < tolerance and abs(high - z) < tolerance
+
+    def _region(self, x: float, y: float, width: float, length: float) -> np.ndarray:
+        res = self.resolution
+        i0 = max(0, math.floor(x / res + self.EPSILON))
+        j0 = max(0, math.floor(y / res + self.EPSILON))
+        i1 = min(self.grid.shape[0], math.ceil((x + width) / res - self.EPSILON))
+        j1 = min(self.grid.shape[1], math.ceil((y + length) / res - self.EPSILON))
+        return self.grid[i0:max(i0, i1), j0:max(j0, j1)]
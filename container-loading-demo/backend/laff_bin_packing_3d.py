@@ -9,6 +9,16 @@ Implementation of LAFF heuristic for 3D container packing with Peerless rules:
 
 from typing import List, Dict, Any, Optional, Tuple
 import math
+import time
+
+from free_space_store_3d import FreeSpaceStore, orientation_array
+from maximal_space_3d import MaximalSpaceManager
+from placed_box_index_3d import PlacedBoxIndex
+from height_map_3d import HeightMap
+from fixed_point import to_ticks, size_ticks
+from block_builder_3d import is_block
+from orientation_table import table_for, ROTATED
+from placement import Placement
 
 
 class EmptySpace:
@@ -18,6 +28,9 @@ class EmptySpace:
         self.position = {'x': x, 'y': y, 'z': z}
         self.dimensions = {'width': width, 'length': length, 'height': height}
         self.volume = width * length * height
+        # (x, y, z, width, length, height) in integer ticks for exact comparisons
+        self.ticks = (to_ticks(x), to_ticks(y), to_ticks(z), to_ticks(width), to_ticks(length), to_ticks(height))
+        self.slot = None  # Row index in FreeSpaceStore (set when stored)
     
     def can_fit(self, box: Dict[str, Any], allow_rotation: bool = False, packing_method: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, float]]]:
         """
@@ -31,89 +44,22 @@ class EmptySpace:
         Returns:
             (can_fit, orientation): orientation is None if can't fit
         """
-        box_dims = box['dimensions']
-        
-        # Check orientation rules based on packing method
-        if packing_method == 'PRE_PACK':
-            # PRE_PACK: width × length must be on floor (z == 0 means floor)
-            # This means: width × length in XY plane, height in Z axis
-            # Normal orientation only, no rotation
-            if (box_dims['width'] <= self.dimensions['width'] and
-                box_dims['length'] <= self.dimensions['length'] and
-                box_dims['height'] <= self.dimensions['height']):
-                return True, box_dims
-            
-            return False, None
-            
-        elif packing_method == 'CARTON':
-            # CARTON: height dimension cannot touch floor
-            # Allowed: width × length (normal) or width × height (swap length ↔ height)
-            # NOT allowed: length × height (would put height on floor)
-            
-            # Collect all valid orientations
-            valid_orientations = []
-            
-            # Try normal orientation: width × length on floor
-            if (box_dims['width'] <= self.dimensions['width'] and
-                box_dims['length'] <= self.dimensions['length'] and
-                box_dims['height'] <= self.dimensions['height']):
-                valid_orientations.append(box_dims)
-            
-            # Try rotated orientation: swap width ↔ length (90° in XY plane)
-            if allow_rotation:
-                rotated_dims = {
-                    'width': box_dims['length'],
-                    'length': box_dims['width'],
-                    'height': box_dims['height']
-                }
-                
-                if (rotated_dims['width'] <= self.dimensions['width'] and
-                    rotated_dims['length'] <= self.dimensions['length'] and
-                    rotated_dims['height'] <= self.dimensions['height']):
-                    valid_orientations.append(rotated_dims)
-            
-            # Try alternate orientation: swap length ↔ height
-            # width × height on floor (OK for CARTON, height not on floor)
-            rotated_dims2 = {
-                'width': box_dims['width'],
-                'length': box_dims['height'],
-                'height': box_dims['length']
-            }
-            
-            if (rotated_dims2['width'] <= self.dimensions['width'] and
-                rotated_dims2['length'] <= self.dimensions['length'] and
-                rotated_dims2['height'] <= self.dimensions['height']):
-                valid_orientations.append(rotated_dims2)
-            
-            if not valid_orientations:
-                return False, None
-            
-            # Choose BEST orientation: one that fits most boxes per row
-            # Use the one with smallest width (fits most boxes horizontally)
-            best_orientation = min(valid_orientations, key=lambda o: o['width'])
-            return True, best_orientation
-        
-        else:
-            # Default behavior: try original orientation
-            if (box_dims['width'] <= self.dimensions['width'] and
-                box_dims['length'] <= self.dimensions['length'] and
-                box_dims['height'] <= self.dimensions['height']):
-                return True, box_dims
-            
-            # Try rotated orientation (90 degrees: swap width/length)
-            if allow_rotation:
-                rotated_dims = {
-                    'width': box_dims['length'],
-                    'length': box_dims['width'],
-                    'height': box_dims['height']
-                }
-                
-                if (rotated_dims['width'] <= self.dimensions['width'] and
-                    rotated_dims['length'] <= self.dimensions['length'] and
-                    rotated_dims['height'] <= self.dimensions['height']):
-                    return True, rotated_dims
-            
-            return False, None
+        table = table_for(box, packing_method or '')
+        order = table.orders['laff']
+        if not allow_rotation:
+            order = tuple(i for i in order if i != ROTATED)
+        elif packing_method not in ('PRE_PACK', 'CARTON') and not table.block:
+            order += (ROTATED,)  # Default rules: original, then rotated 90° in XY
+        
+        # PRE_PACK: width × length on floor, no rotation
+        # CARTON: height never on floor as length × height; smallest width first
+        #         (fits most boxes per row) - table order is already sorted by width
+        for index in order:
+            w, l, h = table.tuples[index]
+            if w <= self.dimensions['width'] and l <= self.dimensions['length'] and h <= self.dimensions['height']:
+                return True, table.dicts[index]
+        
+        return False, None
     
     def __str__(self):
         return f"EmptySpace(pos=({self.position['x']:.1f},{self.position['y']:.1f},{self.position['z']:.1f}), dims=({self.dimensions['width']:.1f}x{self.dimensions['length']:.1f}x{self.dimensions['height']:.1f}), vol={self.volume:.1f})"
@@ -138,7 +84,21 @@ class LAFFBinPacking3D:
         "door_clearance": 10.0              # inches clearance for container door
     }
     
-    def __init__(self, container_dims: Dict[str, float]):
+    # Empty space management:
+    # - 'guillotine': split used space into right/front/top + pairwise merge (original)
+    # - 'maximal': maximal empty spaces with dominance pruning (maximal_space_3d)
+    SPACE_BACKENDS = ('guillotine', 'maximal')
+    # Guillotine merge: positions/sizes closer than this count as equal
+    SPACE_MERGE_TOLERANCE = 0.1
+    
+    # Cell size (inches) of the floor height map kept for each container
+    HEIGHT_MAP_RESOLUTION = 0.5
+    
+    def __init__(self, container_dims: Dict[str, float], space_backend: str = 'guillotine',
+                 bulk_placement: bool = False):
+        if space_backend not in self.SPACE_BACKENDS:
+            raise ValueError(f"Unknown space_backend '{space_backend}', expected one of {self.SPACE_BACKENDS}")
+        
         self.container = {
             'width': container_dims['width'],
             'length': container_dims['length'],
@@ -146,7 +106,23 @@ class LAFFBinPacking3D:
         }
         self.containers = []
         self.current_container = None
-        self.empty_spaces = []
+        self.empty_spaces = FreeSpaceStore()
+        self.placed_index = PlacedBoxIndex()  # Support/clearance lookups for current container
+        self.height_map = self._new_height_map()  # Top surface of current container floor
+        self.space_backend = space_backend
+        self.bulk_placement = bulk_placement  # Place identical units as blocks (see _place_box_bulk)
+        self.maximal_spaces = MaximalSpaceManager(EmptySpace) if space_backend == 'maximal' else None
+        self.space_stats = {
+            'backend': space_backend,
+            'updates': 0,              # number of _update_empty_spaces calls
+            'spaces': 0,               # spaces in current container
+            'peak_spaces': 0,          # largest space list seen
+            'total_spaces': 0,         # sum of list sizes after each update (for average)
+            'update_seconds': 0.0,     # total time spent updating spaces
+            'max_update_ms': 0.0,      # slowest single update
+            'pruned': 0,               # residuals dropped (maximal backend)
+            'searches': 0              # _find_best_space calls
+        }
     
     def pack_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -161,11 +137,20 @@ class LAFFBinPacking3D:
         # Step 1: Sort boxes by area (LAFF strategy)
         sorted_boxes = self._sort_boxes_by_area(boxes)
         
+        if self.maximal_spaces is not None:
+            # Spaces thinner than the smallest box side can never be used
+            sides = [min(box['dimensions'].values()) for box in boxes if box['quantity'] > 0]
+            self.maximal_spaces.min_size = min(sides) if sides else 0.0
+        
         # Step 2: Start first container
         self._new_container()
         
         # Step 3: Place each box
         for box in sorted_boxes:
+            if self.bulk_placement:
+                self._place_box_bulk(box)
+                continue
+            
             for _ in range(box['quantity']):
                 # Find best empty space
                 best_space = self._find_best_space(box)
@@ -190,6 +175,84 @@ class LAFFBinPacking3D:
         
         return self.containers
     
+    def _place_box_bulk(self, box: Dict[str, Any]):
+        """
+        Bulk mode: place all units of one box type as blocks of identical units
+        
+        Each search picks a space exactly like the per-unit loop. The space is
+        then filled with as many units as fit on a grid - full layers if
+        possible, else rows of one layer, else a single row - and split once
+        for the whole block, so searches scale with blocks instead of units.
+        """
+        remaining = box['quantity']
+        
+        while remaining > 0:
+            best_space = self._find_best_space(box)
+            
+            if not best_space:
+                # Create new container and use its initial space
+                self._new_container()
+                if not self.empty_spaces:
+                    raise Exception(f"Box {box['code']} too large for container")
+                best_space = self.empty_spaces[0]
+            
+            _, orientation = self._can_place_box(box, best_space)
+            if orientation is None:
+                raise Exception(f"Cannot place box {box['code']} in space")
+            
+            nx, ny, nz = self._block_grid(box, best_space, orientation, remaining)
+            w, l, h = orientation['width'], orientation['length'], orientation['height']
+            x, y, z = best_space.position['x'], best_space.position['y'], best_space.position['z']
+            
+            for k in range(nz):
+                for j in range(ny):
+                    for i in range(nx):
+                        self._add_placed_box(Placement.of(box, x + i * w, y + j * l, z + k * h, orientation))
+            
+            # Split the space once for the whole block
+            block = {'width': nx * w, 'length': ny * l, 'height': nz * h}
+            self._update_empty_spaces(best_space, box, block)
+            remaining -= nx * ny * nz
+    
+    def _block_grid(self, box: Dict[str, Any], space: EmptySpace, orientation: Dict[str, float],
+                    remaining: int) -> Tuple[int, int, int]:
+        """
+        Units per axis (nx, ny, nz) of the block placed at space's origin
+        
+        The first unit is the one _find_best_space validated; the block grows
+        inside the space and container, and its bottom layer must be supported
+        wherever a single unit would need support.
+        """
+        x, y, z = space.ticks[:3]
+        limits = (
+            min(x + space.ticks[3], to_ticks(self.container['width'])) - x,
+            min(y + space.ticks[4], to_ticks(self.container['length'])) - y,
+            min(z + space.ticks[5], to_ticks(self.container['height'])) - z
+        )
+        unit = (size_ticks(orientation['width']), size_ticks(orientation['length']),
+                size_ticks(orientation['height']))
+        nx, ny, nz = (max(1, limit // size) for limit, size in zip(limits, unit))
+        
+        per_layer = nx * ny
+        if remaining >= per_layer:
+            nz = min(nz, remaining // per_layer)
+        elif remaining >= nx:
+            ny, nz = remaining // nx, 1
+        else:
+            nx, ny, nz = remaining, 1, 1
+        
+        needs_support = box['packing_method'] == 'PRE_PACK' or self.space_backend == 'maximal'
+        if needs_support and space.position['z'] > 0 and nx * ny > 1:
+            w, l, h = orientation['width'], orientation['length'], orientation['height']
+            for j in range(ny):
+                for i in range(nx):
+                    unit_space = EmptySpace(space.position['x'] + i * w, space.position['y'] + j * l,
+                                            space.position['z'], w, l, h)
+                    if not self._check_vertical_support(box, unit_space, orientation):
+                        return 1, 1, 1
+        
+        return nx, ny, nz
+    
     def _sort_boxes_by_area(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Sort boxes for optimal space usage and minimum containers
@@ -223,27 +286,47 @@ class LAFFBinPacking3D:
         1. Prioritize area (width × length) first - encourages horizontal packing
         2. Prefer shallow spaces over deep ones (avoid early stacking)
         3. This ensures we pack horizontally (width, length) before vertical (height)
+        
+        Fit is tested for all spaces and all allowed orientations in one
+        vectorized mask (FreeSpaceStore); spaces are then visited through the
+        store's persistent priority index, and only the support check for
+        stacked boxes runs per candidate space.
         """
-        # Sort spaces to maximize horizontal packing first
-        # Priority: low z, high area (width × length)
+        self.space_stats['searches'] += 1
+        orientations, check_bounds = self._fit_orientations(box)
+        bounds = ((self.container['width'], self.container['length'], self.container['height'])
+                  if check_bounds else None)
+        
+        # Maximal spaces overlap, so a space above one box may start over empty
+        # floor: every stacked placement needs support there, not only PRE_PACK
+        needs_support = box['packing_method'] == 'PRE_PACK' or self.space_backend == 'maximal'
+        
+        def has_support(slot: int, index: int) -> bool:
+            space = self.empty_spaces.space(slot)
+            if not needs_support or space.position['z'] <= 0:
+                return True
+            w, l, h = orientations[index]
+            return self._check_vertical_support(box, space, {'width': w, 'length': l, 'height': h})
+        
+        # Priority: low z, high area (width × length), then shallow spaces
         # This fills width first before stacking vertically
-        sorted_spaces = sorted(
-            self.empty_spaces,
-            key=lambda s: (
-                s.position['z'],  # Lowest z first (pack on floor first)
-                -(s.dimensions['width'] * s.dimensions['length']),  # Largest area first
-                s.dimensions['height']  # Then shallow spaces (avoid deep unnecessary height)
-            )
-        )
+        best = self.empty_spaces.best_fit(orientation_array(orientations), bounds, accept=has_support)
+        if best is None:
+            return None
         
-        for space in sorted_spaces:
-            # Check if box can fit with packing method rules
-            can_fit, orientation = self._can_place_box(box, space)
-            
-            if can_fit:
-                return space
+        return self.empty_spaces.space(best[0])
+    
+    def _fit_orientations(self, box: Dict[str, Any]) -> Tuple[List[Tuple[float, float, float]], bool]:
+        """
+        Orientations allowed for box in preference order (same rules as EmptySpace.can_fit)
         
-        return None
+        Returns:
+            (orientations, check_bounds): (width, length, height) tuples, best first,
+            and whether _can_place_box validates container bounds for this packing method
+        """
+        table = table_for(box, box['packing_method'])
+        check_bounds = table.block or table.packing_method in ('PRE_PACK', 'CARTON')
+        return list(table.orientations('laff')), check_bounds
     
     def _can_place_box(self, box: Dict[str, Any], space: EmptySpace) -> Tuple[bool, Optional[Dict[str, float]]]:
         """
@@ -258,6 +341,21 @@ class LAFFBinPacking3D:
         """
         packing_method = box['packing_method']
         
+        if is_block(box):
+            # Block: upright only, first fitting orientation in _fit_orientations order
+            for w, l, h in self._fit_orientations(box)[0]:
+                if (w > space.dimensions['width'] or l > space.dimensions['length'] or
+                        h > space.dimensions['height']):
+                    continue
+                orientation = {'width': w, 'length': l, 'height': h}
+                needs_support = packing_method == 'PRE_PACK' or self.space_backend == 'maximal'
+                if (needs_support and space.position['z'] > 0 and
+                        not self._check_vertical_support(box, space, orientation)):
+                    continue
+                if self._validate_container_bounds(space.position, orientation):
+                    return True, orientation
+            return False, None
+        
         if packing_method == 'PRE_PACK':
             # Pre Pack: width × length on floor, height vertical, no rotation
             can_fit, orientation = space.can_fit(box, allow_rotation=False, packing_method='PRE_PACK')
@@ -310,31 +408,27 @@ class LAFFBinPacking3D:
         if self.current_container is None or len(self.current_container['boxes']) == 0:
             return False  # Box is in air with no support
         
-        # Check if there's a box directly below
-        box_bottom_z = space.position['z']
-        box_top_z = space.position['z'] + orientation['height']
-        
-        for placed_box in self.current_container['boxes']:
-            placed_bottom_z = placed_box['position']['z']
-            placed_top_z = placed_box['position']['z'] + placed_box['dimensions']['height']
-            
-            # Check if boxes overlap in x,y and z ranges touch
-            if (self._boxes_overlap_xy(box, space.position, orientation, placed_box) and
-                abs(box_bottom_z - placed_top_z) < 0.1):  # Small tolerance
-                return True
+        # Nothing under the footprint reaches up to this Z: box would float
+        if self.height_map.top_surface(space.position['x'], space.position['y'],
+                                       orientation['width'], orientation['length']) < space.position['z'] - 0.1:
+            return False
         
-        return False
+        # Check if there's a box directly below: a placed box overlapping in x,y
+        # whose top touches the bottom of this box (0.1" tolerance).
+        # Only boxes bucketed under this top-Z plane and footprint are looked at.
+        return self.placed_index.has_support(
+            space.position['x'], space.position['y'], space.position['z'],
+            orientation['width'], orientation['length']
+        )
     
     def _boxes_overlap_xy(self, box1: Dict[str, Any], pos1: Dict[str, float], dims1: Dict[str, float], 
-                         box2: Dict[str, Any]) -> bool:
+                         box2: Placement) -> bool:
         """Check if two boxes overlap in x,y plane"""
         x1_min, x1_max = pos1['x'], pos1['x'] + dims1['width']
         y1_min, y1_max = pos1['y'], pos1['y'] + dims1['length']
         
-        pos2 = box2['position']
-        dims2 = box2['dimensions']
-        x2_min, x2_max = pos2['x'], pos2['x'] + dims2['width']
-        y2_min, y2_max = pos2['y'], pos2['y'] + dims2['length']
+        x2_min, x2_max = box2.x, box2.x + box2.width
+        y2_min, y2_max = box2.y, box2.y + box2.length
         
         return not (x1_max <= x2_min or x1_min >= x2_max or
                    y1_max <= y2_min or y1_min >= y2_max)
@@ -386,23 +480,31 @@ class LAFFBinPacking3D:
         if self.current_container is None or len(self.current_container['boxes']) == 0:
             return True  # No boxes yet, validation passes
         
-        for placed_box in self.current_container['boxes']:
+        # Boxes further than the largest buffer along any axis cannot violate it
+        margin = max(self.BUFFER_RULES['between_items'], self.BUFFER_RULES['between_packing_methods'])
+        nearby_boxes = self.placed_index.nearby(
+            position['x'], position['y'], position['z'],
+            orientation['width'], orientation['length'], orientation['height'],
+            margin
+        )
+        
+        for placed_box in nearby_boxes:
             # Skip buffer check if boxes are stacking directly (one on top of other with same x,y)
             # In this case, the empty space IS the top of the placed box
-            if (abs(position['x'] - placed_box['position']['x']) < 0.1 and
-                abs(position['y'] - placed_box['position']['y']) < 0.1 and
-                abs(position['z'] - (placed_box['position']['z'] + placed_box['dimensions']['height'])) < 0.1):
+            if (abs(position['x'] - placed_box.x) < 0.1 and
+                abs(position['y'] - placed_box.y) < 0.1 and
+                abs(position['z'] - (placed_box.z + placed_box.height)) < 0.1):
                 continue  # This is the top space of the placed box, no buffer needed
             
             # Calculate distance between the new box position and placed box
             distance = self._calculate_distance(
                 position, 
                 orientation,
-                placed_box['position'],
-                placed_box['dimensions']
+                placed_box.position,
+                placed_box.dimensions
             )
             
-            if box['packing_method'] != placed_box['packing_method']:
+            if box['packing_method'] != placed_box.packing_method:
                 required_buffer = self.BUFFER_RULES['between_packing_methods']
             else:
                 required_buffer = self.BUFFER_RULES['between_items']
@@ -464,23 +566,53 @@ class LAFFBinPacking3D:
             raise Exception(f"Cannot place box {box['code']} in space")
         
         # Create box instance
-        box_instance = {
-            'code': box['code'],
-            'dimensions': orientation,
-            'position': space.position.copy(),
-            'material': box['material'],
-            'packing_method': box['packing_method']
-        }
+        pos = space.position
+        box_instance = Placement.of(box, pos['x'], pos['y'], pos['z'], orientation)
         
-        self.current_container['boxes'].append(box_instance)
+        self._add_placed_box(box_instance)
         
         return orientation
     
+    def _add_placed_box(self, box_instance: Placement):
+        """Append a placed box to current container and keep its lookups in sync"""
+        self.current_container['boxes'].append(box_instance)
+        self.placed_index.add(box_instance)
+        self.height_map.place_box(box_instance)
+    
     def _update_empty_spaces(self, used_space: EmptySpace, box: Dict[str, Any], orientation: Dict[str, float]):
         """
-        Update empty spaces after placing box
+        Update empty spaces after placing box (dispatch on space_backend)
+        
+        Records space-count and timing stats in self.space_stats.
+        """
+        start = time.perf_counter()
         
-        Strategy: Split used space into 3 new spaces (right, front, top)
+        if self.space_backend == 'maximal':
+            self.maximal_spaces.place(self.empty_spaces, used_space.position, orientation)
+            self.space_stats['pruned'] = self.maximal_spaces.pruned
+        else:
+            self._split_and_merge_spaces(used_space, orientation)
+        
+        elapsed = time.perf_counter() - start
+        stats = self.space_stats
+        stats['updates'] += 1
+        stats['spaces'] = len(self.empty_spaces)
+        stats['peak_spaces'] = max(stats['peak_spaces'], stats['spaces'])
+        stats['total_spaces'] += stats['spaces']
+        stats['update_seconds'] += elapsed
+        stats['max_update_ms'] = max(stats['max_update_ms'], elapsed * 1000)
+    
+    def get_space_stats(self) -> Dict[str, Any]:
+        """Space-count and timing stats of the last packing run"""
+        stats = dict(self.space_stats)
+        stats['avg_spaces'] = stats['total_spaces'] / stats['updates'] if stats['updates'] else 0.0
+        stats['avg_update_ms'] = stats['update_seconds'] * 1000 / stats['updates'] if stats['updates'] else 0.0
+        return stats
+    
+    def _split_and_merge_spaces(self, used_space: EmptySpace, orientation: Dict[str, float]):
+        """
+        Guillotine backend: split used space into 3 new spaces (right, front, top),
+        then merge adjacent spaces
         """
         # Remove used space
         self.empty_spaces.remove(used_space)
@@ -524,88 +656,12 @@ class LAFFBinPacking3D:
         # Add new spaces
         self.empty_spaces.extend(new_spaces)
         
-        # Merge overlapping spaces (optimization)
-        self.empty_spaces = self._merge_spaces(self.empty_spaces)
+        # Merge spaces that line up on one axis (optimization, prevents many
+        # small spaces); the store merges in place and keeps its index in sync
+        self.empty_spaces.merge_adjacent(self.SPACE_MERGE_TOLERANCE, EmptySpace)
     
-    def _merge_spaces(self, spaces: List[EmptySpace]) -> List[EmptySpace]:
-        """
-        Merge overlapping empty spaces to reduce fragmentation
-        
-        This is an optimization to prevent too many small spaces
-        """
-        if len(spaces) <= 1:
-            return spaces
-        
-        merged = []
-        used = set()
-        
-        for i, space1 in enumerate(spaces):
-            if i in used:
-                continue
-            
-            merged_space = space1
-            used.add(i)
-            
-            # Try to merge with other spaces
-            for j, space2 in enumerate(spaces[i+1:], i+1):
-                if j in used:
-                    continue
-                
-                # Check if spaces can be merged (adjacent or overlapping)
-                if self._can_merge_spaces(merged_space, space2):
-                    merged_space = self._merge_two_spaces(merged_space, space2)
-                    used.add(j)
-            
-            merged.append(merged_space)
-        
-        return merged
-    
-    def _can_merge_spaces(self, space1: EmptySpace, space2: EmptySpace) -> bool:
-        """Check if two spaces can be merged"""
-        # Simple check: if spaces are adjacent in one dimension
-        # and have same dimensions in other dimensions
-        
-        # Check x-axis merge
-        if (abs(space1.position['y'] - space2.position['y']) < 0.1 and
-            abs(space1.position['z'] - space2.position['z']) < 0.1 and
-            abs(space1.dimensions['length'] - space2.dimensions['length']) < 0.1 and
-            abs(space1.dimensions['height'] - space2.dimensions['height']) < 0.1):
-            return True
-        
-        # Check y-axis merge
-        if (abs(space1.position['x'] - space2.position['x']) < 0.1 and
-            abs(space1.position['z'] - space2.position['z']) < 0.1 and
-            abs(space1.dimensions['width'] - space2.dimensions['width']) < 0.1 and
-            abs(space1.dimensions['height'] - space2.dimensions['height']) < 0.1):
-            return True
-        
-        # Check z-axis merge
-        if (abs(space1.position['x'] - space2.position['x']) < 0.1 and
-            abs(space1.position['y'] - space2.position['y']) < 0.1 and
-            abs(space1.dimensions['width'] - space2.dimensions['width']) < 0.1 and
-            abs(space1.dimensions['length'] - space2.dimensions['length']) < 0.1):
-            return True
-        
-        return False
-    
-    def _merge_two_spaces(self, space1: EmptySpace, space2: EmptySpace) -> EmptySpace:
-        """Merge two spaces into one"""
-        # Find the bounding box of both spaces
-        min_x = min(space1.position['x'], space2.position['x'])
-        min_y = min(space1.position['y'], space2.position['y'])
-        min_z = min(space1.position['z'], space2.position['z'])
-        
-        max_x = max(space1.position['x'] + space1.dimensions['width'],
-                   space2.position['x'] + space2.dimensions['width'])
-        max_y = max(space1.position['y'] + space1.dimensions['length'],
-                   space2.position['y'] + space2.dimensions['length'])
-        max_z = max(space1.position['z'] + space1.dimensions['height'],
-                   space2.position['z'] + space2.dimensions['height'])
-        
-        return EmptySpace(
-            min_x, min_y, min_z,
-            max_x - min_x, max_y - min_y, max_z - min_z
-        )
+    def _new_height_map(self) -> HeightMap:
+        return HeightMap(self.container['width'], self.container['length'], self.HEIGHT_MAP_RESOLUTION)
     
     def _new_container(self):
         """Create new container and initialize empty spaces"""
@@ -615,16 +671,18 @@ class LAFFBinPacking3D:
             'dimensions': self.container
         }
         self.containers.append(self.current_container)
+        self.placed_index = PlacedBoxIndex()
+        self.height_map = self._new_height_map()
         
         # Initialize with one large empty space
-        self.empty_spaces = [EmptySpace(
+        self.empty_spaces = FreeSpaceStore([EmptySpace(
             self.BUFFER_RULES['container_walls'],
             self.BUFFER_RULES['door_clearance'],
             0,
             self.container['width'] - 2 * self.BUFFER_RULES['container_walls'],
             self.container['length'] - self.BUFFER_RULES['door_clearance'] - self.BUFFER_RULES['container_walls'],
             self.container['height'] - self.BUFFER_RULES['container_walls']
-        )]
+        )])
     
     def calculate_utilization(self, container: Dict[str, Any]) -> float:
         """Calculate space utilization percentage"""
@@ -633,9 +691,9 @@ class LAFFBinPacking3D:
                        container['dimensions']['height'])
         
         used_volume = sum(
-            box['dimensions']['width'] * 
-            box['dimensions']['length'] * 
-            box['dimensions']['height']
+            box.width * 
+            box.length * 
+            box.height
             for box in container['boxes']
         )
         
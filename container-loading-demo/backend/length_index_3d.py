@@ -0,0 +1,101 @@
+"""
+Length Index - orientation lengths of a row's candidate boxes
+
+Row packers pick a dominant length and keep only units with an orientation
+whose length is within a tolerance of it, relaxing the tolerance when too
+few units pass. Scanning every unit and every orientation once per
+tolerance made each retry as expensive as the first. Here the work is done
+per distinct order line instead of per unit:
+- length_histogram: units and codes per orientation length, weighted by
+  quantity, from one pass over the distinct lines
+- LengthIndex: the orientation lengths of the distinct lines, sorted, so a
+  tolerance band around a length is a bisect range query
+
+Units expanded from a line are shared references to the line dict, so a
+unit matches exactly when its line does.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+# Widens range queries so float rounding of (length ± tolerance) never
+# drops a match; candidates are checked exactly afterwards
+_EPSILON = 1e-9
+
+Orientations = Callable[[Dict[str, Any]], List[Dict[str, float]]]
+
+
+def distinct_lines(boxes: Iterable[Dict[str, Any]]) -> List[List[Any]]:
+    """[line, times listed] per distinct line dict, in first-seen order"""
+    seen: Dict[int, List[Any]] = {}
+    for box in boxes:
+        entry = seen.get(id(box))
+        if entry is None:
+            seen[id(box)] = [box, 1]
+        else:
+            entry[1] += 1
+    return list(seen.values())
+
+
+def length_histogram(boxes: Iterable[Dict[str, Any]], orientations: Orientations) -> Dict[float, Dict[str, Any]]:
+    """
+    Units per orientation length, same as counting every listed box
+
+    Every listed box counts its quantity once per orientation with that
+    length (lines listed several times, e.g. expanded units, count every
+    time).
+
+    Args:
+        boxes: Order lines or expanded units
+        orientations: box -> list of {width, length, height}
+
+    Returns:
+        Dict: {length: {'count', 'boxes' (codes), 'total_width'}} in first-seen order
+    """
+    histogram: Dict[float, Dict[str, Any]] = {}
+    for box, times in distinct_lines(boxes):
+        count = box.get('quantity', 1) * times
+        for orientation in orientations(box):
+            entry = histogram.get(orientation['length'])
+            if entry is None:
+                entry = histogram[orientation['length']] = {'count': 0, 'boxes': set(), 'total_width': 0.0}
+            entry['count'] += count
+            entry['boxes'].add(box.get('code', ''))
+            entry['total_width'] += orientation['width'] * count
+    return histogram
+
+
+class LengthIndex:
+    """
+    Sorted orientation lengths of the distinct lines among boxes
+
+    Args:
+        boxes: Order lines or expanded units (shared line dicts)
+        orientations: box -> list of {width, length, height}
+    """
+
+    def __init__(self, boxes: Iterable[Dict[str, Any]], orientations: Orientations):
+        entries = sorted(
+            (orientation['length'], i, id(box))
+            for i, (box, _) in enumerate(distinct_lines(boxes))
+            for orientation in orientations(box)
+        )
+        self.lengths = [length for length, _, _ in entries]
+        self._ids = [box_id for _, _, box_id in entries]
+
+    def matching(self, allowed_lengths: Iterable[float], tolerance: float) -> Set[int]:
+        """ids of the lines with an orientation length within tolerance of any allowed length"""
+        ids: Set[int] = set()
+        for allowed in allowed_lengths:
+            lo = bisect_left(self.lengths, allowed - tolerance - _EPSILON)
+            hi = bisect_right(self.lengths, allowed + tolerance + _EPSILON)
+            for i in range(lo, hi):
+                if abs(self.lengths[i] - allowed) <= tolerance:
+                    ids.add(self._ids[i])
+        return ids
+
+    def filter(self, boxes: Iterable[Dict[str, Any]], allowed_lengths: Iterable[float],
+               tolerance: float) -> List[Dict[str, Any]]:
+        """Boxes (in order) with an orientation length within tolerance of any allowed length"""
+        ids = self.matching(allowed_lengths, tolerance)
+        return [box for box in boxes if id(box) in ids]
@@ -0,0 +1,99 @@
+"""
+Order Normalizer - preprocessing stage in front of /calculate
+
+Turns the incoming Box lines into canonical lines before any algorithm runs:
+- Canonical fields only: dimensions as floats, integer quantity, stripped and
+  interned strings (packing_method upper-cased), lines with quantity <= 0
+  dropped
+- Lines that are identical (code, dimensions, packing_method, material,
+  purchasing_doc, sort_order) are merged into one line with the summed
+  quantity
+- Every line gets an integer 'type_id' for its inventory type (code, material,
+  purchasing_doc, packing_method): BoxInventory and the row packers count
+  remaining units per type_id instead of hashing those four strings. Lines
+  that only differ in dims or sort_order share a type, as they always did
+  in the inventory; the code stays part of it, since every placed unit is
+  booked back against its own label
+
+Codes are part of the merge key so every placed unit keeps its own label.
+Packers expand lines into shared references to the canonical line dicts, so
+the lines must not be mutated after normalization.
+"""
+
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+# Box fields kept on a canonical line (besides dimensions/quantity/sort_order/type_id)
+STRING_FIELDS = ('code', 'material', 'packing_method', 'case_pack', 'purchasing_doc', 'building_door')
+
+
+def _intern(value: Any) -> str:
+    return sys.intern(str(value).strip()) if value is not None else ''
+
+
+def type_key(box: Dict[str, Any]) -> Tuple:
+    """Physical type of a line: (width, length, height, packing_method, material, purchasing_doc, sort_order)"""
+    dims = box['dimensions']
+    return (dims['width'], dims['length'], dims['height'], box.get('packing_method', ''),
+            box.get('material', ''), box.get('purchasing_doc', ''), box.get('sort_order'))
+
+
+def inventory_key(box: Dict[str, Any]) -> Tuple:
+    """Inventory type of a line: (code, material, purchasing_doc, packing_method)"""
+    return (box.get('code', ''), box.get('material', ''),
+            box.get('purchasing_doc', ''), box.get('packing_method', ''))
+
+
+def canonical_line(box: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonical copy of one Box line (no type_id yet)
+
+    Args:
+        box: Box line as received (dimensions, quantity, code, material, ...)
+
+    Returns:
+        Dict: New line with only the known fields, in canonical form
+    """
+    dims = box['dimensions']
+    line = {field: _intern(box.get(field, '')) for field in STRING_FIELDS}
+    line['packing_method'] = sys.intern(line['packing_method'].upper())
+    line['dimensions'] = {
+        'width': float(dims['width']),
+        'length': float(dims['length']),
+        'height': float(dims['height'])
+    }
+    line['quantity'] = int(box.get('quantity', 1))
+    sort_order = box.get('sort_order')
+    line['sort_order'] = int(sort_order) if sort_order is not None else None
+    return line
+
+
+def normalize_order(boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Canonicalize, merge and type the Box lines of one request
+
+    Args:
+        boxes: Box lines from the request
+
+    Returns:
+        List[Dict]: Canonical lines with 'type_id', in first-seen order
+    """
+    lines: Dict[Tuple, Dict[str, Any]] = {}
+    type_ids: Dict[Tuple, int] = {}
+
+    for box in boxes:
+        line = canonical_line(box)
+        if line['quantity'] <= 0:
+            continue
+
+        key = type_key(line)
+        merged = lines.get((line['code'],) + key)
+        if merged is not None:
+            merged['quantity'] += line['quantity']
+            continue
+
+        line['type_id'] = type_ids.setdefault(inventory_key(line), len(type_ids))
+        lines[(line['code'],) + key] = line
+
+    return list(lines.values())
@@ -0,0 +1,155 @@
+"""
+Orientation Table - per-SKU orientations and rules shared by all packers
+
+Every distinct (dimensions, packing_method) gets one compiled table, built
+once and cached: the 6 axis permutations as (width, length, height) tuples,
+a rule bitmask per packer policy, and the allowed orientations in that
+policy's preference order. Packers look orientations up instead of rebuilding
+dicts and re-applying the PRE_PACK/CARTON rules inside their loops.
+
+Permutation indices (of the original width w, length l, height h):
+    0 = (w, l, h)  original
+    1 = (l, w, h)  rotated 90° in XY
+    2 = (w, h, l)  swap length ↔ height
+    3 = (h, w, l)  rotate + swap
+    4 = (l, h, w)  rotate + swap
+    5 = (h, l, w)  full rotation
+
+Policies (rules of each packer, duplicates kept when w == l etc.):
+    laff          PRE_PACK {0}; CARTON {0, 1, 2} smallest width first; other {0}
+    z_first       PRE_PACK {0, 1} + {4, 5} if h > l; other {0, 1}
+    guided        PRE_PACK {0, 1, 4, 5}; other {0, 1}
+    simple_index  all 6
+Stacked blocks (BlockBuilder) stay upright in every policy: {0, 1}.
+
+Orientation dicts handed out are cached and shared - treat them as read-only.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from block_builder_3d import is_block
+
+
+# Axis order of each permutation, as indices into (w, l, h)
+PERMUTATIONS = ((0, 1, 2), (1, 0, 2), (0, 2, 1), (2, 0, 1), (1, 2, 0), (2, 1, 0))
+
+ORIGINAL = 0
+ROTATED = 1  # 90° in XY
+
+POLICIES = ('laff', 'z_first', 'guided', 'simple_index')
+
+# Policies whose preference is "smallest width first" (stable on ties)
+_SORTED_BY_WIDTH = ('laff',)
+
+
+class OrientationTable:
+    """
+    Compiled orientations and rules of one box type
+
+    Args:
+        width, length, height: Box dimensions
+        packing_method: 'PRE_PACK', 'CARTON' or other (default rules)
+        block: True for stacked blocks (upright only)
+    """
+
+    __slots__ = ('dims', 'packing_method', 'block', 'tuples', 'masks', 'orders', 'dicts', '_tuples', '_dicts')
+
+    def __init__(self, width: float, length: float, height: float, packing_method: str, block: bool = False):
+        self.dims = (width, length, height)
+        self.packing_method = packing_method
+        self.block = block
+        self.tuples = tuple(tuple(self.dims[axis] for axis in perm) for perm in PERMUTATIONS)
+        self.dicts = tuple({'width': w, 'length': l, 'height': h} for w, l, h in self.tuples)
+
+        self.orders: Dict[str, Tuple[int, ...]] = {}
+        self.masks: Dict[str, int] = {}
+        for policy in POLICIES:
+            order = self._rule_order(policy)
+            if policy in _SORTED_BY_WIDTH:
+                order = tuple(sorted(order, key=lambda i: self.tuples[i][0]))
+            self.orders[policy] = order
+            self.masks[policy] = sum(1 << i for i in set(order))
+
+        self._tuples = {policy: tuple(self.tuples[i] for i in order) for policy, order in self.orders.items()}
+        self._dicts = {policy: tuple(self.dicts[i] for i in order) for policy, order in self.orders.items()}
+
+    def _rule_order(self, policy: str) -> Tuple[int, ...]:
+        """Allowed permutation indices of policy in the packer's own order"""
+        if self.block:
+            return (0, 1)  # Stacked block: upright, XY rotation only
+
+        pre_pack = self.packing_method == 'PRE_PACK'
+        if policy == 'laff':
+            if pre_pack:
+                return (0,)
+            if self.packing_method == 'CARTON':
+                return (0, 1, 2)  # Height never on the floor as length × height
+            return (0,)
+        if policy == 'z_first':
+            if pre_pack:
+                # Swap orientations (L×H, W) and (H×L, W) only when Height > Length
+                return (0, 1, 4, 5) if self.dims[2] > self.dims[1] else (0, 1)
+            return (0, 1)
+        if policy == 'guided':
+            return (0, 1, 4, 5) if pre_pack else (0, 1)
+        if policy == 'simple_index':
+            return (0, 1, 2, 3, 4, 5)
+        raise ValueError(f"Unknown orientation policy: {policy}")
+
+    def allows(self, policy: str, index: int) -> bool:
+        """True if permutation index is allowed by policy"""
+        return bool(self.masks[policy] >> index & 1)
+
+    def orientations(self, policy: str) -> Tuple[Tuple[float, float, float], ...]:
+        """Allowed (width, length, height) tuples, preferred first"""
+        return self._tuples[policy]
+
+    def orientation_dicts(self, policy: str) -> Tuple[Dict[str, float], ...]:
+        """Allowed orientations as shared {width, length, height} dicts, preferred first"""
+        return self._dicts[policy]
+
+
+@lru_cache(maxsize=4096)
+def orientation_table(width: float, length: float, height: float, packing_method: str,
+                      block: bool = False) -> OrientationTable:
+    """Cached OrientationTable for one (dims, packing_method, block) key"""
+    return OrientationTable(width, length, height, packing_method, block)
+
+
+def table_for(box: Dict[str, Any], packing_method: Optional[str] = None) -> OrientationTable:
+    """
+    Orientation table of a box line
+
+    Args:
+        box: Box with dimensions (and packing_method), or a Placement (its order line is used)
+        packing_method: Override the box's packing_method (default: box['packing_method'] or CARTON)
+
+    Returns:
+        OrientationTable: Shared, cached table
+    """
+    line = getattr(box, 'line', None)
+    if line is not None:
+        box = line
+    dims = box['dimensions']
+    if packing_method is None:
+        packing_method = box.get('packing_method', 'CARTON')
+    return orientation_table(dims['width'], dims['length'], dims['height'], packing_method, is_block(box))
+
+
+def get_orientations(box: Dict[str, Any], policy: str) -> List[Dict[str, float]]:
+    """
+    Allowed orientation dicts of box under policy (new list, shared dicts)
+
+    A placement gets the orientations its order line allows (block and
+    PRE_PACK rules), with its current orientation moved to the front, so
+    re-placing a box tries the way it already stands first.
+    """
+    orientations = list(table_for(box).orientation_dicts(policy))
+    if getattr(box, 'line', None) is not None:
+        current = (box.width, box.length, box.height)
+        for i, orientation in enumerate(orientations):
+            if (orientation['width'], orientation['length'], orientation['height']) == current:
+                orientations.insert(0, orientations.pop(i))
+                break
+    return orientations
@@ -2,9 +2,12 @@
 Output Formatter cho 3D Bin Packing - Format giống hình mẫu
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from collections import Counter
 
+from fixed_point import to_ticks, TICKS_PER_INCH
+from placement import Placement
+
 
 class OutputFormatter3D:
     """Format output thành cấu trúc grid như hình mẫu"""
@@ -57,7 +60,7 @@ class OutputFormatter3D:
         
         return result
     
-    def _create_grid_from_boxes(self, boxes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    def _create_grid_from_boxes(self, boxes: List[Placement]) -> Dict[Tuple[int, int], Dict[str, Any]]:
         """
         Tạo grid structure từ danh sách boxes
         
@@ -65,95 +68,92 @@ class OutputFormatter3D:
         """
         # Group boxes by x, y position to create cells
         cells = {}
+        grid_ticks = 20 * TICKS_PER_INCH
         
         for box in boxes:
-            # Round position to create grid cells (grid size ~20")
-            cell_x = round(box['position']['x'] / 20) * 20
-            cell_y = round(box['position']['y'] / 20) * 20
+            # Round position (in ticks) to create grid cells (grid size ~20")
+            cell_x = round(to_ticks(box.x) / grid_ticks) * 20
+            cell_y = round(to_ticks(box.y) / grid_ticks) * 20
             
-            cell_key = f"{cell_x},{cell_y}"
+            cell_key = (cell_x, cell_y)
             
             if cell_key not in cells:
                 cells[cell_key] = {
                     'boxes': [],
                     'position': {'x': cell_x, 'y': cell_y},
-                    'columns': []  # Will be populated based on box codes
+                    'columns': [],  # Will be populated based on box codes
+                    # Running span of boxes in this cell: [min_x, max_x, min_y, max_y, min_z, max_z]
+                    'extent': [box.x, box.x + box.width,
+                               box.y, box.y + box.length,
+                               box.z, box.z + box.height]
                 }
             
-            cells[cell_key]['boxes'].append(box)
+            cell = cells[cell_key]
+            cell['boxes'].append(box)
+            
+            extent = cell['extent']
+            extent[0] = min(extent[0], box.x)
+            extent[1] = max(extent[1], box.x + box.width)
+            extent[2] = min(extent[2], box.y)
+            extent[3] = max(extent[3], box.y + box.length)
+            extent[4] = min(extent[4], box.z)
+            extent[5] = max(extent[5], box.z + box.height)
         
         # Add column information based on box codes
         for cell_key, cell in cells.items():
-            cell['columns'] = sorted(set(box['code'] for box in cell['boxes']))
+            cell['columns'] = sorted(set(box.code for box in cell['boxes']))
         
         return cells
     
-    def _group_into_rows(self, cells: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _group_into_rows(self, cells: Dict[Tuple[int, int], Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Group cells into rows based on height"""
         rows = []
         
         # Group cells by similar y position (front-to-back)
-        y_positions = sorted(set(cell['position']['y'] for cell in cells.values()))
+        cells_by_y = {}
+        for cell in cells.values():
+            cells_by_y.setdefault(cell['position']['y'], []).append(cell)
         
-        for y_pos in y_positions:
-            row_cells = [cell for cell in cells.values() 
-                        if cell['position']['y'] == y_pos]
+        for y_pos in sorted(cells_by_y):
+            row_cells = cells_by_y[y_pos]
             
             # Calculate row height (max of cells in this row)
-            # NOTE: Each cell may have stacked boxes at multiple z-levels
-            # For each cell, calculate the maximum z-position + height of all boxes
+            # NOTE: Each cell may have stacked boxes at multiple z-levels;
+            # the top of the tallest stack is kept in the cell extent
             row_height = 0
             for cell in row_cells:
-                if not cell['boxes']:
-                    continue
-                
-                # Find the top of the tallest stack in this cell
-                max_z_with_height = 0
-                for box in cell['boxes']:
-                    top_z = box['position']['z'] + box['dimensions']['height']
-                    max_z_with_height = max(max_z_with_height, top_z)
-                
-                # Cell height = distance from z=0 to top of tallest box
-                cell_height = max_z_with_height
-                row_height = max(row_height, cell_height)
+                if cell['boxes']:
+                    row_height = max(row_height, cell['extent'][5])
             
             # Format cells
             formatted_cells = []
             for i, cell in enumerate(sorted(row_cells, key=lambda c: c['position']['x'])):
                 content = self._aggregate_boxes(cell['boxes'])
                 
-                # Calculate cell dimensions from boxes
+                # Calculate cell dimensions from actual span of boxes in this cell
                 if cell['boxes']:
-                    # Calculate actual span of boxes in this cell
-                    min_x = min(box['position']['x'] for box in cell['boxes'])
-                    max_x = max(box['position']['x'] + box['dimensions']['width'] for box in cell['boxes'])
-                    min_y = min(box['position']['y'] for box in cell['boxes'])
-                    max_y = max(box['position']['y'] + box['dimensions']['length'] for box in cell['boxes'])
-                    
+                    min_x, max_x, min_y, max_y, min_z, max_z = cell['extent']
                     cell_width = max_x - min_x
                     cell_length = max_y - min_y
+                    cell_height = max_z - min_z
+                    
+                    # Actual cell position from real box positions
+                    actual_min_x = min_x
+                    actual_min_y = min_y
                 else:
                     cell_width = 20
                     cell_length = 20
+                    cell_height = 0
+                    actual_min_x = cell['position']['x']
+                    actual_min_y = cell['position']['y']
                 
-                # Calculate actual cell position from real box positions
-                actual_min_x = min(box['position']['x'] for box in cell['boxes']) if cell['boxes'] else cell['position']['x']
-                actual_min_y = min(box['position']['y'] for box in cell['boxes']) if cell['boxes'] else cell['position']['y']
-                
-                # Calculate cell height
-                cell_height = 0
-                if cell['boxes']:
-                    min_z = min(box['position']['z'] for box in cell['boxes'])
-                    max_z = max(box['position']['z'] + box['dimensions']['height'] for box in cell['boxes'])
-                    cell_height = max_z - min_z
-                
-                # Get detailed box information
+                # Get detailed box information (Placement -> JSON dicts)
                 boxes_info = []
                 for box in cell['boxes']:
                     boxes_info.append({
-                        'code': box['code'],
-                        'dimensions': box['dimensions'],
-                        'position': box['position']
+                        'code': box.code,
+                        'dimensions': box.dimensions,
+                        'position': box.position
                     })
                 
                 formatted_cells.append({
@@ -179,11 +179,11 @@ class OutputFormatter3D:
         
         return rows
     
-    def _aggregate_boxes(self, boxes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _aggregate_boxes(self, boxes: List[Placement]) -> Dict[str, Any]:
         """
         Aggregate boxes thành format: 1A+1B+3C+9D
         """
-        code_counts = Counter([box['code'] for box in boxes])
+        code_counts = Counter([box.code for box in boxes])
         
         # Sort by box order (A -> K2)
         sorted_codes = sorted(code_counts.items(), 
@@ -202,21 +202,16 @@ class OutputFormatter3D:
         if not container['boxes']:
             return 0.0
         
-        used_volume = sum(
-            box['dimensions']['width'] * 
-            box['dimensions']['length'] * 
-            box['dimensions']['height']
-            for box in container['boxes']
-        )
+        used_volume = sum(box.width * box.length * box.height for box in container['boxes'])
         
         # Calculate actual bounding box of used space
         if container['boxes']:
-            min_x = min(box['position']['x'] for box in container['boxes'])
-            max_x = max(box['position']['x'] + box['dimensions']['width'] for box in container['boxes'])
-            min_y = min(box['position']['y'] for box in container['boxes'])
-            max_y = max(box['position']['y'] + box['dimensions']['length'] for box in container['boxes'])
-            min_z = min(box['position']['z'] for box in container['boxes'])
-            max_z = max(box['position']['z'] + box['dimensions']['height'] for box in container['boxes'])
+            min_x = min(box.x for box in container['boxes'])
+            max_x = max(box.x + box.width for box in container['boxes'])
+            min_y = min(box.y for box in container['boxes'])
+            max_y = max(box.y + box.length for box in container['boxes'])
+            min_z = min(box.z for box in container['boxes'])
+            max_z = max(box.z + box.height for box in container['boxes'])
             
             actual_width = max_x - min_x
             actual_length = max_y - min_y
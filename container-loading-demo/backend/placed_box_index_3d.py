@@ -0,0 +1,93 @@
+"""
+Placed Box Index - bucketed spatial index over boxes already in a container
+
+Used by LAFF support and clearance checks instead of looping over every box in
+current_container['boxes'] for each candidate space:
+- Support: boxes bucketed by (top-Z plane, XY grid cell), so "is there a box
+  whose top touches z under this footprint" only looks at a few buckets
+- Clearance: boxes bucketed by XY grid cell, so buffer checks only see boxes
+  within the buffer distance of the footprint
+"""
+
+import math
+from typing import Dict, Iterator, List, Tuple
+
+from placement import Placement
+
+
+class PlacedBoxIndex:
+    """
+    Spatial hash of placed boxes
+
+    Args:
+        cell_size: XY grid cell size in inches
+        z_tolerance: Max gap between a box bottom and a top surface that still
+                     counts as touching (same 0.1" as _check_vertical_support)
+    """
+
+    def __init__(self, cell_size: float = 12.0, z_tolerance: float = 0.1):
+        self.cell_size = cell_size
+        self.z_tolerance = z_tolerance
+        self._cells: Dict[Tuple[int, int], List[Placement]] = {}
+        self._top_cells: Dict[Tuple[int, int, int], List[Placement]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, box: Placement):
+        """Index a placed box"""
+        top_key = self._z_bucket(box.z + box.height)
+
+        for cell in self._footprint_cells(box.x, box.y, box.width, box.length):
+            self._cells.setdefault(cell, []).append(box)
+            self._top_cells.setdefault((top_key,) + cell, []).append(box)
+        self._count += 1
+
+    def has_support(self, x: float, y: float, z: float, width: float, length: float) -> bool:
+        """
+        True if a placed box overlaps footprint (x, y, width, length) in XY and
+        its top is within z_tolerance of z
+        """
+        x1, y1 = x + width, y + length
+        cells = self._footprint_cells(x, y, width, length)
+        for top_key in range(self._z_bucket(z - self.z_tolerance), self._z_bucket(z + self.z_tolerance) + 1):
+            for cell in cells:
+                for placed in self._top_cells.get((top_key,) + cell, ()):
+                    if abs(z - (placed.z + placed.height)) >= self.z_tolerance:
+                        continue
+                    if (x1 <= placed.x or x >= placed.x + placed.width or
+                            y1 <= placed.y or y >= placed.y + placed.length):
+                        continue
+                    return True
+        return False
+
+    def nearby(self, x: float, y: float, z: float, width: float, length: float, height: float,
+               margin: float) -> Iterator[Placement]:
+        """
+        Placed boxes that may be closer than `margin` to the given cuboid
+
+        Boxes further away than `margin` along any axis are never returned.
+        """
+        seen = set()
+        z0, z1 = z - margin, z + height + margin
+        for cell in self._footprint_cells(x - margin, y - margin, width + 2 * margin, length + 2 * margin):
+            for placed in self._cells.get(cell, ()):
+                key = id(placed)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if placed.z > z1 or placed.z + placed.height < z0:
+                    continue
+                yield placed
+
+    def _z_bucket(self, z: float) -> int:
+        return math.floor(z / self.z_tolerance)
+
+    def _footprint_cells(self, x: float, y: float, width: float, length: float) -> List[Tuple[int, int]]:
+        size = self.cell_size
+        cx0, cy0 = math.floor(x / size), math.floor(y / size)
+        # Boxes that end exactly on a cell border do not enter the next cell
+        cx1 = max(cx0, math.ceil((x + width) / size) - 1)
+        cy1 = max(cy0, math.ceil((y + length) / size) - 1)
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
@@ -0,0 +1,112 @@
+"""
+Placement - compact record of one placed box
+
+Packers used to store every placed box as a dict with nested 'position' and
+'dimensions' dicts (three dicts per box). A Placement keeps the same data in
+__slots__: code/material/packing_method point to the (interned) strings of the
+order line, position and size are plain floats. 'line' keeps a reference to
+the order line itself, so orientations of a placed box are always derived
+from the line (original dims, packing_method, block marker), never from its
+current, possibly rotated size.
+
+Packers, BlockBuilder and OutputFormatter3D read the attributes directly.
+JSON dicts are only built at the API boundary (to_dict, used by the
+formatter). Read-only dict-style access (p['position']['x'], p.get('code'))
+is kept for callers written against the old placed box dicts.
+"""
+
+from typing import Any, Dict, Optional
+
+
+class Placement:
+    """
+    One placed box
+
+    Args:
+        code, material, packing_method: From the order line
+        x, y, z: Position of the box corner (inches)
+        width, length, height: Placed (oriented) size (inches)
+        line: Order line the box was placed from (None if unknown)
+    """
+
+    __slots__ = ('code', 'material', 'packing_method', 'x', 'y', 'z', 'width', 'length', 'height', 'line')
+
+    # Slots compared by __eq__ (the line is a shared reference, not placement data)
+    _FIELDS = __slots__[:-1]
+
+    def __init__(self, code: str, material: str, packing_method: str,
+                 x: float, y: float, z: float, width: float, length: float, height: float,
+                 line: Optional[Dict[str, Any]] = None):
+        self.code = code
+        self.material = material
+        self.packing_method = packing_method
+        self.x = x
+        self.y = y
+        self.z = z
+        self.width = width
+        self.length = length
+        self.height = height
+        self.line = line
+
+    @classmethod
+    def of(cls, box: Dict[str, Any], x: float, y: float, z: float,
+           orientation: Dict[str, float]) -> 'Placement':
+        """Placement of order line box at (x, y, z) in orientation {width, length, height}"""
+        return cls(box.get('code', 'UNKNOWN'), box.get('material', ''), box.get('packing_method', 'CARTON'),
+                   x, y, z, orientation['width'], orientation['length'], orientation['height'], box)
+
+    @property
+    def position(self) -> Dict[str, float]:
+        return {'x': self.x, 'y': self.y, 'z': self.z}
+
+    @property
+    def dimensions(self) -> Dict[str, float]:
+        return {'width': self.width, 'length': self.length, 'height': self.height}
+
+    def move(self, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None):
+        """Change position (None = keep axis)"""
+        if x is not None:
+            self.x = x
+        if y is not None:
+            self.y = y
+        if z is not None:
+            self.z = z
+
+    def resize(self, dimensions: Dict[str, float]):
+        """Change placed orientation"""
+        self.width = dimensions['width']
+        self.length = dimensions['length']
+        self.height = dimensions['height']
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form (same shape as the old placed box dicts)"""
+        return {
+            'code': self.code,
+            'dimensions': self.dimensions,
+            'position': self.position,
+            'material': self.material,
+            'packing_method': self.packing_method
+        }
+
+    # Read-only dict-style access
+    def __getitem__(self, key: str) -> Any:
+        if key not in ('code', 'material', 'packing_method', 'position', 'dimensions'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Placement):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._FIELDS)
+
+    __hash__ = None  # Mutable, compared by value like the dicts it replaces
+
+    def __repr__(self) -> str:
+        return (f"Placement({self.code}, pos=({self.x:.1f},{self.y:.1f},{self.z:.1f}), "
+                f"dims=({self.width:.1f}x{self.length:.1f}x{self.height:.1f}))")
@@ -0,0 +1,205 @@
+"""
+Portfolio Packing - run several algorithms at once and keep the best layout
+
+Instead of one call per algorithm, the portfolio packs the same order with
+every algorithm in parallel worker processes (one packer per process) and
+returns the layout that scores best on a chosen metric:
+- 'length_used': Y length taken by the boxes (smaller is better)
+- 'row_count': rows of the formatted layout (fewer is better)
+- 'utilization': bounding-box utilization (higher is better)
+
+Layouts with boxes that overlap or stick out of the container (validate_layout)
+rank after every valid layout, then layouts that pack fewer boxes or use more
+containers rank lower; ties go to the algorithm listed first. Timings and scores of every run are kept
+(get_portfolio_stats) so callers can compare the algorithms.
+
+create_packer is also the single place that maps an algorithm name and the
+request options to a packer.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from laff_bin_packing_3d import LAFFBinPacking3D
+from guided_packing_3d import GuidedPackingAlgorithm
+from z_first_packing_3d import ZFirstPackingAlgorithm
+from z_first_beam_packing_3d import ZFirstBeamPackingAlgorithm
+from simple_index_packing_3d import SimpleIndexPackingAlgorithm
+from output_formatter_3d import OutputFormatter3D
+from voxel_grid_3d import validate_layout
+
+MANUAL_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "manual_layout.json")
+
+
+def create_packer(algorithm: str, container_dims: Dict[str, float],
+                  options: Optional[Dict[str, Any]] = None) -> LAFFBinPacking3D:
+    """
+    Build the packer of an algorithm
+
+    Args:
+        algorithm: 'laff', 'guided', 'z_first', 'z_first_beam' or 'simple_index'
+                   (anything else falls back to LAFF)
+        container_dims: Container width/length/height
+        options: Request options (space_backend, bulk_placement, parallel_rows,
+                 gap_fill, cell_fill, validate_moves, beam_width, beam_budget); each packer
+                 reads the ones it supports, missing ones use the defaults
+
+    Returns:
+        Packer with pack_boxes(boxes)
+    """
+    options = options or {}
+    if algorithm == "guided":
+        # Guided Packing with manual template (X-first)
+        return GuidedPackingAlgorithm(container_dims, MANUAL_TEMPLATE_PATH)
+    if algorithm in ("z_first", "z_first_beam"):
+        z_first_options = {
+            'parallel_rows': options.get('parallel_rows') or 0,
+            'gap_fill': options.get('gap_fill') or "greedy",
+            'cell_fill': options.get('cell_fill') or "greedy",
+            'validate_moves': bool(options.get('validate_moves')),
+        }
+        if algorithm == "z_first_beam":
+            # Z-First with rows composed by beam search (top-K partial rows), moves always validated
+            z_first_options['validate_moves'] = True
+            return ZFirstBeamPackingAlgorithm(container_dims, beam_width=options.get('beam_width') or 8,
+                                              beam_budget=options.get('beam_budget') or 0.25,
+                                              **z_first_options)
+        # Z-First Packing (stack vertically before spreading horizontally)
+        return ZFirstPackingAlgorithm(container_dims, **z_first_options)
+    if algorithm == "simple_index":
+        # Simple Index-Based Cell Packing (pack theo thứ tự index, fill cell-by-cell)
+        return SimpleIndexPackingAlgorithm(container_dims)
+    # LAFF as default/fallback
+    return LAFFBinPacking3D(container_dims, space_backend=options.get('space_backend') or "guillotine",
+                           bulk_placement=bool(options.get('bulk_placement')))
+
+
+def _run_algorithm(algorithm: str, container_dims: Dict[str, float], options: Dict[str, Any],
+                   boxes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Pack boxes with one algorithm (runs in a worker process)
+
+    Returns:
+        Tuple: (packed containers, seconds spent packing)
+    """
+    start = time.perf_counter()
+    containers = create_packer(algorithm, container_dims, options).pack_boxes(boxes)
+    return containers, time.perf_counter() - start
+
+
+def layout_score(containers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Scores of a packed layout
+
+    Args:
+        containers: Packed containers (Placement boxes)
+
+    Returns:
+        Dict: total_boxes, total_containers, length_used (max Y extent, inches),
+              row_count (rows of the formatted layout), utilization (%) and
+              layout_errors (boxes that overlap or stick out, see validate_layout)
+    """
+    formatted = OutputFormatter3D().format(containers)
+    layout_errors = sum(len(validate_layout(container['boxes'], container['dimensions']))
+                        for container in containers)
+    length_used = max((box.y + box.length for container in containers for box in container['boxes']),
+                      default=0.0)
+    return {
+        'total_boxes': formatted['total_boxes'],
+        'total_containers': formatted['total_containers'],
+        'length_used': round(length_used, 2),
+        'row_count': sum(len(container['rows']) for container in formatted['containers']),
+        'utilization': formatted['utilization'],
+        'layout_errors': layout_errors,
+    }
+
+
+class PortfolioPacking:
+    """
+    Pack with several algorithms concurrently and keep the best layout
+
+    Args:
+        container_dims: Container width/length/height
+        metric: Ranking metric, one of METRICS
+        algorithms: Algorithms to run (in tie-break order)
+        options: Request options passed to create_packer
+        max_workers: Worker processes (default: one per algorithm)
+    """
+
+    ALGORITHMS = ('laff', 'guided', 'z_first', 'simple_index')
+    # Ranking metrics; utilization is maximized, the others minimized
+    METRICS = ('length_used', 'row_count', 'utilization')
+
+    def __init__(self, container_dims: Dict[str, float], metric: str = 'length_used',
+                 algorithms: Sequence[str] = ALGORITHMS, options: Optional[Dict[str, Any]] = None,
+                 max_workers: Optional[int] = None):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {self.METRICS}")
+        if not algorithms:
+            raise ValueError("algorithms must name at least one algorithm")
+        self.container = dict(container_dims)
+        self.metric = metric
+        self.algorithms = tuple(algorithms)
+        self.options = dict(options or {})
+        self.max_workers = max_workers or len(self.algorithms)
+        self.selected_algorithm: Optional[str] = None
+        # One entry per algorithm: {'algorithm', 'seconds', 'score'} or {'algorithm', 'error'}
+        self.runs: List[Dict[str, Any]] = []
+        self.wall_seconds = 0.0
+
+    def pack_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Pack boxes with every algorithm and return the best layout
+
+        Args:
+            boxes: List of boxes to pack
+
+        Returns:
+            List[Dict]: Containers of the best-scoring algorithm
+        """
+        start = time.perf_counter()
+        self.runs = []
+        self.selected_algorithm = None
+        best_key = None
+        best_containers = None
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(_run_algorithm, algorithm, self.container, self.options, boxes)
+                       for algorithm in self.algorithms]
+            for rank, (algorithm, future) in enumerate(zip(self.algorithms, futures)):
+                try:
+                    containers, seconds = future.result()
+                except Exception as e:
+                    # One failing algorithm does not fail the portfolio
+                    self.runs.append({'algorithm': algorithm, 'error': str(e)})
+                    continue
+                score = layout_score(containers)
+                self.runs.append({'algorithm': algorithm, 'seconds': round(seconds, 3), 'score': score})
+                key = self._rank_key(score) + (rank,)
+                if best_key is None or key < best_key:
+                    best_key, best_containers = key, containers
+                    self.selected_algorithm = algorithm
+
+        self.wall_seconds = time.perf_counter() - start
+        if best_containers is None:
+            errors = "; ".join(f"{run['algorithm']}: {run['error']}" for run in self.runs)
+            raise RuntimeError(f"All portfolio algorithms failed ({errors})")
+        return best_containers
+
+    def _rank_key(self, score: Dict[str, Any]) -> Tuple:
+        """Sort key of a run score (smaller is better)"""
+        value = score[self.metric]
+        if self.metric == 'utilization':
+            value = -value
+        return (score['layout_errors'] > 0, -score['total_boxes'], score['total_containers'], value)
+
+    def get_portfolio_stats(self) -> Dict[str, Any]:
+        """Metric, selected algorithm, wall time and per-algorithm timings/scores of the last pack_boxes"""
+        return {
+            'metric': self.metric,
+            'selected_algorithm': self.selected_algorithm,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'runs': self.runs,
+        }
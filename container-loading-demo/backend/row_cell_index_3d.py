@@ -0,0 +1,101 @@
+"""
+Row/Cell Index - rows (same Y) and cells (same X within a row) of a container
+
+The Z-First post-processing phases used to regroup every box of the
+container into rows (and every row into cells) at the start of each phase
+and again for every row they scanned. RowCellIndex is built once after row
+packing and kept up to date by the move helper instead:
+- Rows are keyed by Y in ticks, each row keeps its boxes in container order
+- A move only touches the row the box leaves and the row it joins
+- Cells of a row are grouped on first use and cached until the row changes
+- Every change is stamped per row, so a phase can ask which rows were
+  touched since it last ran (dirty rows) and skip the others
+
+rows() and cells() return exactly what group_by_position would return for
+the current positions (same keys, same order), so phases can swap one for
+the other without changing the layout.
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Set
+
+from fixed_point import to_ticks, group_by_position
+from placement import Placement
+
+
+class RowCellIndex:
+    """
+    Row and cell membership of the placed boxes of one container
+
+    Args:
+        boxes: Placed boxes in container order (the order is kept for the
+               life of the index)
+    """
+
+    def __init__(self, boxes: Iterable[Placement]):
+        self._seq: Dict[int, int] = {}                  # id(box) -> container order
+        self._row_of: Dict[int, int] = {}               # id(box) -> row Y ticks
+        self._rows: Dict[int, List[Placement]] = {}     # row Y ticks -> boxes in container order
+        self._cells: Dict[int, Dict[float, List[Placement]]] = {}  # row Y ticks -> cached cells
+        self._touched: Dict[int, int] = {}              # row Y ticks -> stamp of last change
+        self.stamp = 0                                  # Number of updates so far
+
+        for box in boxes:
+            key = to_ticks(box.y)
+            self._seq[id(box)] = len(self._seq)
+            self._row_of[id(box)] = key
+            self._rows.setdefault(key, []).append(box)
+
+    def __len__(self) -> int:
+        return len(self._seq)
+
+    def _order(self, box: Placement) -> int:
+        return self._seq[id(box)]
+
+    def rows(self) -> Dict[float, List[Placement]]:
+        """
+        {row Y: [boxes]}, same as group_by_position(container boxes, 'y')
+
+        Lists are copies, callers may modify them.
+        """
+        rows = sorted(self._rows.values(), key=lambda row: self._order(row[0]))
+        return {row[0].y: list(row) for row in rows}
+
+    def row(self, row_y: float) -> List[Placement]:
+        """Boxes of the row at row_y in container order (copy, empty if none)"""
+        return list(self._rows.get(to_ticks(row_y), ()))
+
+    def cells(self, row_y: float) -> Dict[float, List[Placement]]:
+        """
+        {cell X: [boxes]} of the row at row_y, same as group_by_position(row, 'x')
+
+        The dict is cached until a box enters, leaves or moves within the
+        row - treat it as read-only.
+        """
+        key = to_ticks(row_y)
+        cells = self._cells.get(key)
+        if cells is None:
+            cells = self._cells[key] = group_by_position(self._rows.get(key, ()), 'x')
+        return cells
+
+    def changed_since(self, stamp: int) -> Set[int]:
+        """Row Y ticks of the rows a box entered, left or moved within after stamp"""
+        return {key for key, touched in self._touched.items() if touched > stamp}
+
+    def update(self, box: Placement):
+        """Book a box whose position changed (call after every move)"""
+        old_key = self._row_of[id(box)]
+        new_key = to_ticks(box.y)
+        self.stamp += 1
+        self._touched[old_key] = self._touched[new_key] = self.stamp
+        self._cells.pop(old_key, None)
+        self._cells.pop(new_key, None)
+        if new_key == old_key:
+            return
+
+        row = self._rows[old_key]
+        del row[bisect_left(row, self._order(box), key=self._order)]
+        if not row:
+            del self._rows[old_key]
+        insort(self._rows.setdefault(new_key, []), box, key=self._order)
+        self._row_of[id(box)] = new_key
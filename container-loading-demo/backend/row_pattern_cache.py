@@ -0,0 +1,138 @@
+"""
+Row Pattern Cache - packed rows shared across requests (LRU)
+
+Row packers (Z-First pack_row_z_first, Guided pack_row_horizontally) are
+deterministic: the same lines in the same order, the same container and the
+same dominant length always give the same row. Late rows of an order (and
+rows of repeated orders) are often packed from the same remaining lines, so
+rows are memoized:
+- Key: packer class and options, the canonical signature of the lines with
+  their quantities, container width/height, dominant length and (when gap
+  filling looks at it) the signature of the remaining inventory
+- Value: the row pattern with Y relative to row_y, placed again at any Y
+
+The cache is module-level (one per process), bounded (least recently used
+entries are evicted) and guarded by a lock, since requests may pack in
+parallel threads.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from placement import Placement
+
+DEFAULT_MAXSIZE = 1024
+
+# Line fields packers never read (request-local ids), left out of signatures
+_IGNORED_FIELDS = ('type_id',)
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of a JSON-like value"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def line_signature(box: Dict[str, Any], quantity: Optional[int] = None) -> Tuple:
+    """
+    Canonical signature of an order line
+
+    Args:
+        box: Order line
+        quantity: Quantity to sign instead of box['quantity'] (e.g. units left)
+    """
+    fields = {key: value for key, value in box.items() if key not in _IGNORED_FIELDS}
+    if quantity is not None:
+        fields['quantity'] = quantity
+    return _freeze(fields)
+
+
+def lines_signature(boxes: Iterable[Dict[str, Any]]) -> Tuple:
+    """Signature of lines in order (order matters to the packers)"""
+    return tuple(line_signature(box) for box in boxes)
+
+
+def counts_signature(lines: Iterable[Tuple[Dict[str, Any], int]]) -> Tuple:
+    """Signature of (line, units left) pairs, e.g. RemainingView.lines()"""
+    return tuple(line_signature(box, count) for box, count in lines)
+
+
+class RowPattern:
+    """
+    Placements of one packed row, Y relative to the row
+
+    Args:
+        records: (code, material, packing_method, x, dy, z, width, length, height, line) per box
+    """
+
+    __slots__ = ('records',)
+
+    def __init__(self, records: Tuple[Tuple, ...]):
+        self.records = records
+
+    @classmethod
+    def of(cls, placed_boxes: Iterable[Placement], row_y: float) -> 'RowPattern':
+        """Pattern of a row packed at row_y"""
+        return cls(tuple((p.code, p.material, p.packing_method, p.x, p.y - row_y, p.z,
+                          p.width, p.length, p.height, p.line) for p in placed_boxes))
+
+    def place(self, row_y: float) -> List[Placement]:
+        """New placements of the row at row_y"""
+        return [Placement(code, material, packing_method, x, row_y + dy, z, width, length, height, line)
+                for code, material, packing_method, x, dy, z, width, length, height, line in self.records]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+class RowPatternCache:
+    """
+    Thread-safe LRU map: row key -> RowPattern
+
+    Args:
+        maxsize: Max number of patterns kept
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._patterns: 'OrderedDict[Hashable, RowPattern]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[RowPattern]:
+        """Cached pattern of key (None on miss), marked as recently used"""
+        with self._lock:
+            pattern = self._patterns.get(key)
+            if pattern is None:
+                self.misses += 1
+                return None
+            self._patterns.move_to_end(key)
+            self.hits += 1
+            return pattern
+
+    def put(self, key: Hashable, pattern: RowPattern):
+        """Store a pattern, evicting the least recently used beyond maxsize"""
+        with self._lock:
+            self._patterns[key] = pattern
+            self._patterns.move_to_end(key)
+            while len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._patterns.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._patterns), 'hits': self.hits, 'misses': self.misses}
+
+
+# Shared by all packers of this process
+ROW_PATTERNS = RowPatternCache()
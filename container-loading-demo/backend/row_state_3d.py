@@ -0,0 +1,74 @@
+"""
+Row State - running aggregates of the row a packer is filling
+
+Row packers (Z-First pack_row_z_first, Guided pack_row_horizontally) used to
+recompute averages and extents by scanning every box already placed in the
+row before placing the next one, which made each row quadratic. RowState is
+updated once per placed box instead:
+- Running sums of placed length/width (averages in O(1))
+- Running max X extent (x + width) and max Z extent (z + height)
+- Cells (boxes sharing an X position) with their current top Z
+
+cells() groups exactly like group_by_position(boxes, 'x') (same keys, same
+order), so it can be handed to detect_incomplete_cells directly.
+"""
+
+from typing import Dict, List, Optional
+
+from fixed_point import to_ticks
+from placement import Placement
+
+
+class RowState:
+    """
+    Boxes placed in one row and their running aggregates
+
+    Args:
+        boxes: List the placed boxes are appended to (default: new list)
+    """
+
+    __slots__ = ('boxes', 'sum_length', 'sum_width', 'max_x', 'max_z', '_cells', '_cell_tops', '_cell_keys')
+
+    def __init__(self, boxes: Optional[List[Placement]] = None):
+        self.boxes = boxes if boxes is not None else []
+        self.sum_length = 0.0
+        self.sum_width = 0.0
+        self.max_x = 0.0   # max(x + width)
+        self.max_z = 0.0   # max(z + height)
+        self._cells: Dict[float, List[Placement]] = {}  # cell X -> boxes
+        self._cell_tops: Dict[float, float] = {}        # cell X -> max(z + height)
+        self._cell_keys: Dict[int, float] = {}          # X ticks -> cell X (first box)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def add(self, placed: Placement):
+        """Append a placed box and update the aggregates"""
+        self.boxes.append(placed)
+        self.sum_length += placed.length
+        self.sum_width += placed.width
+        self.max_x = max(self.max_x, placed.x + placed.width)
+        top = placed.z + placed.height
+        self.max_z = max(self.max_z, top)
+
+        key = self._cell_keys.setdefault(to_ticks(placed.x), placed.x)
+        self._cells.setdefault(key, []).append(placed)
+        self._cell_tops[key] = max(self._cell_tops.get(key, top), top)
+
+    @property
+    def avg_length(self) -> Optional[float]:
+        """Average placed length (None if the row is empty)"""
+        return self.sum_length / len(self.boxes) if self.boxes else None
+
+    @property
+    def avg_width(self) -> Optional[float]:
+        """Average placed width (None if the row is empty)"""
+        return self.sum_width / len(self.boxes) if self.boxes else None
+
+    def cells(self) -> Dict[float, List[Placement]]:
+        """{cell X: [boxes]} in first-placed order (live, treat as read-only)"""
+        return self._cells
+
+    def cell_top(self, cell_x: float) -> float:
+        """Top Z of the cell at cell_x (0 if empty)"""
+        return self._cell_tops.get(self._cell_keys.get(to_ticks(cell_x), cell_x), 0.0)
@@ -10,6 +10,8 @@ Strategy:
 
 from typing import List, Dict, Any, Optional
 from laff_bin_packing_3d import LAFFBinPacking3D
+from orientation_table import get_orientations
+from placement import Placement
 
 
 class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
@@ -40,15 +42,12 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
         self._new_container()
         
         # Step 1: Expand boxes by quantity (giữ nguyên thứ tự index)
+        # Shared references to the input lines; (index, box) keeps the line index
         expanded_boxes = []
         for idx, box in enumerate(boxes):
             qty = int(box.get('quantity', 1))
-            if qty <= 0:
-                continue
-            for _ in range(qty):
-                box_copy = box.copy()
-                box_copy['_original_index'] = idx  # Track original index
-                expanded_boxes.append(box_copy)
+            if qty > 0:
+                expanded_boxes.extend([(idx, box)] * qty)
         
         print(f"Total boxes to pack: {len(expanded_boxes)}")
         
@@ -63,13 +62,13 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
         current_z = 0.0
         current_cell_width = 0.0
         
-        placed_boxes = []
+        placed_boxes = self.current_container['boxes']
         
         # Track row info for moving to next row
         row_max_length = 0.0  # Max length (Y dimension) in current row
         
         # Process boxes theo thứ tự index
-        for box in expanded_boxes:
+        for _, box in expanded_boxes:
             # Find best orientation
             best_orientation = self.find_best_orientation(
                 box, container_width, container_height, container_length
@@ -91,8 +90,8 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
             )
             
             if not fits_current_cell:
-                # Current cell is full, move to next cell
-                if current_z >= container_height * 0.95:  # Cell is almost full
+                # Current cell is full (or too low for this box), move to next cell
+                if current_z >= container_height * 0.95 or current_z + box_height > container_height:
                     # Move to next cell
                     current_x += current_cell_width if current_cell_width > 0 else 0
                     current_z = 0.0
@@ -115,24 +114,18 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
                     row_max_length = 0.0
                 
                 # Check if still doesn't fit after moving
+                if current_z + box_height > container_height:
+                    # Box taller than the container, skip
+                    print(f"  WARNING: Box {box.get('code', 'UNKNOWN')} (height={box_height:.1f}\") too tall for container (height={container_height:.1f}\")")
+                    continue
                 if current_x + box_width > container_width:
                     # Box too wide for container, skip
-                    print(f"  WARNING: Box {box.get('code', 'UNKNOWN')} (width={box_width:.1f}\") too wide for container (width={container_width:.1f}\")")
+                    print(f"  WARNING: Box {box.get('code', 'UNKNOWN')} (width={best_orientation['width']:.1f}\") too wide for container (width={container_width:.1f}\")")
                     continue
             
             # Place box at current position
-            placed_box = {
-                'code': box.get('code', 'UNKNOWN'),
-                'dimensions': best_orientation,
-                'position': {
-                    'x': current_x,
-                    'y': current_y,
-                    'z': current_z
-                },
-                'material': box.get('material', ''),
-                'packing_method': box.get('packing_method', 'CARTON')
-            }
-            placed_boxes.append(placed_box)
+            placed_box = Placement.of(box, current_x, current_y, current_z, best_orientation)
+            self._add_placed_box(placed_box)
             
             # Update position
             current_z += box_height
@@ -155,16 +148,13 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
                     current_cell_width = 0.0
                     row_max_length = 0.0
         
-        # Add placed boxes to container
-        self.current_container['boxes'] = placed_boxes
-        
         print(f"Packed {len(placed_boxes)} boxes")
         
         return [self.current_container]
     
     def get_all_orientations(self, box: Dict[str, Any]) -> List[Dict[str, float]]:
         """
-        Get all 6 possible orientations for a box
+        Get all 6 possible orientations for a box (2 for stacked blocks)
         
         Args:
             box: Box dict với dimensions
@@ -172,22 +162,7 @@ class SimpleIndexPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             List of orientation dicts (width, length, height)
         """
-        dims = box['dimensions']
-        w = dims['width']
-        l = dims['length']
-        h = dims['height']
-        
-        # All 6 orientations
-        orientations = [
-            {'width': w, 'length': l, 'height': h},  # Original
-            {'width': l, 'length': w, 'height': h},  # Rotate 90° in XY
-            {'width': w, 'length': h, 'height': l},  # Swap length ↔ height
-            {'width': h, 'length': w, 'height': l},  # Rotate + swap
-            {'width': l, 'length': h, 'height': w},  # Rotate + swap
-            {'width': h, 'length': l, 'height': w}   # Full rotation
-        ]
-        
-        return orientations
+        return get_orientations(box, 'simple_index')
     
     def find_best_orientation(self, box: Dict[str, Any], container_width: float,
                              container_height: float, container_length: float) -> Optional[Dict[str, float]]:
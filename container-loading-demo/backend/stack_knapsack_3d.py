@@ -0,0 +1,99 @@
+"""
+Stack Knapsack - exact top-up of an incomplete cell with boxes of another row
+
+optimize_cell_heights used to top up a cell greedily (smallest box first,
+first orientation that fits), stopping at whatever height was left when
+nothing else fit. Here the free height of a cell is a bounded group
+knapsack over the heights available:
+- Candidates are grouped by box type (dims, packing method, block), each
+  group being the units of that type the source row offers
+- A unit may stand in any orientation its packing rules allow (PRE_PACK
+  swaps only when height > length, see orientation_table) that fits the
+  cell footprint: width within the cell, length within its depth
+- The solver (width_knapsack_3d.solve_fill, in height ticks) picks the
+  units and orientations filling the most height without exceeding it
+
+Solutions are cached by (remaining height, footprint, inventory signature):
+cells of the same footprint and free height, offered the same box types,
+are solved once and then answered by lookup.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from fixed_point import size_ticks
+from orientation_table import orientation_table, table_for
+from width_knapsack_3d import capacity_ticks, solve_fill
+
+# (width, length, height, packing_method, block) of a box type, and its units
+Signature = Tuple[Tuple[Tuple[float, float, float, str, bool], int], ...]
+
+
+def type_key(box: Any) -> Tuple[float, float, float, str, bool]:
+    """
+    Orientation table key of a box or placement
+
+    A placement is keyed by its order line (original dims, packing method,
+    block marker), not by its current size: a PRE_PACK unit already lying on
+    its side must still get the orientations of the upright line.
+    """
+    table = table_for(box)
+    return table.dims + (table.packing_method, table.block)
+
+
+@lru_cache(maxsize=8192)
+def solve_stack_fill(remaining: int, footprint: Tuple[int, int], signature: Signature,
+                     policy: str = 'z_first') -> Tuple[Tuple[Dict[str, float], ...], ...]:
+    """
+    Orientations of the units stacked into a cell, per box type
+
+    Args:
+        remaining: Free cell height in ticks
+        footprint: Cell (width, depth) in ticks
+        signature: (type key, units offered) per box type, priority order
+        policy: Orientation policy of the packer
+
+    Returns:
+        Tuple: Orientation dicts (shared, read-only) of the units used, per type
+    """
+    max_width, max_length = footprint
+    groups = []
+    by_height: List[Dict[int, Dict[str, float]]] = []
+    for (width, length, height, packing_method, block), count in signature:
+        heights: Dict[int, Dict[str, float]] = {}
+        for orientation in orientation_table(width, length, height, packing_method,
+                                             block).orientation_dicts(policy):
+            if (size_ticks(orientation['width']) <= max_width and
+                    size_ticks(orientation['length']) <= max_length):
+                heights.setdefault(size_ticks(orientation['height']), orientation)
+        groups.append((tuple(sorted(heights)), count if heights else 0))
+        by_height.append(heights)
+
+    picks = solve_fill(tuple(groups), remaining)
+    return tuple(tuple(heights[h] for h in used) for heights, used in zip(by_height, picks))
+
+
+def stack_fill(boxes: List[Any], remaining_height: float, cell_width: float,
+               cell_depth: float, policy: str = 'z_first') -> List[Tuple[Any, Dict[str, float]]]:
+    """
+    Boxes (and orientations) to stack into a cell, fullest fill first
+
+    Args:
+        boxes: Candidate boxes/placements in priority order
+        remaining_height: Free height above the cell
+        cell_width, cell_depth: Cell footprint (X, Y)
+        policy: Orientation policy of the packer
+
+    Returns:
+        List of (box, orientation), bottom to top
+    """
+    units: Dict[Tuple, List[Any]] = {}
+    for box in boxes:
+        units.setdefault(type_key(box), []).append(box)
+    signature = tuple((key, len(group)) for key, group in units.items())
+
+    footprint = (capacity_ticks(cell_width), capacity_ticks(cell_depth))
+    picks = solve_stack_fill(capacity_ticks(remaining_height), footprint, signature, policy)
+    return [(box, orientation)
+            for group, orientations in zip(units.values(), picks)
+            for box, orientation in zip(group, orientations)]
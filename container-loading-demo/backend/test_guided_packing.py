@@ -5,6 +5,10 @@ Test script cho Guided Packing Algorithm
 import json
 from guided_packing_3d import GuidedPackingAlgorithm
 from output_formatter_3d import OutputFormatter3D
+from fixed_point import group_by_position
+from row_state_3d import RowState
+from row_pattern_cache import ROW_PATTERNS
+from z_first_packing_3d import ZFirstPackingAlgorithm
 
 def test_guided_packing():
     """Test guided packing with test_data_real_3d.json"""
@@ -84,6 +88,57 @@ def test_guided_packing():
     
     return result
 
+def test_row_state():
+    """Running row aggregates match a rescan of the placed boxes"""
+    with open('test_data_real_3d.json', 'r') as f:
+        data = json.load(f)
+    
+    packer = GuidedPackingAlgorithm(container_dims=data['container'])
+    placed = packer.pack_row_horizontally(data['boxes'], 0.0, data['container']['height'],
+                                          data['container']['width'])
+    
+    row = RowState()
+    for box in placed:
+        row.add(box)
+    
+    assert row.avg_length == sum(b.length for b in placed) / len(placed)
+    assert row.avg_width == sum(b.width for b in placed) / len(placed)
+    assert row.max_x == max(b.x + b.width for b in placed)
+    assert row.max_z == max(b.z + b.height for b in placed)
+    assert row.cells() == group_by_position(placed, 'x')
+    for cell_x, cell_boxes in row.cells().items():
+        assert row.cell_top(cell_x) == max(b.z + b.height for b in cell_boxes)
+    print(f"Row: {len(row)} boxes, {len(row.cells())} cells")
+
+def test_row_pattern_cache():
+    """Repeated orders place cached row patterns, same layout as packing them"""
+    with open('test_data_real_3d.json', 'r') as f:
+        data = json.load(f)
+    
+    def layout(containers):
+        return [(b.code, b.x, b.y, b.z, b.width, b.length, b.height) for c in containers for b in c['boxes']]
+    
+    packers = [
+        lambda cache: GuidedPackingAlgorithm(data['container'], 'manual_layout.json', use_row_cache=cache),
+        lambda cache: ZFirstPackingAlgorithm(data['container'], use_row_cache=cache),
+    ]
+    for make_packer in packers:
+        ROW_PATTERNS.clear()
+        expected = layout(make_packer(False).pack_boxes(data['boxes']))
+        assert ROW_PATTERNS.stats()['size'] == 0
+        
+        first = layout(make_packer(True).pack_boxes(data['boxes']))
+        misses = ROW_PATTERNS.stats()['misses']
+        second = layout(make_packer(True).pack_boxes(data['boxes']))
+        stats = ROW_PATTERNS.stats()
+        print(f"Row pattern cache: {stats}")
+        
+        assert first == second == expected
+        assert stats['misses'] == misses and stats['hits'] >= misses
+    ROW_PATTERNS.clear()
+
 if __name__ == '__main__':
     test_guided_packing()
+    test_row_state()
+    test_row_pattern_cache()
 
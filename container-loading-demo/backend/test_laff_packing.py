@@ -0,0 +1,338 @@
+"""
+Test LAFF 3D Bin Packing Algorithm
+"""
+
+import json
+from laff_bin_packing_3d import LAFFBinPacking3D, EmptySpace
+from free_space_store_3d import FreeSpaceStore
+from output_formatter_3d import OutputFormatter3D
+from voxel_grid_3d import validate_layout
+from block_builder_3d import BlockBuilder
+from orientation_table import get_orientations, table_for
+from order_normalizer import normalize_order
+from box_inventory_3d import BoxInventory
+from placement import Placement
+from portfolio_packing_3d import PortfolioPacking, create_packer, layout_score
+
+
+def test_laff_packing():
+    # Load test data
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    container_dims = data['container']
+    boxes = data['boxes']
+
+    total_boxes = sum(box['quantity'] for box in boxes)
+    print(f"Total boxes to pack: {total_boxes}")
+
+    # Initialize packer
+    packer = LAFFBinPacking3D(container_dims=container_dims)
+
+    # Pack boxes
+    print("\n" + "="*80)
+    print("LAFF PACKING ALGORITHM")
+    print("="*80)
+
+    containers = packer.pack_boxes(boxes)
+
+    # Format output
+    formatter = OutputFormatter3D()
+    result = formatter.format(containers)
+
+    # Print summary
+    print("\n" + "="*80)
+    print("PACKING RESULTS (LAFF)")
+    print("="*80)
+    print(f"Containers used: {result['total_containers']}")
+    print(f"Boxes packed: {result['total_boxes']}")
+    print(f"Container utilization: {result['overall_utilization']:.1f}%")
+
+    assert result['total_boxes'] == total_boxes
+    print("[OK] Test completed successfully!")
+
+
+def test_laff_maximal_spaces():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    boxes = data['boxes']
+    total_boxes = sum(box['quantity'] for box in boxes)
+
+    packer = LAFFBinPacking3D(container_dims=data['container'], space_backend='maximal')
+    containers = packer.pack_boxes(boxes)
+
+    stats = packer.get_space_stats()
+    print(f"Containers used: {len(containers)}")
+    print(f"Space stats: peak={stats['peak_spaces']}, avg={stats['avg_spaces']:.1f}, "
+          f"avg update={stats['avg_update_ms']:.3f}ms, pruned={stats['pruned']}")
+
+    # No two boxes may overlap (bounding-box merges used to allow this)
+    for container in containers:
+        placed = container['boxes']
+        for i, a in enumerate(placed):
+            for b in placed[i + 1:]:
+                overlap = all(
+                    a['position'][axis] < b['position'][axis] + b['dimensions'][dim] and
+                    b['position'][axis] < a['position'][axis] + a['dimensions'][dim]
+                    for axis, dim in (('x', 'width'), ('y', 'length'), ('z', 'height'))
+                )
+                assert not overlap
+
+    assert sum(len(c['boxes']) for c in containers) == total_boxes
+    print("[OK] Test completed successfully!")
+
+
+def test_free_space_store_index():
+    import random
+    rnd = random.Random(7)
+
+    def cuboid(space):
+        return tuple(space.position.values()) + tuple(space.dimensions.values())
+
+    def reference_merge(cuboids):
+        # Pairwise greedy merge the store replaces (spaces matching on two axes)
+        def close(a, b, axes):
+            return all(abs(a[k] - b[k]) < 0.1 for k in axes)
+        merged, used = [], set()
+        for i, a in enumerate(cuboids):
+            if i in used:
+                continue
+            for j in range(i + 1, len(cuboids)):
+                b = cuboids[j]
+                if j not in used and (close(a, b, (1, 2, 4, 5)) or close(a, b, (0, 2, 3, 5)) or
+                                      close(a, b, (0, 1, 3, 4))):
+                    lo = [min(a[k], b[k]) for k in range(3)]
+                    hi = [max(a[k] + a[k + 3], b[k] + b[k + 3]) for k in range(3)]
+                    a = tuple(lo) + tuple(h - l for l, h in zip(lo, hi))
+                    used.add(j)
+            merged.append(a)
+        return merged
+
+    store = FreeSpaceStore()
+    for _ in range(300):
+        store.append(EmptySpace(*(rnd.choice((0, 10, 20.05, 30)) for _ in range(3)),
+                                *(rnd.choice((10, 20, 25)) for _ in range(3))))
+        if rnd.random() < 0.3:
+            store.remove(rnd.choice(store.spaces()))
+        if rnd.random() < 0.2:
+            expected = reference_merge([cuboid(space) for space in store])
+            store.merge_adjacent(0.1, EmptySpace)
+            assert [cuboid(space) for space in store] == expected
+
+        # The index holds exactly the alive spaces, in priority order
+        keys = [(space.position['z'], -(space.dimensions['width'] * space.dimensions['length']),
+                 space.dimensions['height'], space.slot) for space in store]
+        assert store._order == sorted(keys)
+    print("[OK] Test completed successfully!")
+
+
+def test_height_map():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    container_dims = data['container']
+    packer = LAFFBinPacking3D(container_dims=container_dims, space_backend='maximal')
+    containers = packer.pack_boxes(data['boxes'])
+
+    # Height map follows the last (current) container
+    placed = containers[-1]['boxes']
+    height_map = packer.height_map
+    top = max(b['position']['z'] + b['dimensions']['height'] for b in placed)
+    assert height_map.top_surface(0, 0, container_dims['width'], container_dims['length']) == top
+
+    for b in placed:
+        pos, dims = b['position'], b['dimensions']
+        assert height_map.top_surface(pos['x'], pos['y'], dims['width'], dims['length']) >= pos['z'] + dims['height']
+        if pos['z'] == 0:
+            assert height_map.is_supported(pos['x'], pos['y'], dims['width'], dims['length'], 0)
+    print("[OK] Test completed successfully!")
+
+
+def test_laff_bulk_placement():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    container_dims = data['container']
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+
+    packer = LAFFBinPacking3D(container_dims=container_dims, space_backend='maximal', bulk_placement=True)
+    containers = packer.pack_boxes(data['boxes'])
+
+    stats = packer.get_space_stats()
+    print(f"Containers used: {len(containers)}")
+    print(f"Space searches: {stats['searches']} for {total_boxes} boxes")
+
+    assert sum(len(c['boxes']) for c in containers) == total_boxes
+    assert stats['searches'] < total_boxes
+    for container in containers:
+        assert validate_layout(container['boxes'], container_dims) == []
+    print("[OK] Test completed successfully!")
+
+
+def test_laff_block_building():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    container_dims = data['container']
+    boxes = data['boxes']
+    total_boxes = sum(box['quantity'] for box in boxes)
+
+    builder = BlockBuilder(container_dims['height'])
+    lines = builder.build(boxes)
+    total_items = sum(line['quantity'] for line in lines)
+    print(f"Items to pack: {total_items} (from {total_boxes} boxes)")
+
+    packer = LAFFBinPacking3D(container_dims=container_dims)
+    containers = builder.expand(packer.pack_boxes(lines))
+
+    # Every unit comes back with its own code
+    placed_codes = {}
+    for container in containers:
+        for b in container['boxes']:
+            placed_codes[b['code']] = placed_codes.get(b['code'], 0) + 1
+        assert validate_layout(container['boxes'], container_dims) == []
+
+    expected_codes = {}
+    for box in boxes:
+        expected_codes[box['code']] = expected_codes.get(box['code'], 0) + box['quantity']
+
+    assert total_items < total_boxes
+    assert placed_codes == expected_codes
+    print("[OK] Test completed successfully!")
+
+
+def test_orientation_table():
+    carton = {'dimensions': {'width': 30, 'length': 17, 'height': 5}, 'packing_method': 'CARTON'}
+    table = table_for(carton)
+
+    # CARTON in LAFF: (w,l,h), (l,w,h), (w,h,l), smallest width first
+    assert table.orientations('laff') == ((17, 30, 5), (30, 17, 5), (30, 5, 17))
+    assert table.orientations('z_first') == ((30, 17, 5), (17, 30, 5))
+    assert len(table.orientations('simple_index')) == 6
+    assert table_for(dict(carton)) is table  # One table per type
+
+    pre_pack = {'dimensions': {'width': 20, 'length': 10, 'height': 15}, 'packing_method': 'PRE_PACK'}
+    table = table_for(pre_pack)
+    assert table.orientations('laff') == ((20, 10, 15),)
+    assert table.orientations('z_first') == ((20, 10, 15), (10, 20, 15), (10, 15, 20), (15, 10, 20))
+    assert table.allows('guided', 4) and not table.allows('guided', 2)
+
+    block = dict(pre_pack, block={'units': 3, 'unit_height': 5})
+    assert table_for(block).orientations('simple_index') == ((20, 10, 15), (10, 20, 15))
+
+    # A placed box: its line's rules, current orientation first
+    turned = Placement.of(carton, 0.0, 0.0, 0.0, {'width': 17, 'length': 30, 'height': 5})
+    assert [tuple(o.values()) for o in get_orientations(turned, 'z_first')] == [(17, 30, 5), (30, 17, 5)]
+    turned_block = Placement.of(block, 0.0, 0.0, 0.0, {'width': 10, 'length': 20, 'height': 15})
+    assert [tuple(o.values()) for o in get_orientations(turned_block, 'guided')] == [(10, 20, 15), (20, 10, 15)]
+    print("[OK] Test completed successfully!")
+
+
+def test_order_normalizer():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    boxes = data['boxes']
+    # Same line sent twice (split order) plus an empty line
+    lines = normalize_order(boxes + [dict(boxes[0], quantity=2), dict(boxes[1], quantity=0)])
+
+    assert len(lines) == len(boxes)
+    assert lines[0]['quantity'] == boxes[0]['quantity'] + 2
+    assert sum(line['quantity'] for line in lines) == sum(box['quantity'] for box in boxes) + 2
+
+    # One type id per inventory type (code, material, purchasing_doc, packing_method)
+    types = {}
+    for line in lines:
+        key = (line['code'], line['material'], line['purchasing_doc'], line['packing_method'])
+        assert types.setdefault(key, line['type_id']) == line['type_id']
+        assert BoxInventory.type_of(line) == line['type_id']
+    assert sorted(set(types.values())) == list(range(len(types)))
+    print(f"{len(lines)} lines, {len(types)} types")
+
+    # Inventory counts are keyed by type id
+    inventory = BoxInventory({None: lines})
+    assert set(inventory.counts) == set(types.values())
+    assert inventory.total == sum(line['quantity'] for line in lines)
+
+    containers = LAFFBinPacking3D(container_dims=data['container']).pack_boxes(lines)
+    assert sum(len(c['boxes']) for c in containers) == sum(line['quantity'] for line in lines)
+    print("[OK] Test completed successfully!")
+
+
+def test_placement_records():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    containers = LAFFBinPacking3D(container_dims=data['container']).pack_boxes(data['boxes'])
+    placed = containers[0]['boxes'][0]
+    assert isinstance(placed, Placement)
+    assert not hasattr(placed, '__dict__')
+
+    # JSON form keeps the old placed box shape
+    as_dict = placed.to_dict()
+    assert set(as_dict) == {'code', 'dimensions', 'position', 'material', 'packing_method'}
+    assert as_dict['position'] == {'x': placed.x, 'y': placed.y, 'z': placed.z}
+    assert placed['dimensions'] == as_dict['dimensions']
+
+    # Formatter output is plain dicts
+    result = OutputFormatter3D().format(containers)
+    box_info = result['containers'][0]['rows'][0]['cells'][0]['boxes'][0]
+    assert isinstance(box_info['position'], dict)
+    json.dumps(result)
+    print("[OK] Test completed successfully!")
+
+
+def test_portfolio_packing():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    container_dims = data['container']
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+
+    for metric in PortfolioPacking.METRICS:
+        packer = PortfolioPacking(container_dims, metric=metric)
+        containers = packer.pack_boxes(data['boxes'])
+        stats = packer.get_portfolio_stats()
+        print(f"{metric}: {stats['selected_algorithm']} "
+              f"{[(run['algorithm'], run.get('seconds')) for run in stats['runs']]}")
+
+        # One timed, scored run per algorithm; the returned layout is the best one
+        assert [run['algorithm'] for run in stats['runs']] == list(PortfolioPacking.ALGORITHMS)
+        scores = {run['algorithm']: run['score'] for run in stats['runs']}
+        assert all(run['seconds'] >= 0 for run in stats['runs'])
+        assert scores[packer.selected_algorithm] == layout_score(containers)
+        assert layout_score(containers)['total_boxes'] == total_boxes
+        best = min(scores.values(), key=packer._rank_key)
+        assert best[metric] == scores[packer.selected_algorithm][metric]
+        # Any valid layout beats every layout with overlapping/outside boxes
+        if any(score['layout_errors'] == 0 for score in scores.values()):
+            assert scores[packer.selected_algorithm]['layout_errors'] == 0
+
+    # Layout errors rank first, before boxes and the metric
+    ranker = PortfolioPacking(container_dims)
+    valid = {'total_boxes': 10, 'total_containers': 1, 'length_used': 300.0, 'layout_errors': 0}
+    assert ranker._rank_key(valid) < ranker._rank_key(dict(valid, length_used=200.0, layout_errors=1))
+
+    # Same layout as the selected algorithm on its own
+    single = create_packer(packer.selected_algorithm, container_dims).pack_boxes(data['boxes'])
+    assert layout_score(single) == layout_score(containers)
+
+    try:
+        PortfolioPacking(container_dims, metric='volume')
+        assert False, "unknown metric accepted"
+    except ValueError:
+        pass
+    print("[OK] Test completed successfully!")
+
+
+if __name__ == '__main__':
+    test_laff_packing()
+    test_laff_maximal_spaces()
+    test_free_space_store_index()
+    test_height_map()
+    test_laff_bulk_placement()
+    test_laff_block_building()
+    test_orientation_table()
+    test_order_normalizer()
+    test_placement_records()
+    test_portfolio_packing()
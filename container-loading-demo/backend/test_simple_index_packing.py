@@ -5,6 +5,8 @@ Test Simple Index-Based Cell Packing Algorithm
 import json
 from simple_index_packing_3d import SimpleIndexPackingAlgorithm
 from output_formatter_3d import OutputFormatter3D
+from block_builder_3d import BlockBuilder
+from voxel_grid_3d import validate_layout
 
 
 def test_simple_index_packing():
@@ -55,5 +57,38 @@ def test_simple_index_packing():
     print("[OK] Test completed successfully!")
 
 
+def test_simple_index_off_grid_stack():
+    # 16.3" is not on the 1/8" tick grid: every box must sit on the one below
+    container_dims = {'width': 92.5, 'length': 473, 'height': 106}
+    boxes = [{'code': 'A', 'dimensions': {'width': 40, 'length': 30, 'height': 16.3},
+              'quantity': 6, 'material': 'M', 'packing_method': 'PRE_PACK'}]
+    
+    packer = SimpleIndexPackingAlgorithm(container_dims)
+    placed = packer.pack_boxes(boxes)[0]['boxes']
+    
+    stack = sorted((b for b in placed if b.x == placed[0].x), key=lambda b: b.z)
+    assert len(stack) > 1
+    for below, above in zip(stack, stack[1:]):
+        assert abs(above.z - (below.z + below.height)) < 1e-9
+    print("[OK] Test completed successfully!")
+
+
+def test_simple_index_block_building():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    container_dims = data['container']
+    builder = BlockBuilder(container_dims['height'])
+    packer = SimpleIndexPackingAlgorithm(container_dims)
+    containers = builder.expand(packer.pack_boxes(builder.build(data['boxes'])))
+    
+    # Blocks start a new cell instead of sticking out of the roof
+    for container in containers:
+        assert validate_layout(container['boxes'], container_dims) == []
+    print("[OK] Test completed successfully!")
+
+
 if __name__ == '__main__':
     test_simple_index_packing()
+    test_simple_index_off_grid_stack()
+    test_simple_index_block_building()
@@ -4,7 +4,18 @@ Test Z-First Packing Algorithm
 
 import json
 from z_first_packing_3d import ZFirstPackingAlgorithm
+from z_first_beam_packing_3d import ZFirstBeamPackingAlgorithm
 from output_formatter_3d import OutputFormatter3D
+from voxel_grid_3d import validate_layout
+from box_inventory_3d import BoxInventory
+from guided_packing_3d import GuidedPackingAlgorithm
+from fixed_point import group_by_position
+from length_index_3d import LengthIndex, length_histogram
+from width_knapsack_3d import capacity_ticks, solve_fill
+from stack_knapsack_3d import stack_fill, solve_stack_fill
+from block_builder_3d import BlockBuilder
+from placement import Placement
+from row_pattern_cache import ROW_PATTERNS
 
 
 def test_z_first_packing():
@@ -54,6 +65,363 @@ def test_z_first_packing():
     print("[OK] Test completed successfully!")
 
 
+def test_z_first_validate_moves():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    container_dims = data['container']
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+    
+    # Post-processing moves checked against the voxel grid
+    packer = ZFirstPackingAlgorithm(container_dims=container_dims, validate_moves=True)
+    containers = packer.pack_boxes(data['boxes'])
+    
+    print(f"Moves checked: {packer.move_stats['checked']}, rejected: {packer.move_stats['rejected']}")
+    
+    assert sum(len(c['boxes']) for c in containers) == total_boxes
+    for container in containers:
+        assert validate_layout(container['boxes'], container_dims) == []
+    print("[OK] Test completed successfully!")
+
+
+def test_z_first_block_building():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    container_dims = data['container']
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+    
+    builder = BlockBuilder(container_dims['height'])
+    lines = builder.build(data['boxes'])
+    packer = ZFirstPackingAlgorithm(container_dims=container_dims, validate_moves=True)
+    containers = packer.pack_boxes(lines)
+    
+    # Post-processing never lays a block on its side
+    block_heights = {line['code']: line['dimensions']['height'] for line in lines if line.get('block')}
+    for container in containers:
+        for b in container['boxes']:
+            if b.code in block_heights:
+                assert b.height == block_heights[b.code]
+    
+    containers = builder.expand(containers)
+    assert sum(len(c['boxes']) for c in containers) == total_boxes
+    for container in containers:
+        assert validate_layout(container['boxes'], container_dims) == []
+    print("[OK] Test completed successfully!")
+
+
+def test_z_first_beam_validate_moves():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    container_dims = data['container']
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+    
+    # Default options: post-processing moves are checked against the voxel grid
+    for beam_width in (8, 32):
+        packer = ZFirstBeamPackingAlgorithm(container_dims=container_dims, beam_width=beam_width)
+        assert packer.validate_moves
+        containers = packer.pack_boxes(data['boxes'])
+        
+        assert sum(len(c['boxes']) for c in containers) == total_boxes
+        for container in containers:
+            assert validate_layout(container['boxes'], container_dims) == []
+    print("[OK] Test completed successfully!")
+
+
+def test_box_inventory():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    boxes_by_sort = {}
+    for box in data['boxes']:
+        boxes_by_sort.setdefault(box.get('sort_order', 999), []).append(box)
+    
+    inventory = BoxInventory(boxes_by_sort)
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+    assert inventory.total == total_boxes
+    
+    # Pack one group completely: its counter drops to zero, total follows
+    first = inventory.sort_orders[0]
+    group_total = sum(box['quantity'] for box in boxes_by_sort[first])
+    assert inventory.group_remaining(first) == group_total
+    
+    line = inventory.remaining_line(boxes_by_sort[first][0])
+    assert line['quantity'] == boxes_by_sort[first][0]['quantity']
+    
+    for box in boxes_by_sort[first]:
+        assert inventory.remove(BoxInventory.type_of(box), box['quantity'] + 5) == box['quantity']
+    assert inventory.group_remaining(first) == 0
+    assert inventory.total == total_boxes - group_total
+    assert inventory.remaining_line(boxes_by_sort[first][0]) is line and line['quantity'] == 0
+    
+    # Lazy view follows the counts, one_per_type matches a scan of the expanded units
+    view = inventory.view()
+    units = list(view)
+    assert len(view) == len(units) == inventory.total
+    expected, seen = [], set()
+    for box in units:
+        key = (box.get('code', ''), box.get('material', ''))
+        if key not in seen:
+            seen.add(key)
+            expected.append(box)
+    assert view.one_per_type() == expected
+    
+    exclude = {(expected[0]['code'], expected[0]['material'])}
+    assert view.one_per_type(exclude=exclude) == expected[1:]
+    print("[OK] Test completed successfully!")
+
+
+def test_row_cell_index():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    packer = ZFirstPackingAlgorithm(container_dims=data['container'])
+    containers = packer.pack_boxes(data['boxes'])
+    
+    # Index built after row packing followed every post-processing move
+    for container in containers:
+        index = packer._row_index(container)
+        rows = group_by_position(container['boxes'], 'y')
+        assert index.rows() == rows
+        assert list(index.rows()) == list(rows)
+        for row_y, row_boxes in rows.items():
+            assert index.cells(row_y) == group_by_position(row_boxes, 'x')
+        
+        # Moving a box updates its old and new row
+        box = rows[next(iter(rows))][0]
+        old_y = box.y
+        box.move(y=old_y + 1000)
+        index.update(box)
+        assert all(b is not box for b in index.row(old_y))
+        assert index.row(old_y + 1000) == [box]
+        box.move(y=old_y)
+        index.update(box)
+        assert index.rows() == rows
+    print("[OK] Test completed successfully!")
+
+
+def test_z_first_dirty_rows():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    packer = ZFirstPackingAlgorithm(container_dims=data['container'])
+    containers = packer.pack_boxes(data['boxes'])
+    print(f"Post-processing: {packer.post_process_stats}")
+    assert packer.post_process_stats['converged']
+    
+    # Fixed point: nothing changed since the last runs, so the phases skip every row
+    index = packer._row_index(containers[0])
+    stamp = index.stamp
+    packer.optimize_cell_heights(containers, dirty_only=True)
+    packer.optimize_row_width_utilization(containers, dirty_only=True)
+    assert index.stamp == stamp
+    assert sum(len(c['boxes']) for c in containers) == sum(box['quantity'] for box in data['boxes'])
+    
+    # A pass that does not improve the score is undone box by box
+    snapshot = packer._layout_snapshot()
+    layout = [b.to_dict() for c in containers for b in c['boxes']]
+    box = containers[0]['boxes'][0]
+    box.move(x=box.x + 1.0, z=box.z + 1.0)
+    box.resize({'width': box.length, 'length': box.width, 'height': box.height})
+    packer._restore_layout(snapshot)
+    assert [b.to_dict() for c in packer.containers for b in c['boxes']] == layout
+    print("[OK] Test completed successfully!")
+
+
+def test_length_index():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    packer = ZFirstPackingAlgorithm(container_dims=data['container'])
+    orientations = packer.get_all_orientations
+    lines = data['boxes']
+    units = [box for box in lines for _ in range(box['quantity'])]
+    
+    # Range queries match a scan of every unit and orientation
+    index = LengthIndex(units, orientations)
+    for allowed in ([34.0], [34.0, 17.5], [lines[0]['dimensions']['length']]):
+        for tol in (1.0, 2.0, 3.0, 10.0):
+            expected = [box for box in units
+                        if any(abs(o['length'] - a) <= tol for o in orientations(box) for a in allowed)]
+            assert index.filter(units, allowed, tol) == expected
+    
+    # Histogram over lines equals counting every listed box
+    for boxes in (lines, units[:50]):
+        histogram = length_histogram(boxes, orientations)
+        expected = {}
+        for box in boxes:
+            for o in orientations(box):
+                entry = expected.setdefault(o['length'], {'count': 0, 'boxes': set()})
+                entry['count'] += box['quantity']
+                entry['boxes'].add(box['code'])
+        assert list(histogram) == list(expected)
+        assert all(histogram[l]['count'] == e['count'] and histogram[l]['boxes'] == e['boxes']
+                   for l, e in expected.items())
+    print("[OK] Test completed successfully!")
+
+
+def test_z_first_parallel_rows():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    def line(code, width, length, height, quantity):
+        return {'code': code, 'dimensions': {'width': width, 'length': length, 'height': height},
+                'quantity': quantity, 'material': code, 'packing_method': 'CARTON', 'sort_order': 1}
+    
+    # Dominant length 95" is mostly boxes taller than the container: the first
+    # row comes out short and the alternative lengths are tried
+    boxes = [line(f'X{i}', 50, 95, 110, 2) for i in range(10)]
+    boxes += [line('A', 50, 95, 40, 1)] + [line(f'B{i}', 40, 60, 40, 1) for i in range(3)]
+    
+    layouts = []
+    for parallel_rows in (0, 2):
+        packer = ZFirstPackingAlgorithm(container_dims=data['container'], parallel_rows=parallel_rows)
+        containers = packer.pack_boxes(boxes)
+        layouts.append([(b.code, b.x, b.y, b.z, b.width, b.length, b.height)
+                        for c in containers for b in c['boxes']])
+        assert packer._row_pool is None  # Pool shut down after packing
+    
+    # Same winner as the sequential retries
+    assert layouts[0] == layouts[1]
+    assert len(layouts[0]) == 4
+    print("[OK] Test completed successfully!")
+
+
+def test_stamp_tail_rows():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # Mixed head, then a long single-SKU tail
+    boxes = data['boxes'][:6] + [{'code': 'J2', 'dimensions': {'width': 18, 'length': 24, 'height': 12},
+                                  'quantity': 150, 'material': 'J2M', 'packing_method': 'CARTON',
+                                  'sort_order': 99}]
+    total_boxes = sum(box['quantity'] for box in boxes)
+    
+    packers = [
+        lambda stamp: ZFirstPackingAlgorithm(data['container'], use_row_cache=False, stamp_tail_rows=stamp),
+        lambda stamp: GuidedPackingAlgorithm(data['container'], 'manual_layout.json',
+                                             use_row_cache=False, stamp_tail_rows=stamp),
+    ]
+    for make_packer in packers:
+        layouts = []
+        for stamp in (False, True):
+            containers = make_packer(stamp).pack_boxes(boxes)
+            layouts.append([(b.code, b.x, b.y, b.z, b.width, b.length, b.height)
+                            for c in containers for b in c['boxes']])
+        
+        # Stamped rows are the rows the packer would have packed
+        assert layouts[0] == layouts[1]
+        assert len(layouts[1]) == total_boxes
+    print("[OK] Test completed successfully!")
+
+
+def test_width_knapsack():
+    from itertools import product
+    
+    # Widest fill equals a brute force over every unit count per width
+    cases = [
+        (((136,), 5), ((152, 192), 3), ((128,), 2)),
+        (((272, 208), 2), ((240,), 4), ((136, 152), 3), ((400,), 1)),
+    ]
+    for groups in cases:
+        for gap in (92.5, 60.0, 41.3):
+            capacity = capacity_ticks(gap)
+            picks = solve_fill(groups, capacity)
+            assert all(len(used) <= count and set(used) <= set(widths)
+                       for (widths, count), used in zip(groups, picks))
+            
+            choices = [[sum(combo) for n in range(count + 1)
+                        for combo in product(widths, repeat=n)] for widths, count in groups]
+            best = max(s for s in map(sum, product(*choices)) if s <= capacity)
+            assert sum(map(sum, picks)) == best
+    
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    packer = ZFirstPackingAlgorithm(data['container'], validate_moves=True, gap_fill='knapsack')
+    containers = packer.pack_boxes(data['boxes'])
+    assert sum(len(c['boxes']) for c in containers) == sum(box['quantity'] for box in data['boxes'])
+    assert all(not validate_layout(c['boxes'], data['container']) for c in containers)
+    print("[OK] Test completed successfully!")
+
+
+def test_stack_knapsack():
+    def line(code, width, length, height, packing_method):
+        return {'code': code, 'dimensions': {'width': width, 'length': length, 'height': height},
+                'quantity': 1, 'material': code, 'packing_method': packing_method}
+    
+    # 30" free: greedy (smallest first) stacks 12 + 12 = 24", the knapsack 12 + 18 = 30"
+    boxes = [line('A', 20, 30, 12, 'CARTON'), line('A', 20, 30, 12, 'CARTON'), line('B', 20, 30, 18, 'CARTON')]
+    fill = stack_fill(boxes, 30.0, 25.0, 34.0)
+    assert sum(o['height'] for _, o in fill) == 30.0
+    
+    # CARTON stays upright; PRE_PACK with height > length may lie on its side
+    # (height 40" -> 10"), as long as the new length fits the cell depth
+    carton = [line('C', 20, 10, 40, 'CARTON')]
+    pre_pack = [line('P', 20, 10, 40, 'PRE_PACK')]
+    assert stack_fill(carton, 30.0, 25.0, 45.0) == []
+    assert [o['height'] for _, o in stack_fill(pre_pack, 30.0, 25.0, 45.0)] == [20]
+    assert stack_fill(pre_pack, 30.0, 25.0, 30.0) == []
+    
+    # A placement lying on its side gets the orientations of its order line
+    lying = Placement.of(pre_pack[0], 0.0, 0.0, 0.0, {'width': 20, 'length': 40, 'height': 10})
+    assert stack_fill([lying], 30.0, 25.0, 45.0) == [(lying, stack_fill(pre_pack, 30.0, 25.0, 45.0)[0][1])]
+    
+    # Same cell and signature again: answered from the cache
+    hits = solve_stack_fill.cache_info().hits
+    stack_fill(boxes, 30.0, 25.0, 34.0)
+    assert solve_stack_fill.cache_info().hits == hits + 1
+    
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    packer = ZFirstPackingAlgorithm(data['container'], cell_fill='knapsack')
+    containers = packer.pack_boxes(data['boxes'])
+    assert sum(len(c['boxes']) for c in containers) == sum(box['quantity'] for box in data['boxes'])
+    assert all(not validate_layout(c['boxes'], data['container']) for c in containers)
+    print("[OK] Test completed successfully!")
+
+
+def test_z_first_beam():
+    with open('test_data_real_3d.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    total_boxes = sum(box['quantity'] for box in data['boxes'])
+    
+    for beam_width, beam_budget in ((8, 5.0), (32, 0.0)):
+        packer = ZFirstBeamPackingAlgorithm(data['container'], beam_width=beam_width,
+                                            beam_budget=beam_budget, validate_moves=True,
+                                            use_row_cache=False)
+        containers = packer.pack_boxes(data['boxes'])
+        assert sum(len(c['boxes']) for c in containers) == total_boxes
+        assert all(not validate_layout(c['boxes'], data['container']) for c in containers)
+        assert packer.beam_stats['rows'] > 0
+        # No budget: every row narrows to 1 at once and still completes
+        assert packer.beam_stats['timeouts'] == (packer.beam_stats['rows'] if not beam_budget else 0)
+    
+    # Rows cut short by the wall-clock deadline stay out of the shared row cache
+    ROW_PATTERNS.clear()
+    timed = ZFirstBeamPackingAlgorithm(data['container'], beam_budget=1e-9)
+    timed.pack_boxes(data['boxes'])
+    assert timed.beam_stats['timeouts'] > 0
+    assert ROW_PATTERNS.stats()['size'] == 0
+    
+    # Workers and the row cache see the beam options
+    options = packer._row_candidate_options()
+    assert options['beam_width'] == 32 and options['beam_budget'] == 0.0
+    print("[OK] Test completed successfully!")
+
+
 if __name__ == '__main__':
     test_z_first_packing()
+    test_z_first_validate_moves()
+    test_z_first_block_building()
+    test_z_first_beam_validate_moves()
+    test_box_inventory()
+    test_row_cell_index()
+    test_z_first_dirty_rows()
+    test_length_index()
+    test_z_first_parallel_rows()
+    test_stamp_tail_rows()
+    test_width_knapsack()
+    test_stack_knapsack()
+    test_z_first_beam()
 
@@ -0,0 +1,79 @@
+"""
+Width Knapsack - exact fill of a row's X-gap with box columns
+
+Gap filling used to drop boxes into an X-gap greedily (widest fitting box
+first), which often strands a few inches a different combination would
+use. Here the gap is a bounded group knapsack (1D cutting stock) in ticks:
+- Each group is one candidate line: the widths of its allowed orientations
+  and how many units of it may be used
+- The solver picks, for every group, how many units to place in which
+  width so the filled width is as large as possible (never above the gap)
+- Groups are listed in priority order; among fills of the same width, fills
+  that use earlier groups (and fewer later ones) win
+
+Solutions depend only on (groups, capacity), so they are memoized: rows
+that see the same widths and counts against the same gap reuse the table.
+"""
+
+import math
+from functools import lru_cache
+from itertools import combinations_with_replacement
+from typing import Dict, Tuple
+
+from fixed_point import TICKS_PER_INCH
+
+# Guards against float noise when flooring the gap
+_EPSILON = 1e-6
+
+Groups = Tuple[Tuple[Tuple[int, ...], int], ...]
+
+
+def capacity_ticks(width: float) -> int:
+    """Gap width in inches -> ticks, rounded down so a fill never overruns the gap"""
+    return math.floor(width * TICKS_PER_INCH + _EPSILON)
+
+
+@lru_cache(maxsize=4096)
+def solve_fill(groups: Groups, capacity: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Fullest fill of capacity ticks from bounded groups of unit sizes
+
+    Sizes are widths for X-gaps; the same solver fills cell heights
+    (see stack_knapsack_3d).
+
+    Args:
+        groups: (allowed sizes in ticks, max units) per group, priority order
+        capacity: Gap size in ticks
+
+    Returns:
+        Tuple: Size (ticks) of every unit used, per group (empty = unused)
+    """
+    # reach: filled width -> how it was reached, one dict per group (for backtracking)
+    reach: Dict[int, Tuple[int, Tuple[int, ...]]] = {0: (0, ())}
+    stages = []
+    for widths, count in groups:
+        options = sorted(set(w for w in widths if 0 < w <= capacity), reverse=True)
+        count = min(count, capacity // options[-1]) if options else 0
+
+        # Sums of every multiset of up to count units (first found kept)
+        picks: Dict[int, Tuple[int, ...]] = {}
+        for n in range(1, count + 1):
+            for combo in combinations_with_replacement(options, n):
+                picks.setdefault(sum(combo), combo)
+
+        stage = {filled: (filled, ()) for filled in reach}  # Group unused
+        for filled in sorted(reach):
+            for total, combo in picks.items():
+                target = filled + total
+                if target <= capacity and target not in stage:
+                    stage[target] = (filled, combo)
+        stages.append(stage)
+        reach = stage
+
+    # Backtrack from the widest reachable fill
+    filled = max(reach)
+    used = []
+    for stage in reversed(stages):
+        filled, combo = stage[filled]
+        used.append(combo)
+    return tuple(reversed(used))
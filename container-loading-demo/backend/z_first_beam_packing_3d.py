@@ -0,0 +1,193 @@
+"""
+Z-First Beam Packing Algorithm - Z-First rows composed by beam search
+
+Same pipeline as Z-First (row selection, backfill, gap filling, row
+consolidation, post-processing), but the main pass of each row keeps the
+top-K partial row compositions instead of one greedy pass in box order:
+1. The row's candidate units are counted per order line (compact type
+   counts, units are never expanded into dict copies)
+2. A partial row is (units left per type, column cursor X/Z, column width);
+   it grows by one unit of any type with units left, on top of the current
+   column or, if it does not fit there, at the bottom of the next column
+3. Children are scored on width fill, height fill of the used columns and
+   sort_order grouping; the best K distinct states survive each step
+4. When the time budget of the row runs out the beam narrows to 1 (the
+   best state is finished greedily), so every row completes. Where the
+   deadline cut in depends on machine load, so such rows are not put in
+   the shared row pattern cache (a zero budget cuts in at once and stays
+   deterministic)
+"""
+
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from z_first_packing_3d import ZFirstPackingAlgorithm
+from length_index_3d import distinct_lines
+from row_state_3d import RowState
+from fixed_point import to_ticks
+from placement import Placement
+
+
+class ZFirstBeamPackingAlgorithm(ZFirstPackingAlgorithm):
+    """
+    Z-First Packing with a top-K beam search per row
+
+    Args:
+        container_dims: Container width/length/height
+        beam_width: Partial rows kept per step (K)
+        beam_budget: Seconds the beam may search per row before it narrows to 1
+        validate_moves: As in ZFirstPackingAlgorithm, but on by default: beam rows
+                        are taller, so post-processing has more boxes to move
+        **kwargs: ZFirstPackingAlgorithm options
+    """
+
+    # Beam score weights: width fill, height fill, sort_order grouping
+    WIDTH_WEIGHT = 0.4
+    HEIGHT_WEIGHT = 0.4
+    GROUPING_WEIGHT = 0.2
+
+    def __init__(self, container_dims: Dict[str, float], beam_width: int = 8,
+                 beam_budget: float = 0.25, validate_moves: bool = True, **kwargs):
+        if beam_width < 1:
+            raise ValueError(f"beam_width must be at least 1, got {beam_width}")
+        super().__init__(container_dims, validate_moves=validate_moves, **kwargs)
+        self.beam_width = beam_width
+        self.beam_budget = beam_budget
+        self.beam_stats = {'rows': 0, 'expansions': 0, 'timeouts': 0}
+
+    def _row_candidate_options(self) -> Dict[str, Any]:
+        """Constructor options a worker needs to pack rows like this packer"""
+        options = super()._row_candidate_options()
+        options.update(beam_width=self.beam_width, beam_budget=self.beam_budget)
+        return options
+
+    def _beam_score(self, x: float, col_w: float, covered: float, grouped: int, placed: int,
+                    container_width: float, container_height: float) -> float:
+        """
+        Score of a partial row (higher is better)
+
+        Args:
+            x, col_w: Current column X and width
+            covered: Front area covered by placed units
+            grouped: Placed units of the row's first sort_order
+            placed: Placed units
+            container_width, container_height: Row cross-section
+        """
+        extent = x + col_w
+        if not placed or not extent:
+            return 0.0
+        width_fill = min(extent / container_width, 1.0)
+        height_fill = covered / (extent * container_height)
+        return (self.WIDTH_WEIGHT * width_fill + self.HEIGHT_WEIGHT * height_fill +
+                self.GROUPING_WEIGHT * grouped / placed)
+
+    def fill_row_columns(self, row: RowState, expanded_boxes: List[Dict], row_y: float,
+                         container_height: float, container_width: float, primary_length: float,
+                         secondary_length: Optional[float], tolerance: float,
+                         original_expanded_boxes: List[Dict]) -> float:
+        """
+        Main pass of pack_row_z_first as a beam search over type counts
+
+        Args:
+            row: Row state the boxes are added to
+            expanded_boxes: Units matching the row's lengths, in packing order
+            row_y: Y position for this row
+            container_height, container_width: Row cross-section
+            primary_length, secondary_length: Allowed lengths (secondary optional)
+            tolerance: Length tolerance
+            original_expanded_boxes: All units of the row (before the length filter)
+
+        Returns:
+            float: Length tolerance (unchanged, the beam does not relax it)
+        """
+        allowed_lengths = [primary_length] + ([secondary_length] if secondary_length else [])
+
+        # Compact types: one per order line, with its units and usable orientations
+        lines = []      # Order line per type
+        options = []    # [(width, height, orientation)] per type
+        counts = []     # Units per type
+        grouping = []   # 1 if the type belongs to the row's first sort_order
+        first_group = expanded_boxes[0].get('sort_order', 999) if expanded_boxes else None
+        for box, count in distinct_lines(expanded_boxes):
+            usable = {}
+            for orientation in self.get_all_orientations(box):
+                if not any(abs(orientation['length'] - length) <= tolerance for length in allowed_lengths):
+                    continue
+                if orientation['width'] > container_width or orientation['height'] > container_height:
+                    continue
+                # Orientations with the same front size (in ticks) are one option
+                usable.setdefault((to_ticks(orientation['width']), to_ticks(orientation['height'])),
+                                  orientation)
+            if usable:
+                lines.append(box)
+                options.append([(orientation['width'], orientation['height'], orientation)
+                                for orientation in usable.values()])
+                counts.append(count)
+                grouping.append(1 if box.get('sort_order', 999) == first_group else 0)
+        if not lines:
+            return tolerance
+
+        # State: (score, counts, x, z, col_w, covered, grouped, placed, trail)
+        # trail: (parent trail, type, orientation, x, z) linked back to None
+        beam = [(0.0, tuple(counts), 0.0, 0.0, 0.0, 0.0, 0, 0, None)]
+        complete = []
+        width = self.beam_width
+        deadline = time.perf_counter() + self.beam_budget
+        while beam:
+            if width > 1 and time.perf_counter() >= deadline:
+                width = 1  # Out of budget: finish the best state greedily
+                self.beam_stats['timeouts'] += 1
+                if self.beam_budget > 0:
+                    self._row_cacheable = False
+
+            children: Dict[Tuple, Tuple] = {}
+            for state in beam:
+                _, left, x, z, col_w, covered, grouped, placed, trail = state
+                expanded = False
+                for i, count in enumerate(left):
+                    if not count:
+                        continue
+                    for w, h, orientation in options[i]:
+                        if z + h <= container_height and x + w <= container_width:
+                            px, pz, ncol = x, z, max(col_w, w)   # On top of the current column
+                        elif col_w and x + col_w + w <= container_width:
+                            px, pz, ncol = x + col_w, 0.0, w     # Bottom of the next column
+                        else:
+                            continue
+                        nx, nz = px, pz + h
+                        if nz >= container_height:
+                            nx, nz, ncol = px + ncol, 0.0, 0.0   # Column full
+                        expanded = True
+
+                        nleft = left[:i] + (count - 1,) + left[i + 1:]
+                        ncovered = covered + w * h
+                        ngrouped = grouped + grouping[i]
+                        score = self._beam_score(nx, ncol, ncovered, ngrouped, placed + 1,
+                                                 container_width, container_height)
+                        # Cursor in ticks only to merge equal states
+                        key = (nleft, to_ticks(nx), to_ticks(nz), to_ticks(ncol))
+                        if key not in children or score > children[key][0]:
+                            children[key] = (score, nleft, nx, nz, ncol, ncovered, ngrouped, placed + 1,
+                                             (trail, i, orientation, px, pz))
+                if not expanded:
+                    complete.append(state)
+
+            self.beam_stats['expansions'] += len(children)
+            beam = heapq.nlargest(width, children.values(), key=lambda s: s[0])
+
+        best = max(complete, key=lambda s: s[0])
+        self.beam_stats['rows'] += 1
+
+        # Trail back to placements, in placement order
+        steps = []
+        trail = best[8]
+        while trail is not None:
+            trail, i, orientation, px, pz = trail
+            steps.append((lines[i], orientation, px, pz))
+        for box, orientation, px, pz in reversed(steps):
+            row.add(Placement.of(box, px, row_y, pz, orientation))
+
+        print(f"  -> Beam: {best[7]} boxes from {len(lines)} types (K={self.beam_width}, "
+              f"score={best[0]:.3f})")
+        return tolerance
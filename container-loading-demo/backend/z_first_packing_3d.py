@@ -8,9 +8,48 @@ Strategy:
 4. Create rows dynamically based on available boxes
 """
 
-from typing import List, Dict, Any
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Tuple
 from collections import Counter
 from laff_bin_packing_3d import LAFFBinPacking3D
+from voxel_grid_3d import VoxelGrid
+from box_inventory_3d import BoxInventory, RemainingView
+from row_cell_index_3d import RowCellIndex
+from row_state_3d import RowState
+from length_index_3d import LengthIndex, distinct_lines, length_histogram
+from row_pattern_cache import ROW_PATTERNS, RowPattern, counts_signature, lines_signature
+from width_knapsack_3d import capacity_ticks, solve_fill
+from stack_knapsack_3d import stack_fill
+from fixed_point import to_ticks, size_ticks, group_by_position
+from orientation_table import get_orientations
+from placement import Placement
+
+
+# Row packers of a worker process, one per (class, container dims, options)
+_worker_packers: Dict[Tuple, 'ZFirstPackingAlgorithm'] = {}
+
+
+def _pack_row_candidate(packer_cls: type, container_dims: Dict[str, float], options: Dict[str, Any],
+                        boxes: List[Dict], row_y: float, dominant_length: float) -> List[Placement]:
+    """
+    Pack one dominant_length row candidate (runs in a worker process)
+    
+    Args:
+        packer_cls: Z-First packer class to build
+        container_dims: Container width/length/height
+        options: Constructor options that affect row packing
+        boxes, row_y, dominant_length: As for pack_row_z_first
+        
+    Returns:
+        List[Placement]: Placed boxes of the candidate row
+    """
+    key = (packer_cls, tuple(sorted(container_dims.items())), tuple(sorted(options.items())))
+    packer = _worker_packers.get(key)
+    if packer is None:
+        packer = _worker_packers[key] = packer_cls(container_dims, **options)
+    return packer.pack_row_z_first(boxes, row_y, container_dims['height'], container_dims['width'],
+                                   dominant_length=dominant_length)
 
 
 class ZFirstPackingAlgorithm(LAFFBinPacking3D):
@@ -26,8 +65,47 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
     Inherits from LAFFBinPacking3D for base functionality.
     """
     
-    def __init__(self, container_dims: Dict[str, float]):
+    # Safety cap on re-optimization passes (besides the time budget)
+    MAX_POST_PASSES = 20
+    
+    # How X-gaps of a row are filled: widest fitting box first, or an exact
+    # width knapsack over all candidates (see width_knapsack_3d)
+    GAP_FILL_MODES = ('greedy', 'knapsack')
+    # How optimize_cell_heights tops up cells: smallest box first, or an exact
+    # height knapsack (see stack_knapsack_3d)
+    CELL_FILL_MODES = ('greedy', 'knapsack')
+    
+    def __init__(self, container_dims: Dict[str, float], validate_moves: bool = False,
+                 post_process_budget: float = 2.0, parallel_rows: int = 0, use_row_cache: bool = True,
+                 stamp_tail_rows: bool = True, gap_fill: str = 'greedy', cell_fill: str = 'greedy'):
+        if gap_fill not in self.GAP_FILL_MODES:
+            raise ValueError(f"Unknown gap_fill '{gap_fill}', expected one of {self.GAP_FILL_MODES}")
+        if cell_fill not in self.CELL_FILL_MODES:
+            raise ValueError(f"Unknown cell_fill '{cell_fill}', expected one of {self.CELL_FILL_MODES}")
         super().__init__(container_dims)
+        # Opt-in: check post-processing moves against a voxel occupancy grid
+        # and skip moves whose target overlaps another box or leaves the container
+        self.validate_moves = validate_moves
+        self.move_stats = {'checked': 0, 'rejected': 0}
+        # Seconds the re-optimization loop may run after row consolidation
+        self.post_process_budget = post_process_budget
+        self.post_process_stats = {'passes': 0, 'converged': False}
+        # Row/cell index per container, built after row packing (id(container) -> index)
+        self._row_indexes: Dict[int, RowCellIndex] = {}
+        # Index stamp at the last start of each phase ((id(container), phase) -> stamp)
+        self._phase_stamps: Dict[Tuple[int, str], int] = {}
+        # Opt-in: worker processes that pack the alternative dominant_length
+        # candidates of every row while the row itself is packed (0 = sequential retries)
+        self.parallel_rows = parallel_rows
+        self._row_pool: Optional[ProcessPoolExecutor] = None
+        # Reuse rows packed before from the same lines (shared LRU, see row_pattern_cache)
+        self.use_row_cache = use_row_cache
+        # Cleared by a main pass whose result depends on wall-clock time: that row is not cached
+        self._row_cacheable = True
+        # Repeat the last row along Y once only its SKU is left (see _stamp_tail_rows)
+        self.stamp_tail_rows = stamp_tail_rows
+        self.gap_fill = gap_fill
+        self.cell_fill = cell_fill
     
     def pack_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -39,8 +117,79 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             List[Dict]: Container with packed boxes
         """
+        if self.parallel_rows > 0:
+            self._row_pool = ProcessPoolExecutor(max_workers=self.parallel_rows)
+        try:
+            return self._pack_boxes(boxes)
+        finally:
+            if self._row_pool is not None:
+                self._row_pool.shutdown(cancel_futures=True)
+                self._row_pool = None
+    
+    def _row_candidate_options(self) -> Dict[str, Any]:
+        """Constructor options a worker needs to pack rows like this packer"""
+        return {'gap_fill': self.gap_fill}
+    
+    def _row_cache_key(self, boxes: List[Dict], container_height: float, container_width: float,
+                       dominant_length: Optional[float],
+                       all_remaining_boxes: Optional[RemainingView]) -> Tuple:
+        """Row pattern cache key of a pack_row_z_first call (row_y excluded)"""
+        remaining = counts_signature(all_remaining_boxes.lines()) if all_remaining_boxes is not None else None
+        return (type(self), tuple(sorted(self._row_candidate_options().items())), lines_signature(boxes),
+                container_height, container_width, dominant_length, remaining)
+    
+    def _submit_row_candidates(self, boxes: List[Dict], row_y: float,
+                               lengths: List[float]) -> List[Future]:
+        """Start packing one row candidate per dominant length in the worker pool"""
+        # Snapshot the lines: remaining lines are refreshed in place on later rows
+        boxes = [box.copy() for box in boxes]
+        return [self._row_pool.submit(_pack_row_candidate, type(self), self.container,
+                                      self._row_candidate_options(), boxes, row_y, length)
+                for length in lengths]
+    
+    def _stamp_tail_rows(self, placed_boxes: List[Placement], row_y: float, row_length: float,
+                         inventory: BoxInventory, current_y: float) -> Tuple[float, int]:
+        """
+        Repeat a single-SKU row along Y while only that SKU is left
+        
+        Full rows only: the last, partial row goes through pack_row_z_first.
+        
+        Args:
+            placed_boxes: Row just packed (already booked out and added)
+            row_y, row_length: Y position and length of that row
+            inventory: Remaining units
+            current_y: Y position of the next row
+            
+        Returns:
+            (Y position of the next row, number of rows stamped)
+        """
+        first = placed_boxes[0]
+        if any(b.code != first.code or b.material != first.material for b in placed_boxes):
+            return current_y, 0
+        key = inventory.type_of_placed(first)
+        if key is None or inventory.total != inventory.counts.get(key, 0):
+            return current_y, 0  # Other SKUs left
+        
+        pattern = RowPattern.of(placed_boxes, row_y)
+        stamped = 0
+        while inventory.total >= len(pattern) and current_y < self.container['length']:
+            for box in pattern.place(current_y):
+                self._add_placed_box(box)
+            inventory.remove(key, len(pattern))
+            current_y += row_length
+            stamped += 1
+        
+        if stamped:
+            print(f"  -> Stamped {stamped} rows of {first.code} ({len(pattern)} boxes each), "
+                  f"Y position now: {current_y:.1f}\", remaining: {inventory.total} boxes")
+        return current_y, stamped
+    
+    def _pack_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pack rows, then post-process them (see pack_boxes)"""
         # Initialize container
         self._new_container()
+        self._row_indexes = {}
+        self._phase_stamps = {}
         
         # Sort boxes first (same logic as in pack_row_z_first)
         packing_method_priority = {'PRE_PACK': 0, 'CARTON': 1}
@@ -74,65 +223,39 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         row_number = 1
         
         # Track all remaining boxes across all sort_order groups
-        all_remaining_counts = {}
-        for sort_order in sorted(boxes_by_sort.keys()):
-            group_boxes = boxes_by_sort[sort_order]
-            for box in group_boxes:
-                qty = box.get('quantity', 1)
-                if qty == 0:
-                    continue
-                key = (box.get('code', ''), box.get('material', ''), 
-                       box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                all_remaining_counts[key] = all_remaining_counts.get(key, 0) + qty
+        # (running totals per type, per group and overall)
+        inventory = BoxInventory(boxes_by_sort)
         
         # OPTION A - PHASE 1: Process rows with global view
         # While there are boxes remaining, try to pack rows optimally
         processed_sort_orders = set()
         
-        while sum(all_remaining_counts.values()) > 0:
+        while inventory.total > 0:
             # OPTION A - PHASE 1: Get available boxes from ALL sort_order groups (prioritize unprocessed)
             # Priority: Process sort_order groups in order, but allow adding boxes from other groups
             available_boxes = []
             current_sort_order = None
             
             # First, try to get boxes from unprocessed sort_order groups (in order)
-            for sort_order in sorted(boxes_by_sort.keys()):
+            for sort_order in inventory.sort_orders:
                 if sort_order in processed_sort_orders:
                     continue  # Already processed this group
                 
-                group_boxes = boxes_by_sort[sort_order]
-                group_remaining = {}
-                
-                for box in group_boxes:
-                    key = (box.get('code', ''), box.get('material', ''), 
-                           box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                    if key in all_remaining_counts and all_remaining_counts[key] > 0:
-                        group_remaining[key] = all_remaining_counts[key]
-                
-                if group_remaining:
+                if inventory.group_remaining(sort_order) > 0:
                     current_sort_order = sort_order
-                    # Add boxes from this group
-                    for box in group_boxes:
-                        key = (box.get('code', ''), box.get('material', ''), 
-                               box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                        if key in group_remaining and group_remaining[key] > 0:
-                            box_copy = box.copy()
-                            box_copy['quantity'] = group_remaining[key]
-                            available_boxes.append(box_copy)
+                    # Add boxes from this group (quantity = units left)
+                    for box in boxes_by_sort[sort_order]:
+                        if inventory.remaining(box) > 0:
+                            available_boxes.append(inventory.remaining_line(box))
                     break  # Use first unprocessed group
             
             # OPTION A - PHASE 1: If no boxes from unprocessed groups, try processed groups
             if not available_boxes:
                 # No more boxes from unprocessed groups, try processed groups
-                for sort_order in sorted(boxes_by_sort.keys()):
-                    group_boxes = boxes_by_sort[sort_order]
-                    for box in group_boxes:
-                        key = (box.get('code', ''), box.get('material', ''), 
-                               box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                        if key in all_remaining_counts and all_remaining_counts[key] > 0:
-                            box_copy = box.copy()
-                            box_copy['quantity'] = all_remaining_counts[key]
-                            available_boxes.append(box_copy)
+                for sort_order in inventory.sort_orders:
+                    for box in boxes_by_sort[sort_order]:
+                        if inventory.remaining(box) > 0:
+                            available_boxes.append(inventory.remaining_line(box))
                             if current_sort_order is None:
                                 current_sort_order = sort_order
                             if len(available_boxes) >= 10:  # Limit to avoid too many
@@ -143,15 +266,22 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not available_boxes:
                 break
             
-            total_remaining = sum(all_remaining_counts.values())
+            total_remaining = inventory.total
             sort_order_str = f"sort_order={current_sort_order}" if current_sort_order else "mixed"
             print(f"Row {row_number}: {len(available_boxes)} box types, {total_remaining} boxes available ({sort_order_str})")
             
+            # Parallel mode: alternative dominant lengths are packed in the workers
+            # at the same time as the row, in case the row comes out too short
+            candidates = None
+            if self._row_pool is not None:
+                top_lengths = self.get_top_dominant_lengths(available_boxes, top_n=3)
+                candidates = self._submit_row_candidates(available_boxes, current_y, top_lengths[1:])
+            
             # Pack boxes in this row using Z-first strategy
             # OPTION C: Pass all_remaining_boxes to pack_row_z_first for enhanced gap filling
             placed_boxes = self.pack_row_z_first(
                 available_boxes, current_y, self.container['height'], self.container['width'],
-                all_remaining_boxes=self.get_all_remaining_boxes_list(all_remaining_counts, boxes_by_sort)
+                all_remaining_boxes=inventory.view()
             )
             
             if not placed_boxes:
@@ -165,7 +295,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if placed_boxes:
                 length_counts = {}
                 for box in placed_boxes:
-                    box_l = box['dimensions']['length']
+                    box_l = box.length
                     length_counts[box_l] = length_counts.get(box_l, 0) + 1
                 dominant_length = max(length_counts.items(), key=lambda x: x[1])[0] if length_counts else 34.0
                 tolerance = 2.0  # Default tolerance for gap filling
@@ -174,7 +304,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 tolerance = 2.0
             
             # Check row width utilization - if low, try adding more boxes from other groups
-            max_x = max(box['position']['x'] + box['dimensions']['width'] 
+            max_x = max(box.x + box.width 
                        for box in placed_boxes) if placed_boxes else 0
             width_utilization = (max_x / self.container['width'] * 100) if self.container['width'] > 0 else 0.0
             
@@ -182,16 +312,13 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if width_utilization < 80.0:
                 # Try to add boxes from other sort_order groups
                 additional_boxes = []
-                for sort_order in sorted(boxes_by_sort.keys()):
+                for sort_order in inventory.sort_orders:
                     if sort_order == current_sort_order:
                         continue  # Skip current group
-                    group_boxes = boxes_by_sort[sort_order]
-                    for box in group_boxes:
-                        key = (box.get('code', ''), box.get('material', ''), 
-                               box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                        if key in all_remaining_counts and all_remaining_counts[key] > 0:
+                    for box in boxes_by_sort[sort_order]:
+                        if inventory.remaining(box) > 0:
                             box_copy = box.copy()
-                            box_copy['quantity'] = min(all_remaining_counts[key], 10)  # Limit to avoid too many
+                            box_copy['quantity'] = min(inventory.remaining(box), 10)  # Limit to avoid too many
                             additional_boxes.append(box_copy)
                             if len(additional_boxes) >= 5:  # Limit additional boxes
                                 break
@@ -209,7 +336,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                     print(f"  -> Filled row gaps with {len([b for b in placed_boxes if b not in placed_boxes[:len(placed_boxes)-len(additional_boxes)]])} boxes from other groups")
             
             # Check if row is too short and retry with alternative dominant_length
-            max_z = max(box['position']['z'] + box['dimensions']['height']
+            max_z = max(box.z + box.height
                        for box in placed_boxes) if placed_boxes else 0
             
             if max_z < self.container['height'] * 0.5 and len(placed_boxes) < len(available_boxes) * 0.3:
@@ -218,14 +345,17 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 top_lengths = self.get_top_dominant_lengths(available_boxes, top_n=3)
                 # Skip first (already tried), try alternatives
                 retried = False
-                for alt_length in top_lengths[1:]:  # Skip first (already tried)
+                for k, alt_length in enumerate(top_lengths[1:]):  # Skip first (already tried)
                     print(f"  -> Retrying with dominant_length={alt_length:.1f}\"")
-                    placed_boxes_retry = self.pack_row_z_first(
-                        available_boxes, current_y, self.container['height'], self.container['width'],
-                        dominant_length=alt_length
-                    )
+                    if candidates is not None:
+                        placed_boxes_retry = candidates[k].result()
+                    else:
+                        placed_boxes_retry = self.pack_row_z_first(
+                            available_boxes, current_y, self.container['height'], self.container['width'],
+                            dominant_length=alt_length
+                        )
                     if placed_boxes_retry:
-                        max_z_retry = max(box['position']['z'] + box['dimensions']['height']
+                        max_z_retry = max(box.z + box.height
                                         for box in placed_boxes_retry)
                         # Accept retry if it's better (higher or more boxes)
                         if max_z_retry > max_z or len(placed_boxes_retry) > len(placed_boxes):
@@ -237,64 +367,51 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 if not retried:
                     print(f"  -> Retry did not improve, keeping original result")
             
-            # Remove placed boxes from all_remaining_counts
-            placed_by_type = {}
-            for placed_box in placed_boxes:
-                code = placed_box.get('code', 'UNKNOWN')
-                material = placed_box.get('material', '')
-                key = None
-                for sort_order in sorted(boxes_by_sort.keys()):
-                    group_boxes = boxes_by_sort[sort_order]
-                    for orig_box in group_boxes:
-                        if orig_box.get('code') == code and orig_box.get('material') == material:
-                            key = (orig_box.get('code', ''), orig_box.get('material', ''),
-                                   orig_box.get('purchasing_doc', ''), orig_box.get('packing_method', ''))
-                            break
-                    if key:
-                        break
-                
-                if key:
-                    placed_by_type[key] = placed_by_type.get(key, 0) + 1
+            # Candidates not needed (row long enough or an earlier one won)
+            for candidate in candidates or ():
+                candidate.cancel()
             
-            for key, count in placed_by_type.items():
-                if key in all_remaining_counts:
-                    all_remaining_counts[key] -= count
-                    if all_remaining_counts[key] < 0:
-                        all_remaining_counts[key] = 0
+            # Remove placed boxes from the inventory
+            inventory.remove_placed(placed_boxes)
             
             print(f"  -> Placed {len(placed_boxes)} boxes")
-            print(f"  -> Remaining: {sum(all_remaining_counts.values())} boxes")
+            print(f"  -> Remaining: {inventory.total} boxes")
             
             # Add placed boxes to container
             for box in placed_boxes:
-                self.current_container['boxes'].append(box)
-            
-            # Calculate max height in this row (for visualization only)
-            max_z = max(box['position']['z'] + box['dimensions']['height'] 
-                       for box in placed_boxes) if placed_boxes else 0
+                self._add_placed_box(box)
             
             # Calculate actual Y position used by this row
-            max_length = max(box['dimensions']['length'] for box in placed_boxes) if placed_boxes else 34.0
+            max_length = max(box.length for box in placed_boxes) if placed_boxes else 34.0
+            
+            # Max height in this row (for visualization only), read from the floor height map
+            row_y = current_y
+            max_z = self.height_map.top_surface(0, current_y, self.container['width'], max_length)
             current_y += max_length
             
             print(f"  -> Row height: {max_z:.1f}\" Z-axis, Y position now: {current_y:.1f}\"")
             
             row_number += 1
             
+            # Homogeneous tail: only this row's SKU is left, so the next full rows
+            # come out the same - stamp the pattern instead of packing them box by box
+            if self.stamp_tail_rows:
+                current_y, stamped = self._stamp_tail_rows(placed_boxes, row_y, max_length, inventory, current_y)
+                row_number += stamped
+            
             # Mark current sort_order as processed if all boxes from that group are placed
-            if current_sort_order:
-                group_remaining = sum(all_remaining_counts.get(
-                    (box.get('code', ''), box.get('material', ''), 
-                     box.get('purchasing_doc', ''), box.get('packing_method', '')), 0)
-                    for box in boxes_by_sort[current_sort_order])
-                if group_remaining == 0:
-                    processed_sort_orders.add(current_sort_order)
+            if current_sort_order and inventory.group_remaining(current_sort_order) == 0:
+                processed_sort_orders.add(current_sort_order)
             
             # Safety check: don't exceed container length
             if current_y >= self.container['length']:
                 print(f"WARNING: Stopping due to container length limit")
                 break
         
+        # Rows are final: index rows/cells once, moves keep the index up to date
+        for container in self.containers:
+            self._row_index(container)
+        
         # PHASE 2: Post-processing optimization - move cells from later rows to earlier rows
         self.containers = self.optimize_rows_by_moving_cells(self.containers)
         
@@ -307,12 +424,160 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         # OPTION A - PHASE 3: Row Consolidation
         self.containers = self.consolidate_rows(self.containers)
         
-        # Re-optimize after consolidation
-        self.containers = self.optimize_cell_heights(self.containers)
-        self.containers = self.optimize_row_width_utilization(self.containers)
+        # Re-optimize after consolidation: only rows touched since a phase last ran
+        # are revisited, until a pass moves nothing (fixed point), stops improving
+        # the layout (moves only shuffle boxes between rows - that pass is undone)
+        # or the budget is spent
+        deadline = time.perf_counter() + self.post_process_budget
+        self.post_process_stats = {'passes': 0, 'converged': False, 'stop': 'max_passes'}
+        score = self._post_process_score()
+        while self.post_process_stats['passes'] < self.MAX_POST_PASSES:
+            stamps = [self._row_index(c).stamp for c in self.containers]
+            snapshot = self._layout_snapshot()
+            self.containers = self.optimize_cell_heights(self.containers, dirty_only=True)
+            self.containers = self.optimize_row_width_utilization(self.containers, dirty_only=True)
+            self.post_process_stats['passes'] += 1
+            if [self._row_index(c).stamp for c in self.containers] == stamps:
+                self.post_process_stats.update(converged=True, stop='fixed_point')
+                break
+            new_score = self._post_process_score()
+            if new_score >= score:
+                self._restore_layout(snapshot)
+                self.post_process_stats.update(converged=True, stop='no_improvement')
+                break
+            score = new_score
+            if time.perf_counter() >= deadline:
+                self.post_process_stats['stop'] = 'budget'
+                break
+        print(f"DEBUG: Re-optimization passes: {self.post_process_stats['passes']} "
+              f"(stop: {self.post_process_stats['stop']})")
+        
+        # Post-processing moved boxes around: bring the height map back in sync
+        self.height_map.rebuild(self.current_container['boxes'])
         
         return self.containers
     
+    def _new_move_grid(self, container: Dict) -> Optional[VoxelGrid]:
+        """Voxel occupancy grid of container for move validation (None if disabled)"""
+        if not self.validate_moves:
+            return None
+        
+        dims = container['dimensions']
+        grid = VoxelGrid(dims['width'], dims['length'], dims['height'])
+        for box in container['boxes']:
+            grid.add_box(box)
+        return grid
+    
+    def _row_index(self, container: Dict) -> RowCellIndex:
+        """Row/cell index of container (built on first use)"""
+        index = self._row_indexes.get(id(container))
+        if index is None or len(index) != len(container['boxes']):
+            index = self._row_indexes[id(container)] = RowCellIndex(container['boxes'])
+        return index
+    
+    def _layout_snapshot(self) -> Tuple[List[Dict], List[List[Placement]], List[Tuple]]:
+        """Containers, their box lists and every box's position/size (see _restore_layout)"""
+        box_lists = [list(container['boxes']) for container in self.containers]
+        sizes = [(box, box.x, box.y, box.z, box.width, box.length, box.height)
+                 for boxes in box_lists for box in boxes]
+        return list(self.containers), box_lists, sizes
+    
+    def _restore_layout(self, snapshot: Tuple[List[Dict], List[List[Placement]], List[Tuple]]):
+        """
+        Undo every move made since _layout_snapshot
+        
+        Row indexes are rebuilt on next use; phases that already ran count the
+        restored layout as seen (stamp 0 of the new index), as they did before the pass.
+        """
+        containers, box_lists, sizes = snapshot
+        self.containers = containers
+        for container, boxes in zip(containers, box_lists):
+            container['boxes'] = boxes
+            self._row_indexes.pop(id(container), None)
+        for key in self._phase_stamps:
+            self._phase_stamps[key] = 0
+        for box, x, y, z, width, length, height in sizes:
+            box.move(x, y, z)
+            box.resize({'width': width, 'length': length, 'height': height})
+    
+    def _post_process_score(self) -> Tuple[int, int]:
+        """
+        (non-empty rows, cells below 95% of the container height) over all
+        containers - lower is better, compared between re-optimization passes
+        """
+        rows = incomplete = 0
+        for container in self.containers:
+            if not container.get('boxes'):
+                continue
+            min_height = container['dimensions']['height'] * 0.95
+            index = self._row_index(container)
+            for row_y in index.rows():
+                rows += 1
+                incomplete += sum(1 for cell_boxes in index.cells(row_y).values()
+                                  if max(box.z + box.height for box in cell_boxes) < min_height)
+        return rows, incomplete
+    
+    def _dirty_rows(self, container: Dict, phase: str, dirty_only: bool) -> Optional[Set[int]]:
+        """
+        Rows (Y ticks) touched since phase last ran on container
+        
+        Records the phase start, so moves made by this run count as dirty for
+        the next one.
+        
+        Returns:
+            Set[int] or None: None = every row (dirty_only off or first run)
+        """
+        index = self._row_index(container)
+        key = (id(container), phase)
+        since = self._phase_stamps.get(key)
+        self._phase_stamps[key] = index.stamp
+        if not dirty_only or since is None:
+            return None
+        return index.changed_since(since)
+    
+    def _move_boxes(self, grid: Optional[VoxelGrid],
+                    moves: List[Tuple[Placement, Dict[str, float], Optional[Dict[str, float]]]],
+                    index: Optional[RowCellIndex] = None) -> bool:
+        """
+        Apply a post-processing move of one or more boxes
+        
+        Args:
+            grid: Voxel grid from _new_move_grid (None = apply without checking)
+            moves: (box, new position values, new dimensions or None) per box
+            index: Row/cell index of the container, updated with the moves
+            
+        Returns:
+            bool: False if the move was rejected (nothing changed)
+        """
+        if grid is not None:
+            self.move_stats['checked'] += 1
+            for box, _, _ in moves:
+                grid.remove_box(box)
+            
+            targets = []
+            for box, position, dimensions in moves:
+                pos = {**box.position, **position}
+                dims = dimensions or box.dimensions
+                target = (pos['x'], pos['y'], pos['z'], dims['width'], dims['length'], dims['height'])
+                if not grid.fits(*target) or not grid.is_empty(*target):
+                    # Target overlaps another box or leaves the container: undo
+                    for placed in targets:
+                        grid.remove(*placed)
+                    for moved, _, _ in moves:
+                        grid.add_box(moved)
+                    self.move_stats['rejected'] += 1
+                    return False
+                grid.add(*target)
+                targets.append(target)
+        
+        for box, position, dimensions in moves:
+            box.move(**position)
+            if dimensions is not None:
+                box.resize(dimensions)
+            if index is not None:
+                index.update(box)
+        return True
+    
     def optimize_rows_by_moving_cells(self, containers: List[Dict]) -> List[Dict]:
         """
         Post-processing: Move cells from later rows to earlier rows if space available
@@ -337,27 +602,14 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not boxes:
                 continue
             
+            move_grid = self._new_move_grid(container)
+            
             container_width = container['dimensions']['width']
             container_height = container['dimensions']['height']
             
-            # Group boxes into rows based on Y position (with tolerance)
-            rows_dict = {}
-            tolerance_y = 0.5  # Tolerance for grouping by Y
-            
-            for box in boxes:
-                y_pos = box['position']['y']
-                # Find existing row or create new one
-                row_key = None
-                for key in rows_dict.keys():
-                    if abs(key - y_pos) <= tolerance_y:
-                        row_key = key
-                        break
-                
-                if row_key is None:
-                    row_key = y_pos
-                    rows_dict[row_key] = []
-                
-                rows_dict[row_key].append(box)
+            # Rows by Y position (same position in ticks), from the row/cell index
+            index = self._row_index(container)
+            rows_dict = index.rows()
             
             # Sort rows by Y position (top to bottom)
             sorted_rows_y = sorted(rows_dict.keys())
@@ -370,26 +622,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 if not row_boxes:
                     continue
                 
-                # Group boxes in this row by X position (cells)
-                cells_dict = {}
-                tolerance_x = 0.5  # Tolerance for grouping by X
-                
-                for box in row_boxes:
-                    x_pos = box['position']['x']
-                    cell_key = None
-                    for key in cells_dict.keys():
-                        if abs(key - x_pos) <= tolerance_x:
-                            cell_key = key
-                            break
-                    
-                    if cell_key is None:
-                        cell_key = x_pos
-                        cells_dict[cell_key] = []
-                    
-                    cells_dict[cell_key].append(box)
-                
                 # Calculate current row width
-                max_x_in_row = max(box['position']['x'] + box['dimensions']['width'] 
+                max_x_in_row = max(box.x + box.width 
                                  for box in row_boxes)
                 row_width = max_x_in_row
                 remaining_width = container_width - row_width
@@ -400,7 +634,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                     continue
                 
                 # Find row max height (for checking if cell can fit)
-                row_max_height = max(box['position']['z'] + box['dimensions']['height'] 
+                row_max_height = max(box.z + box.height 
                                    for box in row_boxes) if row_boxes else 0
                 
                 # Scan later rows for cells that can fit
@@ -411,21 +645,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                     if not later_row_boxes:
                         continue
                     
-                    # Group boxes in later row by X position
-                    later_cells_dict = {}
-                    for box in later_row_boxes:
-                        x_pos = box['position']['x']
-                        cell_key = None
-                        for key in later_cells_dict.keys():
-                            if abs(key - x_pos) <= tolerance_x:
-                                cell_key = key
-                                break
-                        
-                        if cell_key is None:
-                            cell_key = x_pos
-                            later_cells_dict[cell_key] = []
-                        
-                        later_cells_dict[cell_key].append(box)
+                    # Cells of later row by X position (later rows only lose boxes,
+                    # so the indexed row is this row)
+                    later_cells_dict = index.cells(later_row_y)
                     
                     # Try to move cells from later row
                     cells_to_remove = []
@@ -434,10 +656,10 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                             continue
                         
                         # Calculate cell dimensions
-                        cell_width = max(box['position']['x'] + box['dimensions']['width'] 
-                                       for box in cell_boxes) - min(box['position']['x'] 
+                        cell_width = max(box.x + box.width 
+                                       for box in cell_boxes) - min(box.x 
                                                                     for box in cell_boxes)
-                        cell_height = max(box['position']['z'] + box['dimensions']['height'] 
+                        cell_height = max(box.z + box.height 
                                         for box in cell_boxes)
                         
                         # Check if cell can fit in current row
@@ -446,12 +668,12 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                             # Move cell to current row
                                 new_x = row_width
                                 
-                                for box in cell_boxes:
-                                    # Update X position to append to current row
-                                    box['position']['x'] = new_x + (box['position']['x'] - cell_x)
-                                    # Update Y position to match current row
-                                    box['position']['y'] = row_y
-                                    # Z position stays the same (vertical stacking)
+                                # Update X position to append to current row, Y position to match
+                                # current row. Z position stays the same (vertical stacking)
+                                moves = [(box, {'x': new_x + (box.x - cell_x), 'y': row_y}, None)
+                                         for box in cell_boxes]
+                                if not self._move_boxes(move_grid, moves, index):
+                                    continue
                                 
                                 # Move boxes to current row
                                 row_boxes.extend(cell_boxes)
@@ -464,11 +686,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                                 
                                 print(f"  -> Moved cell (width={cell_width:.1f}\") from row Y={later_row_y:.1f} to row Y={row_y:.1f}")
                     
-                    # Remove moved cells from later row
-                    for cell_x in cells_to_remove:
-                        cells_to_remove_boxes = later_cells_dict[cell_x]
-                        later_row_boxes = [b for b in later_row_boxes if b not in cells_to_remove_boxes]
-                        rows_dict[later_row_y] = later_row_boxes
+                    # Moved cells left the later row (the index already follows the moves)
+                    if cells_to_remove:
+                        rows_dict[later_row_y] = index.row(later_row_y)
                     
                     # Stop if row is full
                     if remaining_width < threshold:
@@ -476,7 +696,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         return containers
     
-    def optimize_cell_heights(self, containers: List[Dict]) -> List[Dict]:
+    def optimize_cell_heights(self, containers: List[Dict], dirty_only: bool = False) -> List[Dict]:
         """
         Post-processing: Fill incomplete cells by moving boxes from later rows
         
@@ -488,6 +708,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         Args:
             containers: List of containers with packed boxes
+            dirty_only: Only try row pairs where at least one row changed since
+                        the last run of this phase
             
         Returns:
             List[Dict]: Optimized containers with improved cell heights
@@ -500,23 +722,18 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not boxes:
                 continue
             
-            container_height = container['dimensions']['height']
+            # Rows touched since the last run (None = all rows)
+            dirty = self._dirty_rows(container, 'cell_heights', dirty_only)
+            if dirty is not None and not dirty:
+                continue  # Nothing moved since the last run
             
-            # Group boxes into rows based on Y position
-            rows_dict = {}
-            tolerance_y = 0.5
+            move_grid = self._new_move_grid(container)
             
-            for box in boxes:
-                y_pos = box['position']['y']
-                row_key = None
-                for key in rows_dict.keys():
-                    if abs(key - y_pos) <= tolerance_y:
-                        row_key = key
-                        break
-                if row_key is None:
-                    row_key = y_pos
-                    rows_dict[row_key] = []
-                rows_dict[row_key].append(box)
+            container_height = container['dimensions']['height']
+            
+            # Rows by Y position (same position in ticks), from the row/cell index
+            index = self._row_index(container)
+            rows_dict = index.rows()
             
             # Sort rows by Y position (top to bottom)
             sorted_rows_y = sorted(rows_dict.keys())
@@ -524,11 +741,13 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             # Process each row from top to bottom
             for i, row_y in enumerate(sorted_rows_y):
                 row_boxes = rows_dict[row_y]
+                row_dirty = dirty is None or to_ticks(row_y) in dirty
                 
                 # OPTION A - PHASE 2.3: Enhance optimize_cell_heights - change threshold to 0.95 (95%)
                 # Detect incomplete cells in this row
                 incomplete_cells = self.detect_incomplete_cells(
-                    row_boxes, container_height, threshold=0.95
+                    row_boxes, container_height, threshold=0.95,
+                    cells_dict=index.cells(row_y)
                 )
                 
                 if not incomplete_cells:
@@ -545,6 +764,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         continue  # Skip current row
                     
                     other_row_y = sorted_rows_y[j]
+                    if not row_dirty and to_ticks(other_row_y) not in dirty:
+                        continue  # Both rows unchanged since the last run
                     other_row_boxes = rows_dict.get(other_row_y, [])
                     
                     if not other_row_boxes:
@@ -562,30 +783,46 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         if incomplete_cell['remaining_height'] < 3.0:  # Reduced from 5.0
                             continue  # Skip if too little space
                         
-                        # Find boxes from other row that can fit in incomplete cell
-                        for box in other_row_boxes_sorted:
-                            if box in [b['box'] for b in boxes_to_move]:
-                                continue  # Already marked for moving
+                        if self.cell_fill == 'knapsack':
+                            # Fullest stack of the free height in one lookup
+                            marked = {id(b['box']) for b in boxes_to_move}
+                            for box, orientation in stack_fill(
+                                    [b for b in other_row_boxes_sorted if id(b) not in marked],
+                                    incomplete_cell['remaining_height'], incomplete_cell['width'],
+                                    max(b.length for b in incomplete_cell['boxes'])):
+                                boxes_to_move.append({
+                                    'box': box,
+                                    'cell': incomplete_cell,
+                                    'orientation': orientation,
+                                    'target_z': incomplete_cell['height']
+                                })
+                                incomplete_cell['height'] += orientation['height']
+                                incomplete_cell['remaining_height'] -= orientation['height']
+                        else:
+                            # Find boxes from other row that can fit in incomplete cell
+                            for box in other_row_boxes_sorted:
+                                if box in [b['box'] for b in boxes_to_move]:
+                                    continue  # Already marked for moving
                             
-                            # Check all orientations
-                            for orientation in self.get_all_orientations(box):
-                                box_h = orientation['height']
-                                box_w = orientation['width']
+                                # Check all orientations
+                                for orientation in self.get_all_orientations(box):
+                                    box_h = orientation['height']
+                                    box_w = orientation['width']
                                 
-                                # Check if fits in incomplete cell
-                                if (box_h <= incomplete_cell['remaining_height'] and
-                                    box_w <= incomplete_cell['width']):
-                                    # Can fit - mark for moving
-                                    boxes_to_move.append({
-                                        'box': box,
-                                        'cell': incomplete_cell,
-                                        'orientation': orientation,
-                                        'target_z': incomplete_cell['height']
-                                    })
-                                    # Update cell height for next boxes
-                                    incomplete_cell['height'] += box_h
-                                    incomplete_cell['remaining_height'] -= box_h
-                                    break
+                                    # Check if fits in incomplete cell
+                                    if (box_h <= incomplete_cell['remaining_height'] and
+                                        box_w <= incomplete_cell['width']):
+                                        # Can fit - mark for moving
+                                        boxes_to_move.append({
+                                            'box': box,
+                                            'cell': incomplete_cell,
+                                            'orientation': orientation,
+                                            'target_z': incomplete_cell['height']
+                                        })
+                                        # Update cell height for next boxes
+                                        incomplete_cell['height'] += box_h
+                                        incomplete_cell['remaining_height'] -= box_h
+                                        break
                         
                         # OPTION A - PHASE 2.3: Continue until cell is full (95%+) or no boxes fit
                         if incomplete_cell['remaining_height'] < 3.0:
@@ -603,10 +840,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                             target_z = move_info['target_z']
                             
                             # Update box position and dimensions
-                            box['position']['x'] = cell['x']
-                            box['position']['y'] = row_y
-                            box['position']['z'] = target_z
-                            box['dimensions'] = orientation
+                            if not self._move_boxes(move_grid, [
+                                    (box, {'x': cell['x'], 'y': row_y, 'z': target_z}, orientation)], index):
+                                continue
                             
                             # Move box to current row
                             row_boxes.append(box)
@@ -624,29 +860,6 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         return containers
     
-    def get_all_remaining_boxes_list(self, all_remaining_counts: Dict, boxes_by_sort: Dict) -> List[Dict]:
-        """
-        OPTION C: Get all remaining boxes from all sort_order groups
-        
-        Args:
-            all_remaining_counts: Dictionary tracking remaining counts by box key
-            boxes_by_sort: Dictionary grouping boxes by sort_order
-            
-        Returns:
-            List of all remaining boxes (expanded by quantity)
-        """
-        all_remaining = []
-        for sort_order in sorted(boxes_by_sort.keys()):
-            group_boxes = boxes_by_sort[sort_order]
-            for box in group_boxes:
-                key = (box.get('code', ''), box.get('material', ''), 
-                       box.get('purchasing_doc', ''), box.get('packing_method', ''))
-                if key in all_remaining_counts and all_remaining_counts[key] > 0:
-                    qty = all_remaining_counts[key]
-                    for _ in range(qty):
-                        all_remaining.append(box.copy())
-        return all_remaining
-    
     def detect_width_gaps(self, placed_boxes: List[Dict], container_width: float) -> List[Dict]:
         """
         OPTION A: Detect gaps in row based on placed boxes
@@ -662,14 +875,14 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             return [{'x': 0.0, 'width': container_width}]
         
         # Sort boxes by X position
-        boxes_sorted = sorted(placed_boxes, key=lambda b: b['position']['x'])
+        boxes_sorted = sorted(placed_boxes, key=lambda b: b.x)
         
         gaps = []
         current_x = 0.0
         
         for box in boxes_sorted:
-            box_x = box['position']['x']
-            box_width = box['dimensions']['width']
+            box_x = box.x
+            box_width = box.width
             
             # Gap before this box
             if box_x > current_x:
@@ -689,6 +902,39 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         return gaps
     
+    def solve_gap_fill(self, candidates: List[Tuple[Dict, int]], gap_width: float,
+                       fits) -> List[Tuple[Dict, Dict]]:
+        """
+        Boxes filling an X-gap as wide as possible (width knapsack)
+        
+        Args:
+            candidates: (box, units available) in priority order
+            gap_width: Gap width
+            fits: orientation -> bool, extra constraints (height, length)
+            
+        Returns:
+            List of (box, orientation) to place left to right
+        """
+        capacity = capacity_ticks(gap_width)
+        groups = []
+        options = []
+        for box, count in candidates:
+            by_width: Dict[int, Dict] = {}
+            for orientation in self.get_all_orientations(box):
+                width = size_ticks(orientation['width'])
+                if width <= capacity and fits(orientation):
+                    by_width.setdefault(width, orientation)
+            if by_width and count > 0:
+                # Cap counts at what could ever fit so equal gaps share the memo
+                groups.append((tuple(sorted(by_width)), min(count, capacity // min(by_width))))
+                options.append((box, by_width))
+        if not groups:
+            return []
+        
+        picks = solve_fill(tuple(groups), capacity)
+        return [(box, by_width[width])
+                for (box, by_width), widths in zip(options, picks) for width in widths]
+    
     def fill_row_gaps(self, placed_boxes: List[Dict], additional_boxes: List[Dict],
                       row_y: float, container_width: float, container_height: float,
                       dominant_length: float, tolerance: float) -> List[Dict]:
@@ -726,12 +972,30 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         # Create a copy of additional_boxes to modify
         remaining_boxes = additional_boxes[:]
+        units_left = {id(box): box.get('quantity', 1) for box in remaining_boxes}  # Knapsack mode
         
         # Try to fill each gap
         for gap in gaps_sorted:
             if gap['width'] < 5.0:  # Skip small gaps
                 continue
             
+            if self.gap_fill == 'knapsack':
+                # All columns of the gap at once, up to each line's quantity
+                fills = self.solve_gap_fill(
+                    [(box, units_left[id(box)]) for box in remaining_boxes], gap['width'],
+                    lambda o: (abs(o['length'] - dominant_length) <= tolerance * 2.0 and
+                               o['height'] <= container_height)
+                )
+                for box, orientation in fills:
+                    placed_boxes.append(Placement.of(box, gap['x'], row_y, 0.0, orientation))
+                    gap['x'] += orientation['width']
+                    gap['width'] -= orientation['width']
+                    units_left[id(box)] -= 1
+                remaining_boxes = [box for box in remaining_boxes if units_left[id(box)] > 0]
+                if not remaining_boxes:
+                    break
+                continue
+            
             # Find boxes that fit in gap
             for box in remaining_boxes[:]:  # Copy list to modify during iteration
                 best_orientation = None
@@ -752,17 +1016,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 
                 if best_orientation:
                     # Place box in gap
-                    placed_box = {
-                        'code': box.get('code', 'UNKNOWN'),
-                        'dimensions': best_orientation,
-                        'position': {
-                            'x': gap['x'],
-                            'y': row_y,
-                            'z': 0.0  # Start at bottom, will stack later if needed
-                        },
-                        'material': box.get('material', ''),
-                        'packing_method': box.get('packing_method', 'CARTON')
-                    }
+                    placed_box = Placement.of(box, gap['x'], row_y, 0.0, best_orientation)
                     placed_boxes.append(placed_box)
                     remaining_boxes.remove(box)
                     
@@ -809,24 +1063,14 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not boxes:
                 continue
             
+            move_grid = self._new_move_grid(container)
+            
             container_width = container['dimensions']['width']
             container_height = container['dimensions']['height']
             
-            # Group boxes into rows based on Y position
-            rows_dict = {}
-            tolerance_y = 0.5
-            
-            for box in boxes:
-                y_pos = box['position']['y']
-                row_key = None
-                for key in rows_dict.keys():
-                    if abs(key - y_pos) <= tolerance_y:
-                        row_key = key
-                        break
-                if row_key is None:
-                    row_key = y_pos
-                    rows_dict[row_key] = []
-                rows_dict[row_key].append(box)
+            # Rows by Y position (same position in ticks), from the row/cell index
+            index = self._row_index(container)
+            rows_dict = index.rows()
             
             # Sort rows by Y position (top to bottom)
             sorted_rows_y = sorted(rows_dict.keys())
@@ -852,9 +1096,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         continue
                     
                     # Calculate row i dimensions
-                    row_i_max_x = max(box['position']['x'] + box['dimensions']['width'] 
+                    row_i_max_x = max(box.x + box.width 
                                      for box in row_i_boxes)
-                    row_i_max_z = max(box['position']['z'] + box['dimensions']['height'] 
+                    row_i_max_z = max(box.z + box.height 
                                      for box in row_i_boxes)
                     row_i_width = row_i_max_x
                     
@@ -870,9 +1114,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                             continue
                         
                         # Calculate row j dimensions
-                        row_j_max_x = max(box['position']['x'] + box['dimensions']['width'] 
+                        row_j_max_x = max(box.x + box.width 
                                          for box in row_j_boxes)
-                        row_j_max_z = max(box['position']['z'] + box['dimensions']['height'] 
+                        row_j_max_z = max(box.z + box.height 
                                          for box in row_j_boxes)
                         row_j_width = row_j_max_x
                         
@@ -892,11 +1136,12 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         # TODO: Add more sophisticated sort_order compatibility check
                         
                         # Merge row j into row i
-                        # Update X positions of row j boxes to append to row i
-                        for box in row_j_boxes:
-                            box['position']['x'] += row_i_width
-                            box['position']['y'] = row_i_y  # Move to row i Y position
-                            # Z position stays the same
+                        # Update X positions of row j boxes to append to row i,
+                        # move to row i Y position. Z position stays the same
+                        moves = [(box, {'x': box.x + row_i_width, 'y': row_i_y}, None)
+                                 for box in row_j_boxes]
+                        if not self._move_boxes(move_grid, moves, index):
+                            continue
                         
                         # Move boxes from row j to row i
                         row_i_boxes.extend(row_j_boxes)
@@ -917,7 +1162,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         return containers
     
-    def optimize_row_width_utilization(self, containers: List[Dict]) -> List[Dict]:
+    def optimize_row_width_utilization(self, containers: List[Dict], dirty_only: bool = False) -> List[Dict]:
         """
         Post-processing: Improve width utilization by moving boxes into gaps
         
@@ -929,6 +1174,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         
         Args:
             containers: List of containers with packed boxes
+            dirty_only: Only try row pairs where at least one row changed since
+                        the last run of this phase
             
         Returns:
             List[Dict]: Optimized containers with improved width utilization
@@ -941,27 +1188,19 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not boxes:
                 continue
             
+            # Rows touched since the last run (None = all rows)
+            dirty = self._dirty_rows(container, 'row_width', dirty_only)
+            if dirty is not None and not dirty:
+                continue  # Nothing moved since the last run
+            
+            move_grid = self._new_move_grid(container)
+            
             container_width = container['dimensions']['width']
             container_height = container['dimensions']['height']
             
-            # Group boxes into rows based on Y position (with tolerance)
-            rows_dict = {}
-            tolerance_y = 0.5
-            
-            for box in boxes:
-                y_pos = box['position']['y']
-                # Find existing row or create new one
-                row_key = None
-                for key in rows_dict.keys():
-                    if abs(key - y_pos) <= tolerance_y:
-                        row_key = key
-                        break
-                
-                if row_key is None:
-                    row_key = y_pos
-                    rows_dict[row_key] = []
-                
-                rows_dict[row_key].append(box)
+            # Rows by Y position (same position in ticks), from the row/cell index
+            index = self._row_index(container)
+            rows_dict = index.rows()
             
             # IMPROVEMENT 3.1: Sort rows by width utilization (lowest first) to prioritize optimization
             # This ensures Row 2, 4, 6 (with lowest utilization) are optimized first
@@ -969,7 +1208,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             for row_y, row_boxes in rows_dict.items():
                 if not row_boxes:
                     continue
-                max_x = max(box['position']['x'] + box['dimensions']['width'] 
+                max_x = max(box.x + box.width 
                            for box in row_boxes)
                 width_utilization = (max_x / container_width * 100) if container_width > 0 else 0.0
                 remaining_width = container_width - max_x
@@ -983,6 +1222,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             # Sort by width utilization (lowest first), then by remaining_width (largest first)
             rows_with_utilization.sort(key=lambda r: (r['width_utilization'], -r['remaining_width']))
             
+            # Rows never appear or disappear here (boxes only move between them)
+            sorted_rows_y = sorted(rows_dict.keys())
+            
             # Process rows with lowest width utilization first
             for row_info in rows_with_utilization:
                 row_y = row_info['y']
@@ -994,18 +1236,26 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 if width_utilization >= 90.0:
                     continue
                 
+                # All boxes of this row were moved into an earlier row's gap
+                if not row_boxes:
+                    continue
+                
                 # Only optimize if remaining_width > threshold
                 threshold = 5.0
                 if remaining_width < threshold:
                     continue
                 
-                print(f"  -> Row Y={row_y:.1f}\" width utilization {width_utilization:.1f}% < 90%, "
-                      f"remaining width: {remaining_width:.1f}\"")
-                
                 # Find row index in sorted_rows_y for scanning later rows
-                sorted_rows_y = sorted(rows_dict.keys())
                 i = sorted_rows_y.index(row_y)
-                row_width = max(box['position']['x'] + box['dimensions']['width'] 
+                
+                # Unchanged row: only later rows that changed can have new candidates
+                row_dirty = dirty is None or to_ticks(row_y) in dirty
+                if not row_dirty and not any(to_ticks(y) in dirty for y in sorted_rows_y[i + 1:]):
+                    continue
+                
+                print(f"  -> Row Y={row_y:.1f}\" width utilization {width_utilization:.1f}% < 90%, "
+                      f"remaining width: {remaining_width:.1f}\"")
+                row_width = max(box.x + box.width 
                                for box in row_boxes)
                 
                 # Scan later rows for boxes that can fit in gap
@@ -1016,6 +1266,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                     
                     if not later_row_boxes:
                         continue
+                    if not row_dirty and to_ticks(later_row_y) not in dirty:
+                        continue  # Both rows unchanged since the last run
                     
                     # Try to move boxes from later row into gap
                     for box in later_row_boxes[:]:  # Copy list to modify during iteration
@@ -1038,11 +1290,10 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                                     best_width = box_w
                         
                         if best_orientation:
-                            # Move box to current row gap
-                            box['position']['x'] = row_width
-                            box['position']['y'] = row_y
-                            box['position']['z'] = 0.0  # Start new column at bottom
-                            box['dimensions'] = best_orientation
+                            # Move box to current row gap (start new column at bottom)
+                            if not self._move_boxes(move_grid, [
+                                    (box, {'x': row_width, 'y': row_y, 'z': 0.0}, best_orientation)], index):
+                                continue
                             
                             # Move box to current row
                             row_boxes.append(box)
@@ -1065,7 +1316,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         break
                 
                 if boxes_moved:
-                    new_max_x = max(box['position']['x'] + box['dimensions']['width'] 
+                    new_max_x = max(box.x + box.width 
                                    for box in row_boxes)
                     new_width_utilization = (new_max_x / container_width * 100) if container_width > 0 else 0.0
                     print(f"  -> Row Y={row_y:.1f}\" width utilization improved: "
@@ -1090,28 +1341,9 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             float: Dominant length value
         """
-        # Count quantity and unique boxes for each possible length
-        length_counts = {}
-        length_width_data = {}  # Store width data for each length
-        
-        for box in boxes:
-            for orientation in self.get_all_orientations(box):
-                length = orientation['length']
-                width = orientation['width']
-                
-                if length not in length_counts:
-                    length_counts[length] = {'count': 0, 'boxes': set()}
-                    length_width_data[length] = {'widths': [], 'total_width': 0.0}
-                
-                # Đếm quantity
-                count = box.get('quantity', 1)
-                length_counts[length]['count'] += count
-                length_counts[length]['boxes'].add(box.get('code', ''))
-                
-                # Store width data (for each box instance)
-                for _ in range(count):
-                    length_width_data[length]['widths'].append(width)
-                    length_width_data[length]['total_width'] += width
+        # Quantity, unique boxes and total width of units for each possible length
+        # (histogram over the distinct lines, units are not walked)
+        length_counts = length_histogram(boxes, self.get_all_orientations)
         
         if not length_counts:
             return 34.0  # Default fallback
@@ -1119,21 +1351,20 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         # MEDIUM PRIORITY 2: Calculate width utilization score for each length
         if container_width and container_width > 0:
             length_scores = {}
+            max_count = max(lc['count'] for lc in length_counts.values())
             
             for length, count_data in length_counts.items():
                 box_count = count_data['count']
                 unique_boxes = len(count_data['boxes'])
                 
                 # Calculate width utilization
-                widths = sorted(length_width_data[length]['widths'], reverse=True)
-                total_width = sum(widths)
+                total_width = count_data['total_width']
                 
                 # Estimate width utilization (simplified: sum of widths / container_width)
                 # In reality, boxes are placed side by side, so we calculate how many fit
                 estimated_width_util = min(100.0, (total_width / container_width) * 100)
                 
                 # Normalize box count score (0-1 scale)
-                max_count = max(lc['count'] for lc in length_counts.values())
                 box_count_score = box_count / max_count if max_count > 0 else 0
                 
                 # Combined score: width utilization (60%) + box count (40%)
@@ -1176,17 +1407,8 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             List[float]: List of dominant lengths sorted by priority (best first)
         """
         # Count quantity and unique boxes for each possible length
-        length_counts = {}
-        for box in boxes:
-            for orientation in self.get_all_orientations(box):
-                length = orientation['length']
-                if length not in length_counts:
-                    length_counts[length] = {'count': 0, 'boxes': set()}
-                
-                # Đếm quantity
-                count = box.get('quantity', 1)
-                length_counts[length]['count'] += count
-                length_counts[length]['boxes'].add(box.get('code', ''))
+        # (histogram over the distinct lines, units are not walked)
+        length_counts = length_histogram(boxes, self.get_all_orientations)
         
         if not length_counts:
             return [34.0]  # Default fallback
@@ -1201,7 +1423,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
     
     def pack_row_z_first(self, boxes: List[Dict], row_y: float, container_height: float, 
                          container_width: float, dominant_length: float = None,
-                         all_remaining_boxes: List[Dict] = None) -> List[Dict]:
+                         all_remaining_boxes: Optional[RemainingView] = None) -> List[Dict]:
         """
         Pack row using Z-first strategy
         
@@ -1222,7 +1444,19 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             List[Dict]: Placed boxes
         """
-        placed_boxes = []
+        # Same lines (and remaining inventory) packed before: place the cached pattern
+        cache_key = None
+        if self.use_row_cache:
+            cache_key = self._row_cache_key(boxes, container_height, container_width,
+                                            dominant_length, all_remaining_boxes)
+            pattern = ROW_PATTERNS.get(cache_key)
+            if pattern is not None:
+                print(f"  -> Row pattern from cache ({len(pattern)} boxes)")
+                return pattern.place(row_y)
+        
+        # Placed boxes with running row aggregates (extent, cells)
+        row = RowState()
+        placed_boxes = row.boxes
         
         # Sort boxes by (packing_method_priority, sort_order, quantity, height, area)
         # Priority: PRE_PACK (0) before CARTON (1) - GLOBAL level
@@ -1263,14 +1497,12 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         if secondary_length:
             allowed_lengths.append(secondary_length)
         
-        # Expand all boxes by quantity
+        # Expand all boxes by quantity (shared references, lines are not mutated)
         expanded_boxes = []
         for box in boxes_sorted:
             qty = int(box.get('quantity', 1))
-            if qty <= 0:
-                continue
-            for _ in range(qty):
-                expanded_boxes.append(box.copy())
+            if qty > 0:
+                expanded_boxes.extend([box] * qty)
         
         # IMPROVEMENT 1: Keep original expanded boxes for re-filtering
         original_expanded_boxes = expanded_boxes.copy()
@@ -1280,43 +1512,13 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         # DYNAMIC TOLERANCE: Start strict, increase if too restrictive
         tolerance = 2.0 if secondary_length else 1.0  # Slightly relaxed for multi-length
         
+        # Sorted orientation lengths of the row's lines: every tolerance band
+        # (1.0, 3.0, ...) is a range query instead of a rescan of all units
+        length_index = LengthIndex(boxes_sorted, self.get_all_orientations)
+        
         def filter_boxes_with_multiple_lengths(boxes_list, allowed_lengths_list, tol):
             """Helper function to filter boxes matching any of the allowed lengths"""
-            filtered = []
-            for box in boxes_list:
-                valid_orientations = []
-                best_match = None
-                best_length = None
-                
-                # Try to find match with any allowed length
-                for orientation in self.get_all_orientations(box):
-                    box_l = orientation['length']
-                    
-                    # Check against each allowed length
-                    for allowed_l in allowed_lengths_list:
-                        length_diff = abs(box_l - allowed_l)
-                        
-                        if box_l == allowed_l:
-                            # Exact match - prefer this
-                            valid_orientations.append(orientation)
-                        elif length_diff <= tol:
-                            # Within tolerance
-                            if best_match is None or length_diff < abs(best_match['length'] - best_length):
-                                best_match = orientation
-                                best_length = allowed_l
-                
-                # If have exact matches, use them
-                if valid_orientations:
-                    filtered.append(box)
-                elif best_match:
-                    # Use closest match within tolerance
-                    filtered.append(box)
-            return filtered
-        
-        # For backward compatibility, keep old function name
-        def filter_boxes_with_tolerance(boxes_list, dom_length, tol):
-            """Helper function to filter boxes with given tolerance (single length)"""
-            return filter_boxes_with_multiple_lengths(boxes_list, [dom_length], tol)
+            return length_index.filter(boxes_list, allowed_lengths_list, tol)
         
         # MEDIUM PRIORITY 1: Filter with multiple dominant lengths
         filtered_boxes = filter_boxes_with_multiple_lengths(expanded_boxes, allowed_lengths, tolerance)
@@ -1340,6 +1542,235 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         # Update expanded_boxes to use filtered list
         expanded_boxes = filtered_boxes
         
+        # Main pass: stack boxes into columns (Z first, then X)
+        self._row_cacheable = True
+        tolerance = self.fill_row_columns(row, expanded_boxes, row_y, container_height, container_width,
+                                          primary_length, secondary_length, tolerance,
+                                          original_expanded_boxes)
+        
+        # OPTION A - PHASE 2: Active Cell Height Filling
+        # Change threshold from 0.8 (80%) to 0.95 (95%) to force fill cells to maximum height
+        incomplete_cells = self.detect_incomplete_cells(
+            placed_boxes, container_height, threshold=0.95, cells_dict=row.cells()
+        )
+        
+        if incomplete_cells and len(placed_boxes) < len(expanded_boxes):
+            # Count how many of each box type were placed
+            placed_counts = Counter((b.get('code', ''), b.get('material', '')) 
+                                   for b in placed_boxes)
+            expanded_counts = Counter((b.get('code', ''), b.get('material', '')) 
+                                     for b in expanded_boxes)
+            
+            # Get boxes that haven't been fully placed yet
+            remaining_boxes = []
+            for box in expanded_boxes:
+                key = (box.get('code', ''), box.get('material', ''))
+                if expanded_counts[key] > placed_counts.get(key, 0):
+                    remaining_boxes.append(box)
+                    placed_counts[key] = placed_counts.get(key, 0) + 1  # Track usage
+            
+            # OPTION A - PHASE 2.2: Forced cell filling with smallest boxes first
+            # Sort remaining boxes by height (ascending) to prefer smallest boxes for filling gaps
+            remaining_boxes_sorted = sorted(remaining_boxes, 
+                                          key=lambda b: min(orient['height'] 
+                                                          for orient in self.get_all_orientations(b)))
+            
+            # Try to backfill each incomplete cell
+            for cell in incomplete_cells:
+                if cell['remaining_height'] < 3.0:  # Skip if too little space left (reduced from 5.0)
+                    continue
+                
+                cell_x = cell['x']
+                cell_y = row_y
+                # Current top Z position of this cell
+                cell_current_z = row.cell_top(cell_x)
+                remaining_h = container_height - cell_current_z
+                
+                # OPTION A - PHASE 2.2: Use greedy algorithm - try smallest boxes first
+                # Try to find boxes that fit in remaining height
+                for box in remaining_boxes_sorted[:]:  # Copy list to modify during iteration
+                    best_orientation = None
+                    best_fit_height = 0
+                    
+                    # Check all orientations for this box
+                    for orientation in self.get_all_orientations(box):
+                        box_h = orientation['height']
+                        box_w = orientation['width']
+                        box_l = orientation['length']
+                        
+                        # OPTION A - PHASE 2.2: Relaxed constraint - allow boxes from different lengths
+                        # if cell height is very low (< 50% container_height), allow more flexibility
+                        cell_height_util = (cell_current_z / container_height * 100) if container_height > 0 else 0
+                        length_tolerance = tolerance * 2.0 if cell_height_util < 50.0 else tolerance
+                        
+                        # Check if fits in remaining space
+                        if (box_h <= remaining_h and 
+                            box_w <= cell['width'] and
+                            abs(box_l - dominant_length) <= length_tolerance):
+                            # Prefer largest height that still fits to maximize utilization
+                            if box_h > best_fit_height:
+                                best_orientation = orientation
+                                best_fit_height = box_h
+                    
+                    if best_orientation:
+                        # Place box in incomplete cell
+                        row.add(Placement.of(box, cell_x, cell_y, cell_current_z, best_orientation))
+                        cell_current_z += best_orientation['height']
+                        remaining_h = container_height - cell_current_z
+                        remaining_boxes_sorted.remove(box)
+                        
+                        # OPTION A - PHASE 2.2: Continue until cell is full (95%+) or no boxes fit
+                        if remaining_h < 3.0:  # Cell is full enough
+                            break
+        
+        # IMPROVEMENT 2: Width-First Gap Filling
+        # Calculate remaining width gap
+        if placed_boxes:
+            max_x = row.max_x
+            remaining_width = container_width - max_x
+            width_utilization = (max_x / container_width * 100) if container_width > 0 else 0.0
+            
+            # OPTION C - ENHANCED: Search all remaining boxes from all rows if available
+            # Use all_remaining_boxes if provided, otherwise use remaining_boxes from current row
+            if remaining_width >= 5.0 and width_utilization < 90.0:
+                print(f"  -> Gap filling: detected gap {remaining_width:.1f}\" (width utilization: {width_utilization:.1f}%)")
+                
+                # OPTION C: Get remaining boxes from all rows (not just current row)
+                if all_remaining_boxes:
+                    # One box of every type with units left that is not in this row yet and
+                    # fits the gap (lazy view over the inventory counts, units are never expanded)
+                    placed_types = {(b.code, b.material) for b in placed_boxes}
+                    gap_filling_boxes = all_remaining_boxes.one_per_type(
+                        exclude=placed_types, max_width=remaining_width, max_height=container_height,
+                        orientations=self.get_all_orientations
+                    )
+                    print(f"  -> Gap filling: found {len(gap_filling_boxes)} remaining boxes from all rows to fill gap")
+                else:
+                    # Fallback to original logic: only boxes from current row
+                    placed_counts = Counter((b.get('code', ''), b.get('material', '')) 
+                                           for b in placed_boxes)
+                    source_boxes = original_expanded_boxes
+                    expanded_counts = Counter((b.get('code', ''), b.get('material', '')) 
+                                             for b in source_boxes)
+                    
+                    # Get boxes that haven't been fully placed yet
+                    gap_filling_boxes = []
+                    for box in source_boxes:
+                        key = (box.get('code', ''), box.get('material', ''))
+                        if expanded_counts[key] > placed_counts.get(key, 0):
+                            gap_filling_boxes.append(box)
+                            placed_counts[key] = placed_counts.get(key, 0) + 1  # Track usage
+                    print(f"  -> Gap filling: found {len(gap_filling_boxes)} remaining boxes to fill gap")
+                
+                # Sort remaining boxes by width (ascending) - prefer smaller boxes to fill gaps better
+                # But we want to maximize width utilization, so prefer larger width that still fits
+                def get_fitting_width_score(box):
+                    """Get max width of orientations that fit in remaining gap"""
+                    fitting_widths = [orient['width'] for orient in self.get_all_orientations(box)
+                                     if orient['width'] <= remaining_width and orient['height'] <= container_height]
+                    if fitting_widths:
+                        return max(fitting_widths)
+                    return 0.0  # No fitting orientations
+                
+                def get_max_width(box):
+                    """Get max width of any orientation"""
+                    widths = [orient['width'] for orient in self.get_all_orientations(box)]
+                    return max(widths) if widths else 0.0
+                
+                gap_filling_boxes.sort(key=lambda b: (
+                    -get_fitting_width_score(b),
+                    get_max_width(b)
+                ), reverse=True)
+                
+                # Fill gap with boxes
+                current_gap_x = max_x
+                boxes_filled = 0
+                if self.gap_fill == 'knapsack':
+                    # Units available per candidate: inventory counts, or units of this row not placed
+                    if all_remaining_boxes:
+                        candidates = [(box, all_remaining_boxes.inventory.remaining(box))
+                                      for box in gap_filling_boxes]
+                    else:
+                        candidates = [(box, count) for box, count in distinct_lines(gap_filling_boxes)]
+                    # Gap columns may not make the row deeper: more units now fit
+                    # per type, and a deeper row costs more Y than the gap saves
+                    row_depth = max(b.length for b in placed_boxes)
+                    fills = self.solve_gap_fill(
+                        candidates, remaining_width,
+                        lambda o: o['height'] <= container_height and o['length'] <= row_depth
+                    )
+                    for box, orientation in fills:
+                        row.add(Placement.of(box, current_gap_x, row_y, 0.0, orientation))
+                        current_gap_x += orientation['width']
+                        remaining_width -= orientation['width']
+                        boxes_filled += 1
+                        print(f"  -> Gap filling: placed box {box.get('code', 'UNKNOWN')} "
+                              f"(width={orientation['width']:.1f}\"), remaining gap: {remaining_width:.1f}\"")
+                else:
+                    for box in gap_filling_boxes:
+                        if remaining_width < 3.0:  # Gap too small to fill (reduced from 5.0)
+                            break
+                    
+                        best_orientation = None
+                        best_width = 0
+                    
+                        # Try all orientations - find one that fits and maximizes width
+                        for orientation in self.get_all_orientations(box):
+                            box_w = orientation['width']
+                            box_h = orientation['height']
+                        
+                            # Check if fits in remaining gap
+                            if box_w <= remaining_width and box_h <= container_height:
+                                # Prefer larger width to maximize utilization
+                                if box_w > best_width:
+                                    best_orientation = orientation
+                                    best_width = box_w
+                    
+                        if best_orientation:
+                            # Place box in gap
+                            row.add(Placement.of(box, current_gap_x, row_y, 0.0, best_orientation))
+                        
+                            # Update gap position
+                            current_gap_x += best_width
+                            remaining_width -= best_width
+                        
+                            boxes_filled += 1
+                            print(f"  -> Gap filling: placed box {box.get('code', 'UNKNOWN')} "
+                                  f"(width={best_width:.1f}\"), remaining gap: {remaining_width:.1f}\"")
+                
+                if boxes_filled > 0:
+                    final_max_x = row.max_x
+                    final_width_utilization = (final_max_x / container_width * 100) if container_width > 0 else 0.0
+                    print(f"  -> Gap filling: filled {boxes_filled} boxes, width utilization: {width_utilization:.1f}% -> {final_width_utilization:.1f}%")
+                elif len(gap_filling_boxes) > 0:
+                    print(f"  -> Gap filling: no boxes fit in gap {remaining_width:.1f}\"")
+        
+        if cache_key is not None and self._row_cacheable:
+            ROW_PATTERNS.put(cache_key, RowPattern.of(placed_boxes, row_y))
+        return placed_boxes
+    
+    def fill_row_columns(self, row: RowState, expanded_boxes: List[Dict], row_y: float,
+                         container_height: float, container_width: float, primary_length: float,
+                         secondary_length: Optional[float], tolerance: float,
+                         original_expanded_boxes: List[Dict]) -> float:
+        """
+        Main pass of pack_row_z_first: place boxes into columns, Z first
+        
+        Boxes are taken in order; each goes on top of the current column if
+        it fits, else starts the next column, else is skipped.
+        
+        Args:
+            row: Row state the boxes are added to
+            expanded_boxes: Units matching the row's lengths, in packing order
+            row_y: Y position for this row
+            container_height, container_width: Row cross-section
+            primary_length, secondary_length: Allowed lengths (secondary optional)
+            tolerance: Length tolerance
+            original_expanded_boxes: All units of the row (before the length filter)
+            
+        Returns:
+            float: Tolerance after progressive relaxation (used by the backfill)
+        """
         # Track position in row - START FILLING Z FIRST
         current_x = 0.0
         current_z = 0.0
@@ -1354,15 +1785,6 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if current_x >= container_width:
                 break  # Row is truly full - no more space
             
-            # Calculate average dimensions from placed boxes
-            if placed_boxes:
-                avg_length = sum(b['dimensions']['length'] for b in placed_boxes) / len(placed_boxes)
-                avg_width = sum(b['dimensions']['width'] for b in placed_boxes) / len(placed_boxes)
-            else:
-                # First box in row - use dominant_length as initial target
-                avg_length = dominant_length
-                avg_width = None
-            
             best_orientation = None
             best_score = float('inf')
             fits_current = False
@@ -1472,18 +1894,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             
             # Place box if we found a fit
             if best_orientation and fits_current:
-                placed_box = {
-                    'code': box.get('code', 'UNKNOWN'),
-                    'dimensions': best_orientation,
-                    'position': {
-                        'x': current_x,
-                        'y': row_y,
-                        'z': current_z
-                    },
-                    'material': box.get('material', ''),
-                    'packing_method': box.get('packing_method', 'CARTON')
-                }
-                placed_boxes.append(placed_box)
+                row.add(Placement.of(box, current_x, row_y, current_z, best_orientation))
                 placed_boxes_count += 1
                 
                 # Update position for next box
@@ -1495,9 +1906,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 column_max_width = max(column_max_width, box_w)
                 
                 # IMPROVEMENT 1.1: Track width utilization for progressive relaxation
-                current_width = max(b['position']['x'] + b['dimensions']['width'] 
-                                  for b in placed_boxes) if placed_boxes else 0.0
-                width_utilization = (current_width / container_width * 100) if container_width > 0 else 0.0
+                width_utilization = (row.max_x / container_width * 100) if container_width > 0 else 0.0
                 
                 # IMPROVEMENT 1.2: Progressive relaxation logic
                 # Check every 10 boxes or at 25% progress
@@ -1521,7 +1930,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                         top_lengths = self.get_top_dominant_lengths(original_expanded_boxes, top_n=3)
                         # Try secondary dominant_length (skip the one already used)
                         for alt_length in top_lengths:
-                            if abs(alt_length - dominant_length) > 1.0:  # Different from current
+                            if abs(alt_length - primary_length) > 1.0:  # Different from current
                                 print(f"  -> Low width utilization detected, secondary length {alt_length:.1f}\" available for gap filling")
                                 secondary_length_tried = True
                                 break
@@ -1541,215 +1950,12 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
                 # This allows the row to fill more completely before moving to next row
                 continue
         
-        # OPTION A - PHASE 2: Active Cell Height Filling
-        # Change threshold from 0.8 (80%) to 0.95 (95%) to force fill cells to maximum height
-        incomplete_cells = self.detect_incomplete_cells(
-            placed_boxes, container_height, threshold=0.95
-        )
-        
-        if incomplete_cells and len(placed_boxes) < len(expanded_boxes):
-            # Count how many of each box type were placed
-            placed_counts = Counter((b.get('code', ''), b.get('material', '')) 
-                                   for b in placed_boxes)
-            expanded_counts = Counter((b.get('code', ''), b.get('material', '')) 
-                                     for b in expanded_boxes)
-            
-            # Get boxes that haven't been fully placed yet
-            remaining_boxes = []
-            for box in expanded_boxes:
-                key = (box.get('code', ''), box.get('material', ''))
-                if expanded_counts[key] > placed_counts.get(key, 0):
-                    remaining_boxes.append(box)
-                    placed_counts[key] = placed_counts.get(key, 0) + 1  # Track usage
-            
-            # OPTION A - PHASE 2.2: Forced cell filling with smallest boxes first
-            # Sort remaining boxes by height (ascending) to prefer smallest boxes for filling gaps
-            remaining_boxes_sorted = sorted(remaining_boxes, 
-                                          key=lambda b: min(orient['height'] 
-                                                          for orient in self.get_all_orientations(b)))
-            
-            # Try to backfill each incomplete cell
-            for cell in incomplete_cells:
-                if cell['remaining_height'] < 3.0:  # Skip if too little space left (reduced from 5.0)
-                    continue
-                
-                cell_x = cell['x']
-                cell_y = row_y
-                # Calculate current top Z position from existing boxes in this cell
-                cell_boxes = cell['boxes']
-                cell_current_z = max(box['position']['z'] + box['dimensions']['height'] 
-                                    for box in cell_boxes) if cell_boxes else 0.0
-                remaining_h = container_height - cell_current_z
-                
-                # OPTION A - PHASE 2.2: Use greedy algorithm - try smallest boxes first
-                # Try to find boxes that fit in remaining height
-                for box in remaining_boxes_sorted[:]:  # Copy list to modify during iteration
-                    best_orientation = None
-                    best_fit_height = 0
-                    
-                    # Check all orientations for this box
-                    for orientation in self.get_all_orientations(box):
-                        box_h = orientation['height']
-                        box_w = orientation['width']
-                        box_l = orientation['length']
-                        
-                        # OPTION A - PHASE 2.2: Relaxed constraint - allow boxes from different lengths
-                        # if cell height is very low (< 50% container_height), allow more flexibility
-                        cell_height_util = (cell_current_z / container_height * 100) if container_height > 0 else 0
-                        length_tolerance = tolerance * 2.0 if cell_height_util < 50.0 else tolerance
-                        
-                        # Check if fits in remaining space
-                        if (box_h <= remaining_h and 
-                            box_w <= cell['width'] and
-                            abs(box_l - dominant_length) <= length_tolerance):
-                            # Prefer largest height that still fits to maximize utilization
-                            if box_h > best_fit_height:
-                                best_orientation = orientation
-                                best_fit_height = box_h
-                    
-                    if best_orientation:
-                        # Place box in incomplete cell
-                        placed_box = {
-                            'code': box.get('code', 'UNKNOWN'),
-                            'dimensions': best_orientation,
-                            'position': {
-                                'x': cell_x,
-                                'y': cell_y,
-                                'z': cell_current_z  # Stack on top of existing boxes
-                            },
-                            'material': box.get('material', ''),
-                            'packing_method': box.get('packing_method', 'CARTON')
-                        }
-                        placed_boxes.append(placed_box)
-                        cell_current_z += best_orientation['height']
-                        remaining_h = container_height - cell_current_z
-                        remaining_boxes_sorted.remove(box)
-                        
-                        # OPTION A - PHASE 2.2: Continue until cell is full (95%+) or no boxes fit
-                        if remaining_h < 3.0:  # Cell is full enough
-                            break
-        
-        # IMPROVEMENT 2: Width-First Gap Filling
-        # Calculate remaining width gap
-        if placed_boxes:
-            max_x = max(box['position']['x'] + box['dimensions']['width'] 
-                       for box in placed_boxes)
-            remaining_width = container_width - max_x
-            width_utilization = (max_x / container_width * 100) if container_width > 0 else 0.0
-            
-            # OPTION C - ENHANCED: Search all remaining boxes from all rows if available
-            # Use all_remaining_boxes if provided, otherwise use remaining_boxes from current row
-            if remaining_width >= 5.0 and width_utilization < 90.0:
-                print(f"  -> Gap filling: detected gap {remaining_width:.1f}\" (width utilization: {width_utilization:.1f}%)")
-                
-                # OPTION C: Get remaining boxes from all rows (not just current row)
-                if all_remaining_boxes:
-                    # Use all remaining boxes from all rows
-                    placed_counts = Counter((b.get('code', ''), b.get('material', '')) 
-                                           for b in placed_boxes)
-                    gap_filling_boxes = []
-                    for box in all_remaining_boxes:
-                        # Check if box hasn't been placed in this row
-                        key = (box.get('code', ''), box.get('material', ''))
-                        if key not in placed_counts:
-                            gap_filling_boxes.append(box)
-                            placed_counts[key] = placed_counts.get(key, 0) + 1  # Track usage
-                    print(f"  -> Gap filling: found {len(gap_filling_boxes)} remaining boxes from all rows to fill gap")
-                else:
-                    # Fallback to original logic: only boxes from current row
-                    placed_counts = Counter((b.get('code', ''), b.get('material', '')) 
-                                           for b in placed_boxes)
-                    source_boxes = original_expanded_boxes
-                    expanded_counts = Counter((b.get('code', ''), b.get('material', '')) 
-                                             for b in source_boxes)
-                    
-                    # Get boxes that haven't been fully placed yet
-                    gap_filling_boxes = []
-                    for box in source_boxes:
-                        key = (box.get('code', ''), box.get('material', ''))
-                        if expanded_counts[key] > placed_counts.get(key, 0):
-                            gap_filling_boxes.append(box)
-                            placed_counts[key] = placed_counts.get(key, 0) + 1  # Track usage
-                    print(f"  -> Gap filling: found {len(gap_filling_boxes)} remaining boxes to fill gap")
-                
-                # Sort remaining boxes by width (ascending) - prefer smaller boxes to fill gaps better
-                # But we want to maximize width utilization, so prefer larger width that still fits
-                def get_fitting_width_score(box):
-                    """Get max width of orientations that fit in remaining gap"""
-                    fitting_widths = [orient['width'] for orient in self.get_all_orientations(box)
-                                     if orient['width'] <= remaining_width and orient['height'] <= container_height]
-                    if fitting_widths:
-                        return max(fitting_widths)
-                    return 0.0  # No fitting orientations
-                
-                def get_max_width(box):
-                    """Get max width of any orientation"""
-                    widths = [orient['width'] for orient in self.get_all_orientations(box)]
-                    return max(widths) if widths else 0.0
-                
-                gap_filling_boxes.sort(key=lambda b: (
-                    -get_fitting_width_score(b),
-                    get_max_width(b)
-                ), reverse=True)
-                
-                # Fill gap with boxes
-                current_gap_x = max_x
-                boxes_filled = 0
-                for box in gap_filling_boxes:
-                    if remaining_width < 3.0:  # Gap too small to fill (reduced from 5.0)
-                        break
-                    
-                    best_orientation = None
-                    best_width = 0
-                    
-                    # Try all orientations - find one that fits and maximizes width
-                    for orientation in self.get_all_orientations(box):
-                        box_w = orientation['width']
-                        box_h = orientation['height']
-                        
-                        # Check if fits in remaining gap
-                        if box_w <= remaining_width and box_h <= container_height:
-                            # Prefer larger width to maximize utilization
-                            if box_w > best_width:
-                                best_orientation = orientation
-                                best_width = box_w
-                    
-                    if best_orientation:
-                        # Place box in gap
-                        placed_box = {
-                            'code': box.get('code', 'UNKNOWN'),
-                            'dimensions': best_orientation,
-                            'position': {
-                                'x': current_gap_x,
-                                'y': row_y,
-                                'z': 0.0  # Start new column at bottom
-                            },
-                            'material': box.get('material', ''),
-                            'packing_method': box.get('packing_method', 'CARTON')
-                        }
-                        placed_boxes.append(placed_box)
-                        
-                        # Update gap position
-                        current_gap_x += best_width
-                        remaining_width -= best_width
-                        
-                        boxes_filled += 1
-                        print(f"  -> Gap filling: placed box {box.get('code', 'UNKNOWN')} "
-                              f"(width={best_width:.1f}\"), remaining gap: {remaining_width:.1f}\"")
-                
-                if boxes_filled > 0:
-                    final_max_x = max(box['position']['x'] + box['dimensions']['width'] 
-                                     for box in placed_boxes)
-                    final_width_utilization = (final_max_x / container_width * 100) if container_width > 0 else 0.0
-                    print(f"  -> Gap filling: filled {boxes_filled} boxes, width utilization: {width_utilization:.1f}% -> {final_width_utilization:.1f}%")
-                elif len(gap_filling_boxes) > 0:
-                    print(f"  -> Gap filling: no boxes fit in gap {remaining_width:.1f}\"")
-        
-        return placed_boxes
+        return tolerance
     
     def detect_incomplete_cells(self, placed_boxes: List[Dict], 
                                container_height: float, 
-                               threshold: float = 0.8) -> List[Dict]:
+                               threshold: float = 0.8,
+                               cells_dict: Optional[Dict[float, List[Placement]]] = None) -> List[Dict]:
         """
         Detect cells that haven't reached minimum height threshold
         
@@ -1760,27 +1966,16 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             placed_boxes: List of placed boxes
             container_height: Maximum container height
             threshold: Minimum height ratio (default: 0.8 = 80%)
+            cells_dict: Cells of placed_boxes already grouped by X (e.g. from
+                        the row/cell index), grouped here if None
             
         Returns:
             List[Dict]: [{x, height, remaining_height, boxes, width}, ...]
                        List of incomplete cells with their properties
         """
         # Group boxes by X position (cells)
-        cells_dict = {}
-        tolerance_x = 0.5
-        
-        for box in placed_boxes:
-            x_pos = box['position']['x']
-            # Find existing cell or create new
-            cell_key = None
-            for key in cells_dict.keys():
-                if abs(key - x_pos) <= tolerance_x:
-                    cell_key = key
-                    break
-            if cell_key is None:
-                cell_key = x_pos
-                cells_dict[cell_key] = []
-            cells_dict[cell_key].append(box)
+        if cells_dict is None:
+            cells_dict = group_by_position(placed_boxes, 'x')
         
         # Calculate height for each cell
         incomplete_cells = []
@@ -1790,13 +1985,13 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
             if not cell_boxes:
                 continue
             
-            cell_height = max(box['position']['z'] + box['dimensions']['height'] 
+            cell_height = max(box.z + box.height 
                              for box in cell_boxes)
             
             if cell_height < min_height:
                 # Calculate cell width
-                cell_width = max(box['position']['x'] + box['dimensions']['width'] 
-                               for box in cell_boxes) - min(box['position']['x'] 
+                cell_width = max(box.x + box.width 
+                               for box in cell_boxes) - min(box.x 
                                                            for box in cell_boxes)
                 
                 incomplete_cells.append({
@@ -1816,6 +2011,7 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         CARTON: 2 orientations (luôn đứng, chỉ xoay trái/phải)
         PRE_PACK: 2-4 orientations (mặt width×height không chạm sàn)
                   - Swap orientations (L×H, W) và (H×L, W) chỉ hợp lệ khi Height > Length
+        Block (BlockBuilder): 2 orientations (upright, XY rotation only)
         
         Args:
             box: Box dict with dimensions and packing_method
@@ -1823,25 +2019,4 @@ class ZFirstPackingAlgorithm(LAFFBinPacking3D):
         Returns:
             List[Dict]: [{width, length, height}, ...]
         """
-        w, l, h = box['dimensions']['width'], box['dimensions']['length'], box['dimensions']['height']
-        packing_method = box.get('packing_method', 'CARTON')
-        
-        if packing_method == 'PRE_PACK':
-            # PRE_PACK: Luôn cho phép 2 orientations cơ bản
-            orientations = [
-                {'width': w, 'length': l, 'height': h},  # (W×L, H) - Always allowed
-                {'width': l, 'length': w, 'height': h},  # (L×W, H) - Always allowed
-            ]
-            
-            # Only add swap orientations if Height > Length
-            if h > l:
-                orientations.append({'width': l, 'length': h, 'height': w})  # (L×H, W)
-                orientations.append({'width': h, 'length': l, 'height': w})  # (H×L, W)
-            
-            return orientations
-        else:
-            # CARTON: 2 orientations - luôn đứng theo height, chỉ xoay trái/phải
-            return [
-                {'width': w, 'length': l, 'height': h},  # Đứng, hướng gốc
-                {'width': l, 'length': w, 'height': h}   # Đứng, xoay 90°
-            ]
+        return get_orientations(box, 'z_first')